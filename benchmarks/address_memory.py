@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Memory used by USAddress for an address file, held as a dict per address
+# (as it once was) and by column.  Sizes are per million addresses.
+#
+#     python benchmarks/address_memory.py [rows]
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datagen.addrgen import USAddress
+from synthetic import addresses
+
+fields = [ 'street1', 'city', 'state', 'postalcode', 'lat', 'lon' ]
+
+def dicts(dataFile):
+    # the original AddressFile storage
+    addrs = []
+    with gzip.open(dataFile, 'rt', encoding = 'utf-8') as f:
+        for line in f:
+            addrs.append(dict(zip(fields, line.strip().split('|'))))
+
+    return addrs
+
+def measure(label, fn, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = fn()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('{0:24s} {1:8.1f} MB/M rows   (load {2:.2f}s)'
+          .format(label, size * 1e6 / rows / (1 << 20), elapsed))
+    return obj
+
+def run(tmp, rows):
+    dataFile = os.path.join(tmp, 'us_addresses.dat.gz')
+    with gzip.open(dataFile, 'wt', encoding = 'utf-8') as f:
+        for street, s2, s3, city, state, zipcode, lat, lon in addresses(rows):
+            f.write('|'.join((street, city, state, zipcode, str(lat), str(lon))))
+            f.write('\n')
+
+    measure('dict per address', lambda: dicts(dataFile), rows)
+    measure('columns (parsed)',
+            lambda: USAddress(datapath = tmp, cacheDir = tmp), rows)
+    measure('columns (from cache)',
+            lambda: USAddress(datapath = tmp, cacheDir = tmp), rows)
+
+    for name in os.listdir(tmp):
+        if name.endswith('.dgc'):
+            size = os.path.getsize(os.path.join(tmp, name))
+            print('{0:24s} {1:8.1f} MB/M rows   (mapped, shared between '
+                  'processes)'.format('cache file', size * 1e6 / rows / (1 << 20)))
+
+    return
+
+def main(argv):
+    rows = 1000000
+    if len(argv) > 1:
+        rows = int(argv[1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(tmp, rows)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
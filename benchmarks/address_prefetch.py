@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Compare the AddressDB access modes: one query per address, prefetched
+# batches, and the whole table held in memory.
+#
+#     python benchmarks/address_prefetch.py [rows] [addresses]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datagen.addrgen import USAddressDB
+from synthetic import make_address_db
+
+def run(tmp, rows, n):
+    make_address_db(os.path.join(tmp, 'us_address.db'), rows)
+
+    modes = [ ('query per address', {}),
+              ('prefetch 8', { 'prefetch': 8 }),
+              ('prefetch 256', { 'prefetch': 256 }),
+              ('in memory', { 'memoryLimit': 1 << 40 }) ]
+
+    print('rows:       {0:d}'.format(rows))
+    for label, kwargs in modes:
+        start = time.perf_counter()
+        addr = USAddressDB(datapath = tmp, dbFile = 'us_address.db',
+                           cacheDir = tmp, rng = random.Random(1), **kwargs)
+        loaded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(n):
+            addr.create()
+
+        elapsed = time.perf_counter() - start
+        print('{0:18s} {1:8.2f} us/address   (init {2:.2f}s)'
+              .format(label, elapsed * 1e6 / n, loaded))
+
+    return
+
+def main(argv):
+    rows = 1000000
+    if len(argv) > 1:
+        rows = int(argv[1])
+
+    n = 100000
+    if len(argv) > 2:
+        n = int(argv[2])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(tmp, rows, n)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
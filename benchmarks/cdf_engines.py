@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Compare the 'bisect' and 'alias' CDF engines on the bundled name files.
+#
+#     python benchmarks/cdf_engines.py [draws]
+
+import os
+import random
+import sys
+import timeit
+
+from datagen.cdf import CDF
+from datagen.entitygenerator import EntityGenerator
+
+files = [ ('male.dat.gz', False),
+          ('female.dat.gz', False),
+          ('surname.dat.gz', True) ]
+
+def main(argv):
+    draws = 1000000
+    if len(argv) > 1:
+        draws = int(argv[1])
+
+    datapath = EntityGenerator.defaultDataPath()
+
+    print('{0:16s} {1:>8s} {2:>12s} {3:>12s} {4:>8s}'.format(
+          'file', 'values', 'bisect ns', 'alias ns', 'speedup'))
+
+    for name, isCumulative in files:
+        dataFile = os.path.join(datapath, name)
+
+        results = []
+        for engine in CDF.engines:
+            cdf = CDF(dataFile, delimiter = '|', isCumulative = isCumulative,
+                      engine = engine)
+
+            random.seed(1)
+            elapsed = timeit.timeit(cdf.getValue, number = draws)
+            results.append(elapsed * 1e9 / draws)
+
+        print('{0:16s} {1:8d} {2:12.1f} {3:12.1f} {4:7.2f}x'.format(
+              name, len(cdf.values), results[0], results[1],
+              results[0] / results[1]))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Compare EntityGenerator.create() with and without a compiled plan, using
+# the default (__main__) schema.
+#
+#     python benchmarks/compiled_plan.py [entities]
+
+import os
+import sys
+import tempfile
+import time
+
+from datagen.__main__ import build_generator
+from synthetic import make_address_db
+
+def run(egen, n):
+    # every element draws from its own stream; start them all from the
+    # same point, so both runs generate the same entities
+    egen.reseed(0, 1)
+    start = time.perf_counter()
+    for i in range(n):
+        egen.create()
+
+    return time.perf_counter() - start
+
+def main(argv):
+    n = 20000
+    if len(argv) > 1:
+        n = int(argv[1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATAGEN_CACHE_DIR'] = tmp
+        make_address_db(os.path.join(tmp, 'us_address.db'), 10000)
+
+        egen = build_generator(addrPath = tmp)
+
+        compiled = run(egen, n)
+        egen.plan = None           # discard the plan, back to the tree walk
+        walked = run(egen, n)
+
+    print('entities:     {0:d}'.format(n))
+    print('create():     {0:8.2f} us/entity'.format(walked * 1e6 / n))
+    print('compiled:     {0:8.2f} us/entity'.format(compiled * 1e6 / n))
+    print('speedup:      {0:8.2f}x'.format(walked / compiled))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Time n calls to create() against a single create_many(n) for the simple
+# elements with batch implementations.  Both produce the same values.
+#
+#     python benchmarks/create_many.py [n]
+
+import random
+import sys
+import time
+
+from datetime import datetime
+
+from datagen.dobgen import DOBElement
+from datagen.gendergen import GenderElement
+from datagen.natidgen import NationalIDElement, numpy
+from datagen.phonegen import PhoneElement
+
+def timed(fn, n):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1e6 / n
+
+def main(argv):
+    n = 100000
+    if len(argv) > 1:
+        n = int(argv[1])
+
+    print('numpy:     {0:s}'.format('yes' if numpy is not None else 'no'))
+
+    now = datetime(2020, 1, 1)
+    elements = [ ('gender', GenderElement()),
+                 ('dob', DOBElement(now = now)),
+                 ('ssn', NationalIDElement()),
+                 ('ssn (dashes)', NationalIDElement(useDashes = True)),
+                 ('phone', PhoneElement()) ]
+
+    for label, elem in elements:
+        elem.rng = random.Random(1)
+        one = timed(lambda: [ elem.create() for i in range(n) ], n)
+        many = timed(lambda: elem.create_many(n), n)
+        print('{0:16s} create {1:6.2f} us  create_many {2:6.2f} us  ({3:.1f}x)'
+              .format(label, one, many, one / many))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
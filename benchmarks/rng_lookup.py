@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Compare the cost of drawing random numbers through the module functions
+# (random.random()) with an element's own random.Random instance, looked up
+# per call (self.rng.random()) or bound once to a local.
+#
+#     python benchmarks/rng_lookup.py [draws]
+
+import random
+import sys
+import timeit
+
+from datagen.gendergen import GenderElement
+from datagen.entitygenerator import EntityGenerator
+
+def main(argv):
+    draws = 1000000
+    if len(argv) > 1:
+        draws = int(argv[1])
+
+    egen = EntityGenerator(seed = 1)
+    elem = GenderElement(name = 'gender')
+    egen.addElement(elem)
+
+    cases = [ ('random.random()',
+               'for i in loop: random.random()'),
+              ('self.rng.random()',
+               'for i in loop: elem.rng.random()'),
+              ('local rnd()',
+               'rnd = elem.rng.random\nfor i in loop: rnd()'),
+              ('GenderElement.create()  (module)',
+               'for i in loop: standalone.create()'),
+              ('GenderElement.create()  (stream)',
+               'for i in loop: elem.create()') ]
+
+    env = { 'random': random,
+            'elem': elem,
+            'standalone': GenderElement(),
+            'loop': range(draws) }
+
+    for label, stmt in cases:
+        elapsed = min(timeit.repeat(stmt, globals = env, number = 1, repeat = 3))
+        print('{0:34s} {1:8.1f} ns/call'.format(label, elapsed * 1e9 / draws))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
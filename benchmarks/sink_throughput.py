@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Output throughput of per-record print() against a BufferedSink.  To keep
+# generation cost out of the measurement, a pool of entities is generated
+# once and written repeatedly.  Each method is timed twice: including
+# json.dumps() (end to end), and with records serialized in advance (the
+# output path alone).
+#
+#     python benchmarks/sink_throughput.py [entities] [output file]
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from datagen.entitygenerator import EntityGenerator, EntityElement, ArrayElement
+from datagen.gendergen import GenderElement
+from datagen.dobgen import DOBElement
+from datagen.natidgen import NationalIDElement
+from datagen.namegen import USCensusNameSet
+from datagen.phonegen import PhoneElement
+from datagen.sink import FileSink
+
+def entity_pool(size = 1000):
+    egen = EntityGenerator(seed = 1)
+    egen.addElement(GenderElement(name = 'gender'))
+    egen.addElement(DOBElement(name = 'dob'))
+    egen.addElement(NationalIDElement(name = 'ssn'))
+    egen.addElement(USCensusNameSet(name = 'names',
+                                    params = { 'gender': '/gender' }))
+    egen.addElement(ArrayElement(name = 'phones',
+                                 count_fn = EntityElement.count_const_fn(3),
+                                 generator = PhoneElement()))
+    return list(egen.compile().generate(size))
+
+def with_print(records, n, fileName, encode):
+    with open(fileName, 'w') as f, contextlib.redirect_stdout(f):
+        for i in range(n):
+            print(encode(records[i % len(records)]))
+
+def with_sink(records, n, fileName, encode):
+    with FileSink(fileName) as sink:
+        for i in range(n):
+            sink.write(encode(records[i % len(records)]) + '\n')
+
+def main(argv):
+    n = 1000000
+    if len(argv) > 1:
+        n = int(argv[1])
+
+    if len(argv) > 2:
+        fileName = argv[2]
+    else:
+        fileName = os.path.join(tempfile.mkdtemp(), 'out.json')
+
+    pool = entity_pool()
+    lines = [ json.dumps(e) for e in pool ]
+
+    cases = [ ('print()', with_print, pool, json.dumps),
+              ('BufferedSink', with_sink, pool, json.dumps),
+              ('print()', with_print, lines, str),
+              ('BufferedSink', with_sink, lines, str) ]
+
+    for label, fn, records, encode in cases:
+        start = time.perf_counter()
+        fn(records, n, fileName, encode)
+        elapsed = time.perf_counter() - start
+
+        mb = os.path.getsize(fileName) / (1 << 20)
+        mode = 'end to end' if records is pool else 'output only'
+        print('{0:14s} {1:12s} {2:8.1f} MB in {3:6.2f} s  {4:8.1f} MB/s'.format(
+              label, mode, mb, elapsed, mb / elapsed))
+
+    os.unlink(fileName)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Build a GridIndex over random points spread across the continental US,
+# and time radius sampling, radius listing and nearest-neighbour queries.
+#
+#     python benchmarks/spatial_index.py [points] [queries]
+
+import random
+import sys
+import time
+
+from datagen.spatial import GridIndex
+
+def timed(label, fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+
+    elapsed = time.perf_counter() - start
+    print('{0:24s} {1:8.1f} us/query'.format(label, elapsed * 1e6 / len(queries)))
+
+def main(argv):
+    points = 2000000
+    if len(argv) > 1:
+        points = int(argv[1])
+
+    n = 2000
+    if len(argv) > 2:
+        n = int(argv[2])
+
+    rnd = random.Random(1)
+    coords = [ (rnd.uniform(25.0, 49.0), rnd.uniform(-124.0, -67.0))
+               for i in range(points) ]
+
+    start = time.perf_counter()
+    grid = GridIndex.build(coords)
+    print('points:    {0:d}  (build {1:.1f}s, {2:d} cells)'
+          .format(points, time.perf_counter() - start, len(grid.cells)))
+
+    queries = [ coords[rnd.randrange(points)] for i in range(n) ]
+    draw = random.Random(2).random
+
+    timed('sample within 5km', lambda q: grid.sample(q[0], q[1], 5.0, draw), queries)
+    timed('sample within 50km', lambda q: grid.sample(q[0], q[1], 50.0, draw), queries)
+    timed('within 5km', lambda q: grid.within(q[0], q[1], 5.0), queries)
+    timed('nearest 10', lambda q: grid.nearest(q[0], q[1], 10), queries)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
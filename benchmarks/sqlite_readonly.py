@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Compare random address lookups through a default SQLite connection with
+# the read-only, tuned connection (AddressDB(readOnly = True)).  The table
+# (about 70 bytes per row on disk) is built in a temporary directory and
+# removed at exit.  Give --db to build it at that path instead, and to reuse
+# it in later runs.  Note that /tmp may be held in memory rather than on disk.
+#
+#     python benchmarks/sqlite_readonly.py [--db PATH] [rows] [lookups]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datagen.addrgen import USAddressDB
+from synthetic import make_address_db
+
+def lookups(addr, n):
+    addr.rng = random.Random(1)
+    start = time.perf_counter()
+    for i in range(n):
+        addr.create()
+
+    return time.perf_counter() - start
+
+def run(dbFile, rows, n):
+    if not os.path.exists(dbFile):
+        print('building {0:s}...'.format(dbFile))
+        make_address_db(dbFile, rows)
+
+    print('rows:       {0:d} ({1:d} MB)'
+          .format(rows, os.path.getsize(dbFile) >> 20))
+
+    # the key index is built (and saved beside the database) by the first
+    # element created
+    datapath, name = os.path.split(os.path.abspath(dbFile))
+    for label, readOnly in (('default', False), ('read-only', True)):
+        addr = USAddressDB(datapath = datapath, dbFile = name,
+                           cacheDir = datapath, readOnly = readOnly)
+        lookups(addr, n // 10)               # warm the page cache
+        elapsed = lookups(addr, n)
+        print('{0:10s} {1:8.2f} us/address'.format(label, elapsed * 1e6 / n))
+
+    return
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog = argv[0])
+    parser.add_argument('--db', default = None,
+                        help = 'address database to use (built if missing, '
+                               'and kept)')
+    parser.add_argument('rows', type = int, nargs = '?', default = 10000000)
+    parser.add_argument('lookups', type = int, nargs = '?', default = 200000)
+    args = parser.parse_args(argv[1:])
+
+    if args.db is not None:
+        run(args.db, args.rows, args.lookups)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dbFile = os.path.join(tmp, 'us_address_{0:d}.db'.format(args.rows))
+        run(dbFile, args.rows, args.lookups)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
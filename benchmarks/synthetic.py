@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Synthetic address data for the benchmarks.  The address data used in
+# production is not distributed with the package, so we build tables of the
+# same shape here.
+
+import random
+import sqlite3
+
+states = [ 'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
+           'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
+           'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
+           'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
+           'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY' ]
+
+streets = [ 'MAIN ST', 'OAK AVE', 'PINE ST', 'MAPLE DR', 'CEDAR LN',
+            'ELM ST', 'WASHINGTON BLVD', 'LAKE RD', 'HILL ST', 'PARK AVE' ]
+
+fields = [ 'street1', 'street2', 'street3', 'city', 'state', 'postalcode',
+           'lat', 'lon' ]
+
+def addresses(rows, seed = 1):
+    '''
+    Yields 'rows' address tuples in the order given by 'fields'.
+    '''
+
+    rnd = random.Random(seed)
+    for i in range(rows):
+        state = rnd.choice(states)
+        city = 'CITY {0:d}'.format(rnd.randrange(2000))
+        zipcode = '{0:05d}'.format(rnd.randrange(1000, 99999))
+        street = '{0:d} {1:s}'.format(rnd.randrange(1, 9999),
+                                      rnd.choice(streets))
+        lat = round(rnd.uniform(25.0, 49.0), 6)
+        lon = round(rnd.uniform(-124.0, -67.0), 6)
+        yield (street, '', '', city, state, zipcode, lat, lon)
+
+def make_address_db(path, rows, table = 'us_address', seed = 1):
+    '''
+    Create (or replace) a SQLite address table with 'rows' rows.
+    '''
+
+    db = sqlite3.connect(path)
+    db.execute('drop table if exists {0:s}'.format(table))
+    db.execute('create table {0:s} (street1 text, street2 text, street3 text, '
+               'city text, state text, postalcode text, lat real, lon real)'
+               .format(table))
+
+    sql = 'insert into {0:s} values (?, ?, ?, ?, ?, ?, ?, ?)'.format(table)
+    db.executemany(sql, addresses(rows, seed))
+    db.commit()
+    db.close()
+    return path
@@ -13,12 +13,17 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import argparse
+import io
 import json
+import multiprocessing
 import os
 import random
 import sqlite3
 import sys
 
+from datetime import datetime
+
 from datagen.entitygenerator import EntityGenerator, EntityElement, ArrayElement
 from datagen.cdf import CDF
 from datagen.namegen import USCensusNameSet
@@ -28,47 +33,68 @@ from datagen.gendergen import GenderElement
 from datagen.natidgen import NationalIDElement
 from datagen.dobgen import DOBElement
 from datagen.tradegen import USCreditAccount
+from datagen.sink import openSink
+from datagen.columns import jsonDefault
 
 # TODO - email generator?
 
 # TODO - create address history, with from/to dates.
 
-# TODO - need better phone generator:
-#        - Create a CDF for each zip code with area code frequencies
-#        - do not use invalid exchanges or sequence numbers
+# Entities are generated in shards of a fixed size, spread across the worker
+# processes.  Each entity is seeded from (seed, entity number) (see
+# EntityGenerator.create_at()), so a given seed always produces the same
+# output no matter how the run is divided.
+SHARD_SIZE = 1000
+
+def serialize_csv(e, out = sys.stdout):
+    '''
+    Write one pipe-delimited line per address of the entity.
+    '''
+
+    def text(v):
+        return '' if v is None else str(v)
 
-def serialize_csv(e):
-    fname = e['name'].get('first', '')
-    mname = e['name'].get('middle', '')
-    lname = e['name'].get('last', '')
-    dob = e.get('dob', '')
-    ssn = e.get('ssn', '')
-    phone = e.get('phone', '')
-    gender = e.get('gender', '')
+    names = e.get('names') or [ {} ]
+    fname = text(names[0].get('first'))
+    mname = text(names[0].get('middle'))
+    lname = text(names[0].get('last'))
+    dob = text(e.get('dob'))
+    ssn = text(e.get('ssn'))
+    phone = text(e.get('phone'))
+    gender = text(e.get('gender'))
 
-    for addr in e['addrs']:
+    lines = []
+    for addr in e.get('addresses', []):
         s = '|'.join(( fname, mname, lname,
                        ssn, dob, phone, gender,
-                       addr['street1'], addr['street2'], addr['street3'],
-                       addr['city'], addr['state'], addr['postalcode']) )
-        print(s)
+                       text(addr.get('street1')), text(addr.get('street2')),
+                       text(addr.get('street3')), text(addr.get('city')),
+                       text(addr.get('state')), text(addr.get('postalcode')) ))
+        lines.append(s)
+
+    if len(lines) > 0:
+        out.write('\n'.join(lines) + '\n')
 
     return
 
-def serialize_json(e):
-    print(json.dumps(e))
+def serialize_json(e, out = sys.stdout):
+    out.write(json.dumps(e, default = jsonDefault) + '\n')
     return
 
-def main(argv):
-    if len(argv) > 2:
-        raise Exception('Invalid number of arguments received')
+serializers = { 'json': serialize_json,
+                'csv': serialize_csv }
 
-    n = 10
-    if len(argv) == 2:
-        try:
-            n = int(argv[1])
-        except:
-            raise Exception('Invalid command line argument: ' + argv[1])
+def build_generator(addrPath = None, addrFile = "us_address.db", now = None,
+                    uniqueSSN = False, areaCodes = None):
+    '''
+    Build the EntityGenerator for the default schema.  Addresses are taken
+    from the SQLite database 'addrFile' found in 'addrPath' (by default, the
+    package data directory).  'now' is the reference date for DOBs.  If
+    'uniqueSSN' is True, no two entities of a run share an SSN.  If
+    'areaCodes' is given, it names a file of the area codes used in each ZIP
+    code or state (see PhoneElement.loadAreaCodes()), and phone numbers are
+    given area codes found at their address.
+    '''
 
     egen = EntityGenerator()
 
@@ -76,11 +102,13 @@ def main(argv):
     egen.addElement(gender)
 
     dob = DOBElement(name = 'dob',
-                     dt_format = '%Y%m%d')
+                     dt_format = '%Y%m%d',
+                     now = now)
     egen.addElement(dob)
 
     ssn = NationalIDElement(name = 'ssn',
-                            useDashes = False)
+                            useDashes = False,
+                            unique = uniqueSSN)
     egen.addElement(ssn)
 
     names = USCensusNameSet(name = 'names',
@@ -94,14 +122,24 @@ def main(argv):
     # will be random (range  [1..5) ).  Each address will get a block of phone
     # numbers, and there will be exactly two phone numbers in each block.
 
-    addr = USAddressDB(dbFile = "us_address.db")
+    # small address tables are read into memory; otherwise addresses are
+    # read in batches rather than one query each.  The database is only
+    # read, so it is opened read-only (which lets SQLite skip locking).
+    addr = USAddressDB(datapath = addrPath, dbFile = addrFile,
+                       prefetch = 64, memoryLimit = 64 << 20,
+                       readOnly = True)
     addrBlock = ArrayElement(name = 'addresses',
                              count_fn = EntityElement.count_rand_fn(max=9,
                                                                     min=1),
                              generator = addr)
 
     # Create a block of phone numbers
-    phone = PhoneElement()
+    if areaCodes is not None:
+        phone = PhoneElement(areaCodes = os.path.abspath(areaCodes),
+                             params = { 'zip': '../postalcode',
+                                        'state': '../state' })
+    else:
+        phone = PhoneElement()
     phoneBlock = ArrayElement(name = 'phones',
                               count_fn = EntityElement.count_const_fn(2),
                               generator = phone)
@@ -116,14 +154,104 @@ def main(argv):
                               generator = trade)
     egen.addElement(tradeBlock)
 
-    # create a few entities 
-    serialize = serialize_json
-    #serialize = serialize_csv
-    for i in range(n):
-        entity = egen.create()
-        serialize(entity)
+    return egen.compile()
+
+# the generator used by this (worker) process.  See init_worker().
+worker_egen = None
+
+worker_serialize = None
+
+def init_worker(now, addrPath = None, addrFile = "us_address.db",
+                format = 'json', uniqueSSN = False, areaCodes = None):
+    global worker_egen, worker_serialize
+    worker_egen = build_generator(addrPath, addrFile, now, uniqueSSN,
+                                  areaCodes)
+    worker_serialize = serializers[format]
+    return
+
+def generate_shard(args):
+    '''
+    Generate a single shard of entities, returning the serialized output.
+    '''
+
+    seed, start, count = args
+
+    out = io.StringIO()
+    for e in worker_egen.generate(count, start, seed):
+        worker_serialize(e, out)
+
+    return out.getvalue()
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog = 'datagen',
+                                     description = 'Generate synthetic PII.')
+    parser.add_argument('count', type = int, nargs = '?', default = 10,
+                        help = 'number of entities to generate')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'number of worker processes')
+    parser.add_argument('--seed', type = int, default = None,
+                        help = 'random seed (runs with the same seed produce '
+                               'identical output)')
+    parser.add_argument('--as-of', default = None, metavar = 'YYYY-MM-DD',
+                        help = 'date from which ages are computed (default: '
+                               'today)')
+    parser.add_argument('--address-db', default = None,
+                        help = 'SQLite database of addresses (default: '
+                               'us_address.db in the package data directory)')
+    parser.add_argument('--unique-ssn', action = 'store_true',
+                        help = 'never give two entities the same SSN')
+    parser.add_argument('--area-codes', default = None, metavar = 'FILE',
+                        help = 'CSV of area codes by ZIP code or state '
+                               '(KEY,NPA,WEIGHT); phone numbers use the area '
+                               'codes of their address')
+    parser.add_argument('--format', choices = sorted(serializers.keys()),
+                        default = 'json', help = 'output format')
+    parser.add_argument('--output', default = None,
+                        help = 'output file (default: standard output).  '
+                               'Names ending in .gz are compressed.')
+    args = parser.parse_args(argv[1:])
+
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    seed = args.seed
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(63)
+
+    # every process (and every later run with the same seed) must agree on
+    # the reference date used for DOBs.
+    if args.as_of is not None:
+        now = datetime.strptime(args.as_of, '%Y-%m-%d')
+    else:
+        now = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    addrPath = None
+    addrFile = "us_address.db"
+    if args.address_db is not None:
+        addrPath, addrFile = os.path.split(os.path.abspath(args.address_db))
+
+    initargs = (now, addrPath, addrFile, args.format, args.unique_ssn,
+                args.area_codes)
+
+    n = args.count
+    shards = [ (seed, start, min(SHARD_SIZE, n - start))
+               for start in range(0, n, SHARD_SIZE) ]
+
+    with openSink(args.output) as sink:
+        if args.workers == 1:
+            init_worker(*initargs)
+            for shard in shards:
+                sink.write(generate_shard(shard))
+
+            return 0
+
+        with multiprocessing.Pool(args.workers, initializer = init_worker,
+                                  initargs = initargs) as pool:
+            # imap returns results in order, regardless of completion order
+            for output in pool.imap(generate_shard, shards):
+                sink.write(output)
 
     return 0
 
 if __name__ == '__main__':
-    main(sys.argv)
+    sys.exit(main(sys.argv))
@@ -18,18 +18,301 @@ import sys
 import gzip
 import json
 import os
-import random
 import sqlite3
 
+from collections.abc import Mapping
+
+from datagen import columns
+from datagen import datacache
+from datagen import permutation
+from datagen import spatial
+from datagen import sqlutil
 from datagen.entitygenerator import EntityElement, DictElement
 
-class AddressFile(DictElement):
+class AddressElement(DictElement):
+    '''
+    Base class for the address elements, providing filtered and spatial
+    sampling.
+
+    Addresses may be restricted by passing any of the following in 'params'
+    (each either a value or, as with other params, a path to one):
+
+        state   - the state, eg 'TX' or '/home_state'
+        zip3    - the first three digits of the postal code.  A full postal
+                  code may be given; only its first three digits are used.
+        city    - the city
+
+    Each combination of filters used is backed by an index of the matching
+    rows (see datagen.columns.GroupIndex), built on first use and cached
+    with the compiled data, so a filtered draw is a single random number and
+    needs no scan.  A filter whose value is None is ignored.  If no address
+    matches, a ValueError is raised.
+
+    Addresses may instead be drawn from those near another, with the params
+
+        near    - an address (any mapping with 'lat' and 'lon'), or a
+                  (lat, lon) pair; usually a path such as '../../home'
+        radius  - the distance in km (default RADIUS)
+
+    within() and nearest() answer the same kind of question directly.  These
+    use a grid index of the 'lat' and 'lon' fields (see datagen.spatial),
+    which is also built on first use and cached.
+
+    If unique is True, no address is drawn twice by this element: draws are
+    taken from a shuffle of the table (see datagen.permutation.LazyShuffle),
+    and once every address has been used a RuntimeError is raised.  The
+    order depends on every draw made before, so entities are not
+    independent of one another (see EntityGenerator.create_at()), and
+    separate processes do not share the pool.  getUniqueState() and
+    setUniqueState() save and restore the pool, to resume a run.  Unique
+    draws may not be combined with filters or 'near'.
+    '''
+
+    # default radius for 'near', in km
+    RADIUS = 10.0
+
+    # filter name -> (address field, number of leading characters compared)
+    filters = { 'state': ('state', None),
+                'zip3': ('postalcode', 3),
+                'city': ('city', None) }
+
+    def __init__(self, unique = False, **kwargs):
+        DictElement.__init__(self, **kwargs)
+
+        params = self.params or {}
+        self.filterNames = [ name for name in sorted(AddressElement.filters)
+                             if name in params ]
+        self.indexes = {}      # tuple of filter names -> GroupIndex
+
+        self.useNear = 'near' in params
+        if self.useNear and self.filterNames:
+            raise ValueError('near may not be combined with '
+                             + ', '.join(self.filterNames))
+
+        self.grid = None       # see getGrid()
+
+        self.unique = unique
+        self.shuffle = None    # see getShuffle()
+        if unique and (self.useNear or self.filterNames):
+            raise ValueError('unique may not be combined with filters or near')
+
+        return
+
+    def filterKey(self, values):
+        # the index key for a tuple of field values, in filter order
+        return '\x1f'.join(values)
+
+    def rowKeys(self, names):
+        '''
+        Yields the value of the named filters for each row, in row order.
+        Implemented by subclasses.
+        '''
+
+        raise NotImplementedError()
+
+    def rowCount(self):
+        '''
+        Returns the number of rows.  Implemented by subclasses.
+        '''
+
+        raise NotImplementedError()
+
+    def rowPoints(self):
+        '''
+        Yields the (lat, lon) of each row, in row order.  Implemented by
+        subclasses.
+        '''
+
+        raise NotImplementedError()
+
+    def row(self, pos):
+        '''
+        Returns the address at position 'pos'.  Implemented by subclasses.
+        '''
+
+        raise NotImplementedError()
+
+    def indexSource(self):
+        '''
+        Returns (source, options, digest), describing the data file for
+        datacache.  Implemented by subclasses.
+        '''
+
+        raise NotImplementedError()
+
+    def getGrid(self):
+        if self.grid is not None:
+            return self.grid
+
+        source, options, digest = self.indexSource()
+        cell = spatial.GridIndex.CELL
+        options = { 'source': options, 'cell': cell }
+        if self.useCache:
+            compiled = datacache.load(source, 'addresses.grid', options,
+                                      self.cacheDir, digest = digest)
+            if compiled is not None:
+                self.grid = spatial.GridIndex.fromSections('grid', compiled[1],
+                                                           cell)
+
+        if self.grid is None:
+            self.grid = spatial.GridIndex.build(self.rowPoints(), cell)
+            if self.useCache:
+                datacache.store(source, 'addresses.grid',
+                                self.grid.sections('grid'), options,
+                                directory = self.cacheDir, digest = digest)
+
+        return self.grid
+
+    def within(self, lat, lon, km):
+        '''
+        Returns the addresses within km of (lat, lon).
+        '''
+
+        found = sorted(self.getGrid().within(lat, lon, km))
+        return [ self.row(pos) for pos in found ]
+
+    def nearest(self, lat, lon, k):
+        '''
+        Returns the k addresses nearest to (lat, lon), nearest first.
+        '''
+
+        return [ self.row(pos) for d, pos in self.getGrid().nearest(lat, lon, k) ]
+
+    def drawNear(self):
+        near = self.getParam('near')
+        if near is None:
+            return None
+
+        if isinstance(near, Mapping):
+            lat, lon = near['lat'], near['lon']
+        else:
+            lat, lon = near
+
+        km = float(self.getParam('radius', AddressElement.RADIUS))
+
+        pos = self.getGrid().sample(float(lat), float(lon), km, self.rng.random)
+        if pos is None:
+            raise ValueError('no addresses within {0:g}km of ({1:s}, {2:s})'
+                             .format(km, str(lat), str(lon)))
+
+        return pos
+
+    def getIndex(self, names):
+        index = self.indexes.get(names)
+        if index is not None:
+            return index
+
+        source, options, digest = self.indexSource()
+        options = { 'source': options, 'filters': list(names) }
+        if self.useCache:
+            compiled = datacache.load(source, 'addresses.index', options,
+                                      self.cacheDir, digest = digest)
+            if compiled is not None:
+                index = columns.GroupIndex.fromSections('index', compiled[1])
+
+        if index is None:
+            fields = [ AddressElement.filters[name] for name in names ]
+            index = columns.GroupIndex.build(
+                        self.filterKey([ '' if v is None else str(v)[:n]
+                                         for v, (f, n) in zip(values, fields) ])
+                        for values in self.rowKeys(names))
+
+            if self.useCache:
+                datacache.store(source, 'addresses.index',
+                                index.sections('index'), options,
+                                directory = self.cacheDir, digest = digest)
+
+        self.indexes[names] = index
+        return index
+
+    def getShuffle(self):
+        if self.shuffle is None:
+            self.shuffle = permutation.LazyShuffle(self.rowCount())
+
+        return self.shuffle
+
+    def getUniqueState(self):
+        '''
+        Returns the state of the pool of unused addresses (see unique), as
+        JSON-serializable values.
+        '''
+
+        return self.getShuffle().getState()
+
+    def setUniqueState(self, state):
+        self.getShuffle().setState(state)
+
+    def drawUnique(self):
+        shuffle = self.getShuffle()
+        if shuffle.remaining() == 0:
+            raise RuntimeError('all {0:d} addresses have been used'
+                               .format(shuffle.size))
+
+        return shuffle.draw(self.rng.random)
+
+    def drawFiltered(self):
+        '''
+        Returns the position of a random row matching the filters (or near
+        the 'near' address, or not yet used), or None if there are none to
+        apply.
+        '''
+
+        if self.unique:
+            return self.drawUnique()
+
+        if self.useNear:
+            return self.drawNear()
+
+        names = []
+        values = []
+        for name in self.filterNames:
+            v = self.getParam(name)
+            if v is not None:
+                names.append(name)
+                values.append(str(v)[:AddressElement.filters[name][1]])
+
+        if len(names) == 0:
+            return None
+
+        index = self.getIndex(tuple(names))
+        pos = index.draw(self.filterKey(values), self.rng.random)
+        if pos is None:
+            raise ValueError('no addresses with ' +
+                             ', '.join([ '{0:s} = {1:s}'.format(n, v)
+                                         for n, v in zip(names, values) ]))
+
+        return pos
+
+class AddressFile(AddressElement):
+    '''
+    Draws addresses from a gzipped text file, one address per line with the
+    values of 'fields' separated by '|'.
+
+    The addresses are held by column (see datagen.columns) rather than as a
+    dict per address.  Fields named in 'dictFields' repeat heavily (city,
+    state, ...) and are stored as an index into their distinct values.
+    Fields named in 'floatFields' are stored as numbers (lines where they are
+    not are skipped).  All other fields are packed strings.
+
+    If useCache is True (default), the columns are saved in compiled form
+    (see datagen.datacache) in cacheDir, and later instances map them
+    straight from the cache file.
+
+    Each address is returned as a new dict, as AddressDB returns them, so
+    children added to one address never reach another and entities may be
+    passed straight to json.dumps().
+    '''
+
     def __init__(self, datapath=None,
                        dataFile=None,
                        fields = [],
+                       dictFields = (),
+                       floatFields = (),
+                       useCache = True,
+                       cacheDir = None,
                        **kwargs ):
 
-        DictElement.__init__(self, **kwargs)
+        AddressElement.__init__(self, **kwargs)
 
         if datapath is None:
             p = os.path.dirname(__file__)
@@ -38,44 +321,170 @@ class AddressFile(DictElement):
         if datapath is not None:
             dataFile = os.path.join(datapath, dataFile)
 
-        addrs = []
+        options = { 'fields': list(fields),
+                    'dictFields': sorted(dictFields),
+                    'floatFields': sorted(floatFields) }
+
+        compiled = None
+        if useCache:
+            compiled = datacache.load(dataFile, 'addresses', options, cacheDir)
+
+        if compiled is not None:
+            meta, sections = compiled
+            cols = columns.fromSections(meta['kinds'], sections)
+        else:
+            cols = self._parse(dataFile, fields, dictFields, floatFields)
+            if useCache:
+                kinds, sections = columns.toSections(cols)
+                datacache.store(dataFile, 'addresses', sections, options,
+                                { 'kinds': kinds }, cacheDir)
+
+        self.dataFile = dataFile
+        self.options = options
+        self.useCache = useCache
+        self.cacheDir = cacheDir
+
+        self.fields = fields
+        self.columns = [ cols[field] for field in fields ]
+        self.columnMap = { field: cols[field] for field in fields }
+        self.count = len(self.columns[0]) if fields else 0
+
+        return
+
+    def _parse(self, dataFile, fields, dictFields, floatFields):
+        '''
+        Read the text form of the address file.  Returns a dict of columns,
+        by field name.
+        '''
+
+        cols = {}
+        for field in fields:
+            if field in floatFields:
+                cols[field] = columns.FloatColumn()
+            elif field in dictFields:
+                cols[field] = columns.DictColumn()
+            else:
+                cols[field] = columns.StringColumn()
+
+        appends = [ cols[field].append for field in fields ]
+        numeric = [ n for n, field in enumerate(fields) if field in floatFields ]
         nfields = len(fields)
 
         f = gzip.open(dataFile, 'rt', encoding='utf-8')
         for line in f:
-            cols = line.strip().split('|')
-            if len(cols) != nfields:
+            vals = line.strip().split('|')
+            if len(vals) != nfields:
                 print("Invalid number of fields in address: " + line)
                 continue
 
-            d = {}
-            n = 0
-            for field in fields:
-                d[field] = cols[n]
-                n += 1
+            try:
+                for n in numeric:
+                    vals[n] = float(vals[n])
+            except ValueError:
+                print("Invalid number in address: " + line)
+                continue
 
-            addrs.append(d)
+            for append, v in zip(appends, vals):
+                append(v)
 
         f.close()
 
+        for col in cols.values():
+            col.finish()
 
-        self.fields = fields
-        self.addrs = addrs
+        return cols
 
-        return
+    def rowKeys(self, names):
+        cols = []
+        for name in names:
+            field = AddressElement.filters[name][0]
+            if field not in self.columnMap:
+                raise ValueError('cannot filter by {0:s}: no {1:s} field'
+                                 .format(name, field))
+
+            cols.append(self.columnMap[field])
+
+        for i in range(self.count):
+            yield [ col[i] for col in cols ]
+
+    def rowCount(self):
+        return self.count
+
+    def rowPoints(self):
+        for field in ('lat', 'lon'):
+            if field not in self.columnMap:
+                raise ValueError('no {0:s} field in {1:s}'
+                                 .format(field, self.dataFile))
+
+        lat = self.columnMap['lat']
+        lon = self.columnMap['lon']
+        for i in range(self.count):
+            yield (lat[i], lon[i])
+
+    def row(self, pos):
+        return { field: col[pos] for field, col in self.columnMap.items() }
+
+    def indexSource(self):
+        return (self.dataFile, self.options, True)
 
     def create(self, **kwargs):
-        r = int(random.random() * len(self.addrs))
-        d = self.addrs[r]
+        r = None
+        if self.filterNames or self.useNear or self.unique:
+            r = self.drawFiltered()
+
+        if r is None:
+            r = int(self.rng.random() * self.count)
+
+        d = self.row(r)
 
         DictElement.addChildren(self, d, **kwargs)
         return d
 
-class AddressDB(DictElement):
+class AddressDB(AddressElement):
     '''
     Implements support for pulling addresses from a SQLite database.
+
+    By default, each address is read with its own query.  Two faster modes
+    are available:
+
+        prefetch    - if greater than zero, record numbers are drawn this
+                      many at a time and the rows read with a single query.
+                      Addresses are then taken from this batch in turn.
+        memoryLimit - if the database file is no larger than this (in
+                      bytes), the whole table is read into memory, one list
+                      per column, when the element is created.  No queries
+                      are made after that.
+
+    Whichever mode is used, each address is returned as a new dict.
+
+    Either way, record numbers are drawn from the element's rng exactly as
+    they would be otherwise, so the addresses generated are the same.
+
+    Record numbers are drawn from an index of those actually present in the
+    table (see datagen.sqlutil.loadKeys()), so the table may have gaps.
+
+    Filtered, 'near' and unique draws (see AddressElement) are made
+    directly, rather than from any prefetched rows.
+
+    If readOnly is True, the database is opened read-only and tuned for
+    lookups (see datagen.sqlutil.connect()).  It must not be modified while
+    the element is in use.
+
+    The element keeps no connection of its own.  Each thread (and process)
+    uses its own from datagen.sqlutil.pool, so the element may be used from
+    several threads, and pickled.
     '''
 
+    # the most host parameters we use in a single statement.  Older SQLite
+    # releases allow no more than 999.
+    MAX_VARS = 500
+
+    # after the streams are reseeded, prefetching starts with a batch of this
+    # size and doubles with each batch, up to 'prefetch'.  An entity seldom
+    # needs more than a few addresses, so a full batch would be mostly
+    # discarded.
+    FIRST_BATCH = 8
+
     @staticmethod
     def sqlite_dict_factory(c, r):
         '''
@@ -92,9 +501,14 @@ class AddressDB(DictElement):
                        dbFile=None,
                        rownum_col='rowid',
                        table_name=None,
+                       prefetch=0,
+                       memoryLimit=0,
+                       useCache=True,
+                       cacheDir=None,
+                       readOnly=False,
                        **kwargs ):
 
-        DictElement.__init__(self, **kwargs)
+        AddressElement.__init__(self, **kwargs)
 
         if datapath is None:
             p = os.path.dirname(__file__)
@@ -103,44 +517,212 @@ class AddressDB(DictElement):
         if datapath is not None:
             dbFile = os.path.join(datapath, dbFile)
 
-        db = sqlite3.connect(dbFile)
-        cursor = db.cursor()
+        self.dbFile = os.path.abspath(dbFile)
+        self.readOnly = readOnly
+        self.useCache = useCache
+        self.cacheDir = cacheDir
+        db = self.db
 
         # careful -- sql injection possible here
-        min_sql = 'select min({0:s}) from {1:s}'.format(rownum_col, table_name)
-        cursor.execute(min_sql)
-        self.min_recno = cursor.fetchone()[0]
+        keys = sqlutil.loadKeys(db, dbFile, table_name, rownum_col,
+                                useCache, cacheDir)
+        self.keys = keys
+        self.min_recno = keys[0]
+        self.max_recno = keys[-1]
+
+        # the columns returned (as 'select *' would, less the rownum column)
+        columns = []
+        for row in db.execute("pragma table_info('{0:s}')".format(table_name)):
+            if row[1] != rownum_col:
+                columns.append(row[1])
 
-        # careful -- sql injection possible here
-        max_sql = 'select max({0:s}) from {1:s}'.format(rownum_col, table_name)
-        cursor.execute(max_sql)
-        self.max_recno = cursor.fetchone()[0]
+        self.rownum_col = rownum_col
+        self.table_name = table_name
+        self.columns = columns
+
+        # careful -- sql injection possible here.  Rows are returned as
+        # tuples (turned into dicts with 'columns'), and the batch and table
+        # scans also return the rownum first.  The IN list is added for each
+        # batch.
+        self.query_sql = 'select {0:s} from {1:s} where {2:s} = ?'.format(
+                             ', '.join(columns), table_name, rownum_col)
+
+        sql = 'select {0:s}, {1:s} from {2:s}'.format(rownum_col,
+                                                     ', '.join(columns),
+                                                     table_name)
+        self.batch_sql = sql + ' where ' + rownum_col + ' in ({0:s})'
+        self.scan_sql = sql + ' where {0:s} is not null order by {0:s}'.format(rownum_col)
+
+        self.prefetch = prefetch
+        self.ring = []             # prefetched rows (tuples), in draw order
+        self.ringPos = 0           # the next row of ring to be used
+        self.ringEpoch = None      # root.epoch when the ring was filled
+        self.batchSize = 0         # size of the next batch
+
+        self.table = None          # the whole table, by column (see loadTable)
+        if memoryLimit > 0 and os.path.getsize(dbFile) <= memoryLimit:
+            self.table = self.loadTable()
+            self.tableColumns = dict(zip(self.columns, self.table))
 
-        #print("min(recno): " + str(self.min_recno))
-        #print("max(recno): " + str(self.max_recno))
+        return
 
-        cursor.row_factory = AddressDB.sqlite_dict_factory
+    @property
+    def db(self):
+        return sqlutil.connection(self.dbFile, self.readOnly)
+
+    def __getstate__(self):
+        # the key index may be mapped from the cache; load it again instead
+        state = DictElement.__getstate__(self)
+        state['keys'] = None
+        state['indexes'] = {}
+        state['grid'] = None
+        return state
+
+    def __setstate__(self, state):
+        DictElement.__setstate__(self, state)
+        self.keys = sqlutil.loadKeys(self.db, self.dbFile, self.table_name,
+                                     self.rownum_col, self.useCache,
+                                     self.cacheDir)
+
+    def rowKeys(self, names):
+        fields = [ AddressElement.filters[name][0] for name in names ]
+        for field in fields:
+            if field not in self.columns:
+                raise ValueError('cannot filter by {0:s}: no {1:s} column'
+                                 .format(names[fields.index(field)], field))
+
+        # careful -- sql injection possible here.  Rows are read in key
+        # order, so the positions in the index are positions in keys.
+        sql = 'select {0:s} from {1:s} where {2:s} is not null order by {2:s}'
+        sql = sql.format(', '.join(fields), self.table_name, self.rownum_col)
+        return self.db.execute(sql)
+
+    def rowCount(self):
+        return len(self.keys)
+
+    def rowPoints(self):
+        for field in ('lat', 'lon'):
+            if field not in self.columns:
+                raise ValueError('no {0:s} column in {1:s}'
+                                 .format(field, self.table_name))
 
         # careful -- sql injection possible here
-        sql = 'select * from {0:s} where {1:s} = ?'.format(table_name,
-                                                           rownum_col)
+        sql = 'select lat, lon from {0:s} where {1:s} is not null order by {1:s}'
+        return self.db.execute(sql.format(self.table_name, self.rownum_col))
 
-        self.rownum_col = rownum_col
-        self.table_name = table_name
-        self.query_sql = sql
-        self.cursor = cursor
-        self.db = db
+    def row(self, pos):
+        if self.table is not None:
+            return self.tableRow(pos)
+
+        r = self.keys[pos]
+        row = self.db.execute(self.query_sql, (r, )).fetchone()
+        if row is None:
+            raise RuntimeError('no address with {0:s} = {1:d}'.format(self.rownum_col, r))
+
+        return dict(zip(self.columns, row))
+
+    def indexSource(self):
+        return (self.dbFile, [ self.table_name, self.rownum_col ], False)
+
+    def drawIndex(self):
+        # select a random position in keys
+        return int(self.rng.random() * len(self.keys))
+
+    def drawRecno(self):
+        return self.keys[self.drawIndex()]
+
+    def loadTable(self):
+        '''
+        Read the whole table into memory as a list of values per column,
+        in the same order as keys.  Repeated strings (cities, states) are
+        stored once.
+        '''
+
+        table = [ [] for col in self.columns ]
+        appends = [ col.append for col in table ]
+
+        shared = {}
+        for row in self.db.execute(self.scan_sql):
+            for append, v in zip(appends, row[1:]):
+                if type(v) is str:
+                    v = shared.setdefault(v, v)
+
+                append(v)
+
+        if len(table[0]) != len(self.keys):
+            raise RuntimeError('{0:s} changed while it was being read'
+                               .format(self.table_name))
+
+        return table
+
+    def tableRow(self, i):
+        return { name: col[i] for name, col in self.tableColumns.items() }
+
+    def fillRing(self):
+        '''
+        Draw the next batch of record numbers and read their rows.
+        '''
+
+        recnos = [ self.drawRecno() for i in range(self.batchSize) ]
+
+        rows = {}
+        step = AddressDB.MAX_VARS
+        for i in range(0, len(recnos), step):
+            batch = recnos[i:i + step]
+            sql = self.batch_sql.format(', '.join([ '?' ] * len(batch)))
+            for row in self.db.execute(sql, batch):
+                rows[row[0]] = row[1:]
+
+        ring = []
+        for r in recnos:
+            row = rows.get(r)
+            if row is None:
+                raise RuntimeError('no address with {0:s} = {1:d}'.format(self.rownum_col, r))
+
+            ring.append(row)
+
+        self.ring = ring
+        self.ringPos = 0
         return
 
-    def create(self, **kwargs):
+    def nextRow(self):
+        # rows drawn before the streams were reseeded (see
+        # EntityGenerator.reseed()) belong to another entity.
+        epoch = None
+        if self.root is not None and not self.ownRNG:
+            epoch = self.root.epoch
 
-        # select a random record between min_recno and max_recno (inclusive)
-        r = int(random.random() * (self.max_recno - self.min_recno + 1)) + self.min_recno
-        d = self.cursor.execute(self.query_sql, (r, )).fetchone()
+        if epoch != self.ringEpoch:
+            self.ringEpoch = epoch
+            self.batchSize = min(self.prefetch, AddressDB.FIRST_BATCH)
+            self.ring = []
+        elif self.ringPos >= len(self.ring):
+            self.batchSize = min(self.prefetch, max(self.batchSize * 2,
+                                                    AddressDB.FIRST_BATCH))
+
+        if self.ringPos >= len(self.ring):
+            self.fillRing()
+
+        row = self.ring[self.ringPos]
+        self.ringPos += 1
+        return dict(zip(self.columns, row))
+
+    def create(self, **kwargs):
 
-        # remove the rownum column if it's not the builtin 'rowid'
-        if self.rownum_col != 'rowid':
-            del(d[self.rownum_col])
+        # filtered (and unique) draws are made directly, not from the
+        # prefetched rows
+        pos = None
+        if self.filterNames or self.useNear or self.unique:
+            pos = self.drawFiltered()
+
+        if pos is not None:
+            d = self.row(pos)
+        elif self.table is not None:
+            d = self.tableRow(self.drawIndex())
+        elif self.prefetch > 0:
+            d = self.nextRow()
+        else:
+            d = self.row(self.drawIndex())
 
         DictElement.addChildren(self, d, **kwargs)
         return d
@@ -148,10 +730,14 @@ class AddressDB(DictElement):
 class USAddress(AddressFile):
     def __init__( self, dataFile = 'us_addresses.dat.gz',
                         fields = [ 'street1', 'city', 'state', 'postalcode', 'lat', 'lon' ],
+                        dictFields = ( 'city', 'state', 'postalcode' ),
+                        floatFields = ( 'lat', 'lon' ),
                         **kwargs ):
 
         AddressFile.__init__(self, dataFile = dataFile,
                                    fields = fields,
+                                   dictFields = dictFields,
+                                   floatFields = floatFields,
                                    **kwargs)
         return
 
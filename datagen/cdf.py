@@ -15,11 +15,66 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import array
 import bisect
 import gzip
 import random
 import sys
 
+try:
+    import numpy
+except ImportError:    # numpy is optional; getValues() falls back to python
+    numpy = None
+
+from datagen import datacache
+
+def aliasTable(weights, total = None):
+    '''
+    Build the probability and alias tables for drawing index i with
+    probability weights[i] / total (Vose's method).  'total' defaults to the
+    sum of the weights.  Each of the n slots in the table is selected with
+    equal probability; slot i then gives i with probability prob[i], or
+    alias[i] otherwise.  Returns (prob, alias).
+
+    The tables carry one extra (sentinel) slot which always defers to the
+    last index.  It is only reached when r * n rounds up to n.
+    '''
+
+    n = len(weights)
+    prob = [ 0.0 ] * (n + 1)
+    alias = [ n - 1 ] * (n + 1)
+
+    if total is None:
+        total = sum(weights)
+
+    # scale the weights so that the average is 1.0.
+    scale = n / total if total > 0.0 else 0.0
+    scaled = [ w * scale for w in weights ]
+
+    small = [ i for i, p in enumerate(scaled) if p < 1.0 ]
+    large = [ i for i, p in enumerate(scaled) if p >= 1.0 ]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+
+        prob[s] = scaled[s]
+        alias[s] = l
+
+        # the large entry donates its excess to fill slot s
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # anything remaining is (within rounding error) exactly full
+    for i in large + small:
+        prob[i] = 1.0
+        alias[i] = i
+
+    return (prob, alias)
+
 class CDF(object):
 
     '''
@@ -46,10 +101,19 @@ class CDF(object):
     
     There is no requirement on the range or sum of the frequency values.  All
     frequencies are relative.
+
+    Two selection engines are available.  The default ('bisect') performs a
+    binary search over the cumulative distribution on each draw.  The 'alias'
+    engine builds a Walker/Vose alias table at load time, after which each
+    draw is a constant-time table lookup regardless of the number of values.
+    Both engines produce the same distribution.
     '''
 
+    engines = ( 'bisect', 'alias' )
+
     def __init__(self, dataFile, delimiter = None, isCumulative = False,
-                       skipHeader = False, tagCol = 0, freqCol = 1, valType = None):
+                       skipHeader = False, tagCol = 0, freqCol = 1, valType = None,
+                       engine = 'bisect', useCache = True, cacheDir = None):
         '''
         Create a new CDF, loading distribution data from the named file.
 
@@ -70,12 +134,71 @@ class CDF(object):
 
         distCol identifies the column (by index) which contains the frequency
         distribution.
+
+        engine selects the method used to draw values, and must be one of
+        'bisect' (default) or 'alias'.
+
+        If useCache is True (default), the parsed table is saved in compiled
+        form (see datagen.datacache) in cacheDir, and later instances map the
+        compiled table rather than parsing the text file again.  The
+        compiled table is rebuilt whenever the data file changes.
         '''
 
-        self.cumdist = []
-        self.values = []
+        if engine not in CDF.engines:
+            raise ValueError('Invalid CDF engine: {0:s}'.format(str(engine)))
+
+        self.engine = engine
+
+        # everything which affects the parsed content of the file.  valType
+        # is applied after loading, so it is not included here.
+        options = { 'delimiter': delimiter,
+                    'isCumulative': isCumulative,
+                    'skipHeader': skipHeader,
+                    'tagCol': tagCol,
+                    'freqCol': freqCol }
+
+        compiled = None
+        if useCache:
+            compiled = datacache.load(dataFile, 'cdf', options, cacheDir)
+
+        if compiled is not None:
+            meta, sections = compiled
+            tags = CDF._decode_tags(sections['tags'], meta['count'])
+            self.cumdist = sections['cumdist']
+            self.weights = sections['weights']
+            self.range = meta['range']
+        else:
+            tags = self._parse(dataFile, delimiter, isCumulative, skipHeader,
+                               tagCol, freqCol)
+            if useCache:
+                self._store(dataFile, options, tags, cacheDir)
+
+        if valType == 'int':
+            self.values = [ int(t) if t != "" else None for t in tags ]
+        else:
+            self.values = [ t if t != "" else None for t in tags ]
+
+        self.nvalues = len(self.values)
+        self.arrays = None     # numpy copies of our tables (see getValues)
+        self.prob = None
+        self.alias = None
+        if engine == 'alias':
+            self._build_alias()
 
-        self.range = 0.0
+        return
+
+    def _parse(self, dataFile, delimiter, isCumulative, skipHeader, tagCol,
+                     freqCol):
+        '''
+        Read the text form of the data file, filling in the cumulative
+        distribution (cumdist), the raw frequency of each row (weights) and
+        the range.  Returns the list of tags (value strings).
+        '''
+
+        tags = []
+        cumdist = array.array('d')
+        weights = array.array('d')
+        total = 0.0
 
         if self._is_gzip(dataFile):
             f = gzip.open(dataFile, 'r')
@@ -94,22 +217,79 @@ class CDF(object):
                 continue
 
             if isCumulative:
-                if freq < self.range:
+                if freq < total:
                     raise RuntimeError('cumulative distributions are not sorted!')
 
-                self.range = freq
+                total = freq
             else:
                 if freq == 0.0: continue
-                self.range += freq
-
-            if valType is not None:
-                if valType == 'int':
-                    tag = int(tag)
+                total += freq
 
-            self.values.append(tag if tag != "" else None)
-            self.cumdist.append(self.range)
+            tags.append(tag)
+            cumdist.append(total)
+            weights.append(freq)
 
         f.close()
+
+        self.cumdist = cumdist
+        self.weights = weights
+        self.range = total
+        return tags
+
+    def _store(self, dataFile, options, tags, cacheDir):
+        '''
+        Save the parsed table in compiled form.  Tags are stored as a single
+        utf-8 blob (newline separated, as no tag may contain a newline) along
+        with the byte offset at which each tag begins, so that readers may
+        either split the whole blob or decode individual entries.
+        '''
+
+        encoded = [ t.encode('utf-8') for t in tags ]
+
+        offsets = array.array('q')
+        pos = 0
+        for t in encoded:
+            offsets.append(pos)
+            pos += len(t) + 1
+
+        sections = { 'cumdist': self.cumdist,
+                     'weights': self.weights,
+                     'offsets': offsets,
+                     'tags': b'\n'.join(encoded) }
+
+        meta = { 'count': len(tags), 'range': self.range }
+        datacache.store(dataFile, 'cdf', sections, options, meta, cacheDir)
+        return
+
+    @staticmethod
+    def _decode_tags(blob, count):
+        if count == 0:
+            return []
+
+        return bytes(blob).decode('utf-8').split('\n')
+
+    def _build_alias(self):
+        '''
+        Build the probability and alias tables used by the 'alias' engine
+        (see aliasTable()).
+
+        Rather than keeping the alias indices, we keep the aliased values
+        themselves so that a draw requires only a single list lookup.
+        '''
+
+        # recover the relative weight of each value from the cumulative
+        # distribution.
+        weights = []
+        prev = 0.0
+        for cum in self.cumdist:
+            weights.append(cum - prev)
+            prev = cum
+
+        prob, alias = aliasTable(weights, self.range)
+
+        self.nvalues = len(weights)
+        self.prob = prob
+        self.alias = [ self.values[i] for i in alias ]
         return
 
     @staticmethod
@@ -134,10 +314,84 @@ class CDF(object):
 
         if r is None: r = random.random()
 
+        if self.alias is not None:
+            r *= self.nvalues
+            pos = int(r)
+            if (r - pos) < self.prob[pos]:
+                return self.values[pos]
+
+            return self.alias[pos]
+
         r *= self.range
         pos = bisect.bisect(self.cumdist, r)
         return self.values[pos]
 
+    def getValues(self, n, rng = None):
+        '''
+        Select n random values, returned as a list.
+
+        'rng' is the source of the uniform draws.  It may be None (the
+        standard random library), a random.Random instance, or a
+        numpy.random.Generator.  Given the same python random state, the
+        result is identical to n successive calls to getValue(), whether or
+        not numpy is available; numpy only changes how the draws are resolved
+        into values (a single vectorized search rather than n bisects).
+        '''
+
+        if numpy is not None and isinstance(rng, numpy.random.Generator):
+            r = rng.random(n)
+        else:
+            rnd = random.random if rng is None else rng.random
+            r = [ rnd() for i in range(n) ]
+
+        if numpy is None:
+            getValue = self.getValue
+            return [ getValue(x) for x in r ]
+
+        if self.arrays is None:
+            self._build_arrays()
+
+        a = self.arrays
+        r = numpy.asarray(r, dtype = numpy.float64)
+
+        if self.alias is not None:
+            r = r * self.nvalues
+            pos = r.astype(numpy.int64)
+            hit = (r - pos) < a['prob'][pos]
+            return numpy.where(hit, a['slots'][pos], a['alias'][pos]).tolist()
+
+        pos = numpy.searchsorted(a['cumdist'], r * self.range, side = 'right')
+        return a['values'][pos].tolist()
+
+    def _build_arrays(self):
+        '''
+        Copy our tables into numpy arrays for use by getValues().  This is
+        done on first use so that the cost is not paid by callers drawing
+        only one value at a time.
+        '''
+
+        values = numpy.empty(len(self.values), dtype = object)
+        values[:] = self.values
+
+        a = { 'values': values,
+              'cumdist': numpy.asarray(self.cumdist, dtype = numpy.float64) }
+
+        if self.alias is not None:
+            # the alias table has a trailing sentinel slot; pad the values to
+            # match so that both may be indexed by slot.
+            slots = numpy.empty(len(self.alias), dtype = object)
+            slots[:-1] = self.values
+            slots[-1] = self.alias[-1]
+            a['slots'] = slots
+
+            alias = numpy.empty(len(self.alias), dtype = object)
+            alias[:] = self.alias
+            a['alias'] = alias
+            a['prob'] = numpy.asarray(self.prob, dtype = numpy.float64)
+
+        self.arrays = a
+        return
+
 
 def main(argv):
     delimiter = None
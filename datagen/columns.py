@@ -0,0 +1,349 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from array import array
+from collections.abc import Mapping, MutableMapping
+
+# ### Packed Columns ###
+# Reference tables with millions of rows are far too large to keep as a
+# Python object per value.  The column types here keep a table field in a
+# few packed buffers instead:
+#
+#     StringColumn - strings as a single utf-8 blob, plus the offset at which
+#                    each one starts (offsets has one more entry than there
+#                    are rows).
+#     DictColumn   - repeated strings (city, state, ...) as an index into a
+#                    list of the distinct values.
+#     FloatColumn  - an array('d').
+#
+# Each column may be saved as datacache sections and mapped back in, in
+# which case the buffers are memoryviews over the cache file.  Values are
+# read with col[i].  Columns are filled with append(), and finish() is called
+# once the last value has been appended.
+#
+# Rather than copy a row into a dict, elements may return a RowView: a
+# mapping which reads the row straight from its columns.
+
+class StringColumn(object):
+
+    kind = 'str'
+
+    def __init__(self, blob = None, offsets = None):
+        if offsets is None:
+            blob = bytearray()
+            offsets = array('q', [ 0 ])
+
+        self.blob = blob
+        self.offsets = offsets
+
+    def append(self, value):
+        self.blob += value.encode('utf-8')
+        self.offsets.append(len(self.blob))
+
+    def finish(self):
+        self.blob = bytes(self.blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def sections(self, name):
+        return { name + '.blob': self.blob,
+                 name + '.offsets': self.offsets }
+
+    @staticmethod
+    def fromSections(name, sections):
+        return StringColumn(sections[name + '.blob'],
+                            sections[name + '.offsets'])
+
+
+class DictColumn(object):
+
+    kind = 'dict'
+
+    def __init__(self, codes = None, values = None):
+        if codes is None:
+            codes = array('I')
+            values = []
+
+        self.codes = codes
+        self.values = values
+        self.lookup = None     # value -> code, while appending
+
+    def append(self, value):
+        if self.lookup is None:
+            self.lookup = { v: i for i, v in enumerate(self.values) }
+
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[value] = code
+
+        self.codes.append(code)
+
+    def finish(self):
+        self.lookup = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def sections(self, name):
+        values = StringColumn()
+        for v in self.values:
+            values.append(v)
+
+        d = values.sections(name + '.values')
+        d[name + '.codes'] = self.codes
+        return d
+
+    @staticmethod
+    def fromSections(name, sections):
+        values = StringColumn.fromSections(name + '.values', sections)
+        return DictColumn(sections[name + '.codes'],
+                          [ values[i] for i in range(len(values)) ])
+
+
+class FloatColumn(object):
+
+    kind = 'float'
+
+    def __init__(self, values = None):
+        if values is None:
+            values = array('d')
+
+        self.values = values
+
+    def append(self, value):
+        self.values.append(float(value))
+
+    def finish(self):
+        pass
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def sections(self, name):
+        return { name + '.values': self.values }
+
+    @staticmethod
+    def fromSections(name, sections):
+        return FloatColumn(sections[name + '.values'])
+
+
+class RowView(MutableMapping):
+    '''
+    A dict-like view of row 'index' of a table held by column.  'columns'
+    maps field names to columns (anything indexable, including lists) and is
+    shared by every view of the table.
+
+    The row itself is read-only.  Values assigned to the view (eg, the
+    children added by DictElement.addChildren()) are kept in a small overlay
+    belonging to this view alone, and hide any row field of the same name.
+    Views are neither dicts nor JSON-serializable as they stand; see
+    jsonDefault().
+    '''
+
+    __slots__ = ( 'columns', 'index', 'overlay' )
+
+    def __init__(self, columns, index):
+        self.columns = columns
+        self.index = index
+        self.overlay = None
+
+    def __getitem__(self, key):
+        overlay = self.overlay
+        if overlay is not None and key in overlay:
+            return overlay[key]
+
+        return self.columns[key][self.index]
+
+    def __setitem__(self, key, value):
+        if self.overlay is None:
+            self.overlay = {}
+
+        self.overlay[key] = value
+
+    def __delitem__(self, key):
+        if self.overlay is None or key not in self.overlay:
+            if key in self.columns:
+                raise TypeError('row fields are read-only')
+
+            raise KeyError(key)
+
+        del self.overlay[key]
+
+    def __iter__(self):
+        overlay = self.overlay
+        for key in self.columns:
+            if overlay is None or key not in overlay:
+                yield key
+
+        if overlay is not None:
+            yield from overlay
+
+    def __len__(self):
+        n = len(self.columns)
+        if self.overlay is not None:
+            n += len([ k for k in self.overlay if k not in self.columns ])
+
+        return n
+
+    def __contains__(self, key):
+        return key in self.columns or \
+               (self.overlay is not None and key in self.overlay)
+
+    def __repr__(self):
+        return 'RowView({0:s})'.format(repr(dict(self)))
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        # the columns may be mapped from a cache file; pickle (and deepcopy)
+        # the row as a plain dict.
+        return (dict, (dict(self),))
+
+
+def jsonDefault(obj):
+    '''
+    A 'default' for json.dump() and json.dumps() which serializes RowViews
+    (and any other Mapping) as objects.
+    '''
+
+    if isinstance(obj, Mapping):
+        return dict(obj)
+
+    raise TypeError('Object of type {0:s} is not JSON serializable'
+                    .format(type(obj).__name__))
+
+
+class GroupIndex(object):
+    '''
+    The row numbers of a table grouped by a key (eg, the state of each
+    address), so that a random row with a given key may be drawn in
+    constant time.  The rows of group i are rows[starts[i]:starts[i + 1]],
+    in ascending order.
+    '''
+
+    def __init__(self, keys, starts, rows):
+        self.keys = keys       # the key of each group
+        self.starts = starts
+        self.rows = rows
+        self.lookup = { k: i for i, k in enumerate(keys) }
+
+    @staticmethod
+    def build(rowKeys):
+        '''
+        Build the index from an iterable giving the key of each row, in
+        order.
+        '''
+
+        lookup = {}
+        codes = array('I')
+        for k in rowKeys:
+            code = lookup.get(k)
+            if code is None:
+                code = lookup[k] = len(lookup)
+
+            codes.append(code)
+
+        # counting sort of the row numbers by group
+        starts = array('q', [ 0 ]) * (len(lookup) + 1)
+        for code in codes:
+            starts[code + 1] += 1
+
+        for i in range(len(lookup)):
+            starts[i + 1] += starts[i]
+
+        pos = array('q', starts)
+        rows = array('I', [ 0 ]) * len(codes)
+        for i, code in enumerate(codes):
+            rows[pos[code]] = i
+            pos[code] += 1
+
+        return GroupIndex(list(lookup), starts, rows)
+
+    def count(self, key):
+        code = self.lookup.get(key)
+        if code is None:
+            return 0
+
+        return self.starts[code + 1] - self.starts[code]
+
+    def draw(self, key, rnd):
+        '''
+        Returns a random row with the given key, using rnd() (eg,
+        random.random) as the source of random numbers, or None if there is
+        no such row.
+        '''
+
+        code = self.lookup.get(key)
+        if code is None:
+            return None
+
+        start = self.starts[code]
+        return self.rows[start + int(rnd() * (self.starts[code + 1] - start))]
+
+    def sections(self, name):
+        keys = StringColumn()
+        for k in self.keys:
+            keys.append(k)
+
+        d = keys.sections(name + '.keys')
+        d[name + '.starts'] = self.starts
+        d[name + '.rows'] = self.rows
+        return d
+
+    @staticmethod
+    def fromSections(name, sections):
+        keys = StringColumn.fromSections(name + '.keys', sections)
+        return GroupIndex([ keys[i] for i in range(len(keys)) ],
+                          sections[name + '.starts'],
+                          sections[name + '.rows'])
+
+
+kinds = { 'str': StringColumn,
+          'dict': DictColumn,
+          'float': FloatColumn }
+
+def toSections(columns):
+    '''
+    Returns (kinds, sections) for a dict of named columns, as stored by
+    datacache.store().  'kinds' is kept with the cache metadata.
+    '''
+
+    sections = {}
+    for name, col in columns.items():
+        sections.update(col.sections(name))
+
+    return ({ name: col.kind for name, col in columns.items() }, sections)
+
+def fromSections(kindMap, sections):
+    '''
+    Rebuild the dict of named columns saved by toSections().
+    '''
+
+    return { name: kinds[kind].fromSections(name, sections)
+             for name, kind in kindMap.items() }
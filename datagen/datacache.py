@@ -0,0 +1,328 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+# ### Compiled Data Cache ###
+# Parsing the reference data files (gunzip, decode, split, float()) is the
+# bulk of our start-up cost.  This module stores the parsed form of a data
+# file as a set of packed binary "sections" which may be mapped straight back
+# into memory on the next run.
+#
+# A cache file is laid out as:
+#
+#     MAGIC (8 bytes)
+#     header length (uint32, little endian)
+#     header (JSON, utf-8)
+#     section data, each section aligned to 8 bytes
+#
+# The header records the path, size, mtime and (optionally) a digest of the
+# source file, and the size and mtime of its SQLite write-ahead log, if it has
+# one.  If any of these no longer match, the cache file is ignored and will be
+# rebuilt by the caller.  Writing a new cache file removes any others (in the
+# same directory) built from an earlier version of the same source file, or
+# from a source file which no longer exists.
+#
+# Sections are array.array objects (stored with their typecode) or bytes.  On
+# load, each section is returned as a memoryview over the mapped file, cast
+# to the original typecode.
+
+MAGIC = b'DGCACHE\x01'
+ALIGN = 8
+
+def cacheDir():
+    '''
+    Returns the default directory for compiled data files.  This may be set
+    with the DATAGEN_CACHE_DIR environment variable, and otherwise follows
+    the XDG convention (~/.cache/datagen).
+    '''
+
+    d = os.environ.get('DATAGEN_CACHE_DIR')
+    if d:
+        return d
+
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base, 'datagen')
+
+def cachePath(source, kind, options = None, directory = None):
+    '''
+    Returns the name of the cache file holding the compiled form of 'source'.
+    'kind' identifies the type of compiled data (eg, 'cdf') and 'options' is
+    a JSON-serializable description of any parse options which affect its
+    content.  Each distinct (source, kind, options) gets its own file.
+    '''
+
+    if directory is None:
+        directory = cacheDir()
+
+    source = os.path.abspath(source)
+    key = json.dumps([ source, kind, options ], sort_keys = True)
+    tag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    name = '{0:s}.{1:s}.{2:s}.dgc'.format(os.path.basename(source), kind, tag)
+    return os.path.join(directory, name)
+
+def signature(source, digest = True):
+    '''
+    Describe the current state of the source file.  If digest is False, only
+    the size and modification time are used.  This is appropriate for very
+    large files (databases) where reading the full content would defeat the
+    purpose of the cache.
+
+    A SQLite database in WAL mode may change without the file itself
+    changing, so the size and modification time of its '-wal' file are
+    included when there is one.
+    '''
+
+    st = os.stat(source)
+    sig = { 'size': st.st_size, 'mtime_ns': st.st_mtime_ns }
+
+    try:
+        st = os.stat(source + '-wal')
+        sig['wal'] = [ st.st_size, st.st_mtime_ns ]
+    except OSError:
+        pass
+
+    if digest:
+        h = hashlib.blake2b(digest_size = 16)
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+
+        sig['digest'] = h.hexdigest()
+
+    return sig
+
+def store(source, kind, sections, options = None, meta = None,
+          directory = None, digest = True, path = None):
+    '''
+    Write the compiled sections for 'source'.  'sections' is a dict mapping
+    section names to array.array or bytes objects.  'meta' may contain any
+    additional JSON-serializable values the loader will need.  The file is
+    written to 'path' if given, and otherwise to cachePath() in 'directory'.
+
+    Returns the name of the file written, or None if the cache could not be
+    written (eg, a read-only file system).  Failure to write a cache is never
+    fatal.
+    '''
+
+    if path is None:
+        path = cachePath(source, kind, options, directory)
+
+    layout = {}
+    blobs = []
+    offset = 0
+    for name, data in sections.items():
+        if isinstance(data, (bytes, bytearray)):
+            typecode = 'B'
+        else:
+            typecode = data.typecode
+            data = data.tobytes()
+
+        pad = (-offset) % ALIGN
+        offset += pad
+        layout[name] = [ typecode, offset, len(data) ]
+        blobs.append((pad, data))
+        offset += len(data)
+
+    header = { 'kind': kind,
+               'path': os.path.abspath(source),
+               'options': options,
+               'source': signature(source, digest),
+               'meta': meta,
+               'sections': layout }
+
+    hdr = json.dumps(header, sort_keys = True).encode('utf-8')
+
+    # section offsets are relative to the (aligned) end of the header
+    hdr_len = len(MAGIC) + 4 + len(hdr)
+    hdr_pad = (-hdr_len) % ALIGN
+
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        # write to a temporary name and rename so that a concurrent reader
+        # never sees a partial file.
+        fd, tmp = tempfile.mkstemp(dir = os.path.dirname(path),
+                                   suffix = '.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(hdr)))
+            f.write(hdr)
+            f.write(b'\x00' * hdr_pad)
+            for pad, data in blobs:
+                f.write(b'\x00' * pad)
+                f.write(data)
+
+        os.replace(tmp, path)
+        tmp = None
+    except OSError:
+        return None
+    finally:
+        # don't leave a partial file behind (including on KeyboardInterrupt)
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    evict(source, header['source'], os.path.dirname(path))
+    return path
+
+def readHeader(path):
+    '''
+    Returns the header of the cache file 'path', or None if it cannot be
+    read or is not a cache file.
+    '''
+
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+
+            hdr_len = struct.unpack('<I', f.read(4))[0]
+            return json.loads(f.read(hdr_len).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+
+def stale(old, sig):
+    '''
+    Returns True if the signatures 'old' and 'sig' describe different
+    versions of a file.  Signatures made with and without a digest may
+    describe the same version.
+    '''
+
+    for k in set(old) | set(sig):
+        if k == 'digest' and (k not in old or k not in sig):
+            continue
+
+        if old.get(k) != sig.get(k):
+            return True
+
+    return False
+
+def evict(source = None, sig = None, directory = None):
+    '''
+    Remove the cache files in 'directory' built from a source file which no
+    longer exists, or (if 'source' is given) from 'source' when it had a
+    signature other than 'sig' (ie, an earlier version of the file).  Cache
+    files for the current version, of any kind or options, are kept.  Files
+    written before the source path was recorded are left alone.
+
+    Returns the names of the files removed.
+    '''
+
+    if directory is None:
+        directory = cacheDir()
+
+    if source is not None:
+        source = os.path.abspath(source)
+
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+
+    removed = []
+    for name in names:
+        if not name.endswith('.dgc'):
+            continue
+
+        path = os.path.join(directory, name)
+        header = readHeader(path)
+        if header is None or header.get('path') is None:
+            continue
+
+        if header['path'] == source:
+            remove = stale(header.get('source') or {}, sig)
+        else:
+            remove = not os.path.exists(header['path'])
+
+        if remove:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                pass
+
+    return removed
+
+def load(source, kind, options = None, directory = None, digest = True,
+         path = None):
+    '''
+    Map the compiled form of 'source', if a valid one exists (in 'path' if
+    given, and otherwise in cachePath() in 'directory').
+
+    Returns a tuple of (meta, sections) where sections is a dict of
+    memoryviews, or None if there is no cache file or it is stale.
+    '''
+
+    if path is None:
+        path = cachePath(source, kind, options, directory)
+
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except (OSError, ValueError):    # empty or unmappable file
+            return None
+
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            return None
+
+        start = len(MAGIC) + 4
+        hdr_len = struct.unpack('<I', mm[len(MAGIC):start])[0]
+        header = json.loads(mm[start:start + hdr_len].decode('utf-8'))
+    except (ValueError, struct.error):
+        return None
+
+    # compare options as they would have been stored (tuples become lists)
+    options = json.loads(json.dumps(options))
+    if header.get('kind') != kind or header.get('options') != options:
+        return None
+
+    # check the cheap attributes before computing a digest
+    sig = header.get('source', {})
+    if stale(sig, signature(source, digest = False)):
+        return None
+
+    if digest and sig.get('digest') != signature(source)['digest']:
+        return None
+
+    base = start + hdr_len
+    base += (-base) % ALIGN
+
+    view = memoryview(mm)
+    sections = {}
+    for name, (typecode, offset, length) in header['sections'].items():
+        mv = view[base + offset:base + offset + length]
+        sections[name] = mv.cast(typecode) if typecode != 'B' else mv
+
+    return (header.get('meta'), sections)
@@ -15,9 +15,10 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-import random
+import math
 import sys
 from datetime import datetime, timedelta
+from datagen.cdf import aliasTable
 from datagen.entitygenerator import EntityElement, SimpleElement
 
 class DOBElement(SimpleElement):
@@ -76,43 +77,135 @@ class DOBElement(SimpleElement):
 
         return
 
+    def initDays(self):
+        '''
+        Spread the age distribution over whole days.  An age of 'a' days is
+        the date a days before 'now'; its weight is the share of each age
+        bracket falling on that date.  Ages younger than min_age years are
+        left out.  Dates are then drawn from an alias table (see
+        datagen.cdf.aliasTable()) with a single random number.
+        '''
+
+        now = self.now
+        midnight = now.replace(hour = 0, minute = 0, second = 0,
+                               microsecond = 0)
+
+        # an age of x (fractional) days falls on the date ceil(x - frac)
+        # days before now, where frac is the part of today already past.
+        frac = (now - midnight).total_seconds() / 86400.0
+
+        minDays = 0.0
+        if self.min_age is not None:
+            minDays = self.min_age * 365.25
+
+        weights = {}           # age in days -> weight
+        for prev_pct, cum_pct, base_days, range_days in self.cdf:
+            lo = max(base_days, minDays)
+            hi = base_days + range_days
+            if hi <= lo:
+                continue
+
+            density = (cum_pct - prev_pct) / range_days
+            a = math.ceil(lo - frac)
+            while a - 1 + frac < hi:
+                overlap = min(hi, a + frac) - max(lo, a - 1 + frac)
+                if overlap > 0.0:
+                    weights[a] = weights.get(a, 0.0) + overlap * density
+
+                a += 1
+
+        if len(weights) == 0:
+            raise ValueError('no ages of at least {0:s} years in the '
+                             'distribution'.format(str(self.min_age)))
+
+        self.ages = sorted(weights)
+        self.prob, self.alias = aliasTable([ weights[a] for a in self.ages ])
+        self.formatted = {}    # dt_format -> formatted date of each age
+        return
+
     def __init__(self, minAge = None,
                        dt_format = '%Y-%m-%d',
                        pctPresent = 0.9382,
+                       now = None,
                        **kwargs):
+        '''
+        'now' is the date (datetime) from which ages are computed, and
+        defaults to the current time.  Generators which must agree with each
+        other (eg, in separate processes) should be given the same value.
+
+        Nobody is younger than 'minAge' years, if given.
+
+        DOBs are whole days: any time fields in 'dt_format' give the time of
+        day of 'now'.
+        '''
 
         SimpleElement.__init__(self, **kwargs)
         self.initCDF()
         self.dt_format = dt_format
         self.pctPresent = pctPresent
         self.min_age = minAge
-        self.now = datetime.now()
+        self.now = now if now is not None else datetime.now()
+        self.initDays()
 
         return
 
-    def create(self, **kwargs):
+    def getFormatted(self):
+        '''
+        Returns the list of formatted dates for dt_format, indexed as ages.
+        Dates are formatted the first time they are drawn.
+        '''
 
-        # TODO - honor self.min_age
+        formatted = self.formatted.get(self.dt_format)
+        if formatted is None:
+            formatted = self.formatted[self.dt_format] = [ None ] * len(self.ages)
 
-        if random.random() >= self.pctPresent:
-            return None
+        return formatted
 
-        # Generate a random number 0..cum_pct. 
-        rnd = random.random() * self.cum_pct
+    def formatAge(self, i):
+        '''
+        Format (and remember) the date of the i'th age.
+        '''
+
+        dt = self.now - timedelta(days = self.ages[i])
+        s = self.getFormatted()[i] = dt.strftime(self.dt_format)
+        return s
 
-        # Find the bucket in the CDF which matches 'rnd'
-        for e in self.cdf:
-            if rnd >= e[0] and rnd < e[1]: break
+    def create(self, **kwargs):
 
-        # 'e' now contains our matching age bracket and we can compute an age
-        # (in days) for the entity.  e[2] contains the "base" (minimum) days
-        # the entity must be in order to fall in this bracket, and e[3]
-        # contains the number of days which span the bracket.  By adding
-        # e[2] to a random number 0..e[3], we get an age in days.
+        if self.rng.random() >= self.pctPresent:
+            return None
 
-        rnd_days = e[2] + (random.random() * e[3])
-        dt = self.now - timedelta(days=rnd_days)
-        return dt.strftime(self.dt_format)
+        r = self.rng.random() * len(self.ages)
+        i = int(r)
+        if (r - i) >= self.prob[i]:
+            i = self.alias[i]
+
+        s = self.getFormatted()[i]
+        return s if s is not None else self.formatAge(i)
+
+    def create_many(self, n):
+        rnd = self.rng.random
+        pctPresent = self.pctPresent
+        nages = len(self.ages)
+        prob = self.prob
+        alias = self.alias
+        formatted = self.getFormatted()
+
+        values = []
+        for k in range(n):
+            if rnd() >= pctPresent:
+                values.append(None)
+                continue
+
+            r = rnd() * nages
+            i = int(r)
+            if (r - i) >= prob[i]:
+                i = alias[i]
+
+            s = formatted[i]
+            values.append(s if s is not None else self.formatAge(i))
+
+        return values
 
 def main(argv):
     dob = DOBElement()
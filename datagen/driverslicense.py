@@ -14,7 +14,6 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-import random
 import string
 import sys
 
@@ -56,7 +55,7 @@ class USDriversLicenseElement(DictElement):
             "ME": lambda: self.dn(7),
             #"MI": lambda: None,  # it's complicated
             #"MN": lambda: None,  # it's complicated
-            "MO": lambda: self.an(1) + self.dn(random.choice([6,7,8,9])),
+            "MO": lambda: self.an(1) + self.dn(self.rng.choice([6,7,8,9])),
             "MS": lambda: self.dn(9),
             #"MT": lambda: None,  # it's complicated
             "NC": lambda: self.dn(12),
@@ -74,7 +73,7 @@ class USDriversLicenseElement(DictElement):
             "RI": lambda: self.dn(7),
             "SC": lambda: self.dn(9),
             "SD": lambda: self.dn(8),
-            "TN": lambda: self.dn(random.choice([8,9])),
+            "TN": lambda: self.dn(self.rng.choice([8,9])),
             "TX": lambda: self.dn(8),
             "UT": lambda: self.dn(9),
             "VA": lambda: '-'.join((self.an(1) + self.dn(2), self.dn(2),
@@ -90,15 +89,13 @@ class USDriversLicenseElement(DictElement):
 
     # returns 'n' random digits as a string padded on the left with leading 0s
     # think of this as "n digits"
-    @staticmethod
-    def dn(n):
-        return ''.join(random.choice(string.digits) for i in range(n))
+    def dn(self, n):
+        return ''.join(self.rng.choice(string.digits) for i in range(n))
 
     # returns 'n' random ascii as a string 
     # think of this as "n alpha"
-    @staticmethod
-    def an(n):
-        return ''.join(random.choice(string.ascii_uppercase) for i in range(n))
+    def an(self, n):
+        return ''.join(self.rng.choice(string.ascii_uppercase) for i in range(n))
 
     # this implementation borrowed from rosettacode.org
     @staticmethod
@@ -119,8 +116,8 @@ class USDriversLicenseElement(DictElement):
             yob = int(dob[0:4])
             mob = int(dob[4:2])
         else:
-            mob = random.choice([1, 2, 3,  4,  5,  6, 7, 8, 9, 10, 11, 12])
-            yob = random.choice([0, 1])
+            mob = self.rng.choice([1, 2, 3,  4,  5,  6, 7, 8, 9, 10, 11, 12])
+            yob = self.rng.choice([0, 1])
 
         if yob == 1: mob += 12
         return "{0:02d}{1:s}".format(mob, self.dn(7))
@@ -131,8 +128,8 @@ class USDriversLicenseElement(DictElement):
     def create(self, state = None, **kwargs):
 
         if state is None:
-            state = random.choice(self.allStates)
-        if random.random() >= self.pctPresent:
+            state = self.rng.choice(self.allStates)
+        if self.rng.random() >= self.pctPresent:
             return None
 
         dl = self.states[state]()
@@ -18,7 +18,6 @@ import sys
 import json
 import gzip
 from bisect import bisect
-import random
 
 from datagen.entitygenerator import EntityGenerator, SimpleElement
 from datagen.cdf import CDF
@@ -36,15 +35,15 @@ class USEmail(SimpleElement):
         return
 
     def create(self):
-        p = random.choice("abcdefghijklmnopqrstuvwxyz")
-        p += random.choice("abcdefghijklmnopqrstuvwxyz")
-        p += random.choice("abcdefghijklmnopqrstuvwxyz")
+        p = self.rng.choice("abcdefghijklmnopqrstuvwxyz")
+        p += self.rng.choice("abcdefghijklmnopqrstuvwxyz")
+        p += self.rng.choice("abcdefghijklmnopqrstuvwxyz")
 
         n = self.seq
         self.seq += 1
         ns = "{0:s}{1:04d}".format(p, n)
 
-        d = self.domains.getValue()
+        d = self.domains.getValue(self.rng.random())
         return "@".join((ns, d))
 
 
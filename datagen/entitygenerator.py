@@ -15,10 +15,17 @@
 #   limitations under the License.
 
 
+import array
+import functools
+import hashlib
+import math
 import os
 import random
+import re
 import sys
 
+from collections.abc import Mapping
+
 # ### Entity Generator ###
 # The EntityGenerator class serves as a container for Elements.  When the
 # create() method is called on this object, it walks through its list of
@@ -61,11 +68,30 @@ class EntityGenerator(object):
     and walking the tree of generator Entities.  EntityElements are added to
     the EntityGenerator much like nodes might be added to an XML document when
      working with DOM.
+
+    Unless given an rng of its own, each element draws its random numbers
+    from a private stream (a random.Random instance) derived from 'seed' and
+    the element's path in the tree (see childRNG()).  create_at() reseeds
+    each stream from (seed, index, path) before generating an entity, which
+    makes any single entity reproducible without generating those before
+    it.
     '''
 
-    def __init__(self):
+    def __init__(self, seed = None):
         self.data = None       # the current data object being built
 
+        self.seed = seed
+        self.rng = random.Random(seed)   # seeds streams if 'seed' is None
+        self.streams = {}                # element path -> random.Random
+
+        # incremented by reseed().  Elements which draw random numbers ahead
+        # of use (eg, AddressDB prefetching) discard them when it changes.
+        self.epoch = 0
+        # the entity about to be generated, set by reseed() and cleared by
+        # create().  None when entities are not generated by index.
+        self.index = None
+        self.runSeed = None    # the seed of the last reseed()
+
         # the fact that children is an array is VERY IMPORTANT.  The order
         # in which the elements are created must be guaranteed so that
         # generators which reference other elements can be guaranteed that
@@ -75,19 +101,57 @@ class EntityGenerator(object):
         # the name before the gender.
 
         self.children = []     # a list of child generators (populate data)
+        self.plan = None       # compiled form of children (see compile())
+
+        # the dicts currently under construction, outermost (self.data)
+        # first.  Relative paths are resolved against this stack.
+        self.stack = []
         return
 
     def addElement(self, elem, label = None):
         if label is None:
             label = elem.name
 
-        elem.setRoot(self)
+        elem.setRoot(self, '/' + str(label))
         x = (label, elem)
         self.children.append(x)
+        self.plan = None       # must be compiled again
         return
 
+    def compile(self):
+        '''
+        Build an execution plan for the element tree.  Each element is
+        reduced to a callable which produces its value, with nested children
+        and array generators resolved into their own callables, and with any
+        path references in element params bound once rather than parsed for
+        every entity.  After compile(), create() runs the plan; the values
+        generated (and the order in which random numbers are drawn) are the
+        same as without it.
+
+        Elements added after compile() discard the plan; call compile() again
+        to rebuild it.
+        '''
+
+        self.plan = [ (label, elem.compile()) for label, elem in self.children ]
+        return self
+
     def create(self, **kwargs):
+        data = self.build(**kwargs)
+
+        # reseed() applies to one entity; any after it are not by index
+        self.index = None
+        return data
+
+    def build(self, **kwargs):
         self.data = {}
+        self.stack = [ self.data ]
+
+        if self.plan is not None and not kwargs:
+            data = self.data
+            for label, fn in self.plan:
+                data[label] = fn()
+
+            return data
 
         for elem in self.children:
             e_nam = elem[0]
@@ -96,29 +160,169 @@ class EntityGenerator(object):
 
         return self.data
 
+    @staticmethod
+    def entitySeed(seed, index, path = ''):
+        '''
+        Derive the seed for the stream of the element at 'path' when
+        generating entity number 'index' of the run seeded with 'seed'.  This
+        is a counter-based scheme: the seed for any entity may be computed
+        directly, without reference to the entities before it.
+        '''
+
+        key = '{0:d}:{1:d}:{2:s}'.format(seed, index, path).encode('utf-8')
+        h = hashlib.blake2b(key, digest_size = 8)
+        return int.from_bytes(h.digest(), 'little')
+
+    def childRNG(self, path):
+        '''
+        Returns the random stream for the element at 'path', creating it if
+        needed.  Streams are independent of one another, so adding an element
+        (or drawing more numbers in one) does not disturb the values
+        generated by the others.
+        '''
+
+        rng = self.streams.get(path)
+        if rng is None:
+            if self.seed is not None:
+                rng = random.Random(EntityGenerator.entitySeed(self.seed, -1, path))
+            else:
+                rng = random.Random(self.rng.getrandbits(64))
+
+            self.streams[path] = rng
+
+        return rng
+
+    def reseed(self, index, seed = None):
+        '''
+        Prepare every element stream to generate entity number 'index' (see
+        create_at()).  Elements given an rng of their own are not affected.
+        '''
+
+        if seed is None:
+            seed = self.seed
+
+        if seed is None:
+            raise ValueError('a seed is required to generate by index')
+
+        entitySeed = EntityGenerator.entitySeed
+        for path, rng in self.streams.items():
+            rng.seed(entitySeed(seed, index, path))
+
+        self.index = index
+        self.runSeed = seed
+        self.epoch += 1
+        return
+
+    def create_at(self, index, seed = None):
+        '''
+        Create entity number 'index' of the run seeded with 'seed' (by
+        default, the seed given to the constructor).  The result is the same
+        entity that generate() yields at that position, and does not depend
+        on what (if anything) was generated before it.
+        '''
+
+        self.reseed(index, seed)
+        return self.create()
+
+    def generate(self, n, start = 0, seed = None):
+        '''
+        Yield entities start .. start + n - 1 of the run seeded with 'seed'.
+        Any range of a run may be generated independently (eg, on separate
+        processes or machines) and the pieces concatenated.
+        '''
+
+        for index in range(start, start + n):
+            yield self.create_at(index, seed)
+
+        return
+
+    def create_columns(self, n):
+        '''
+        Generate n entities in columnar form, returning a ColumnBatch.
+
+        Elements which (including their children) do not reference other
+        values by path are generated a whole column at a time, using the
+        element's create_many(n) method if it has one.  The remaining
+        elements are generated entity by entity, as create() would, with
+        the column values made available for their path lookups.  If there
+        are no such elements, no per-entity dicts are built at all.
+
+        The random numbers are drawn in a different order than create(), so
+        the entities generated are not the same as n calls to create() with
+        the same seed.
+        '''
+
+        plan = self.plan
+        if plan is None:
+            plan = [ (label, elem.create) for label, elem in self.children ]
+
+        values = {}
+        rowwise = []
+        for (label, elem), step in zip(self.children, plan):
+            fn = step[1]
+            if elem.usesPaths():
+                rowwise.append((label, fn))
+                continue
+
+            create_many = getattr(elem, 'create_many', None)
+            if create_many is not None:
+                values[label] = list(create_many(n))
+            else:
+                values[label] = [ fn() for i in range(n) ]
+
+        if len(rowwise) > 0:
+            labels = list(values.keys())
+            for label, fn in rowwise:
+                values[label] = []
+
+            for i in range(n):
+                self.data = { label: values[label][i] for label in labels }
+                self.stack = [ self.data ]
+                for label, fn in rowwise:
+                    v = fn()
+                    self.data[label] = v
+                    values[label].append(v)
+
+        batch = ColumnBatch(n)
+        for label, elem in self.children:
+            batch.addColumn(label, values[label])
+
+        batch.finish()
+        return batch
+
     def getValueByPath(self, path):
         '''
         Traverse the data element being generated and return the value
         matching the given path.  If the path cannot be parsed, we will assume
         that the given value was intended to be a literal value.  If we
-        encounter an array during our traversal, we will always select or
-        navigate through the last element in the list (assuming it is the
-        most recently generated).
+        encounter an array during our traversal, we will select or navigate
+        through the last element in the list (assuming it is the most
+        recently generated) unless an index is given.
+
+        See PathAccessor for the supported path syntax.  Parsed paths are
+        cached, so repeated lookups of the same path do no string work.
         '''
 
-        parts = path.split('/')
+        return PathAccessor.parse(path).resolve(self)
 
-        if len(parts[0]) == 0:
-            element = self.data
-            for i in parts[1:]:            # skip the first (empty) part
-                if type(element) is list:
-                    element = element[-1]
+    def compilePath(self, path):
+        '''
+        Parse a path once, returning a callable which resolves it against the
+        entity currently being generated (see getValueByPath()).
+        '''
+
+        return PathAccessor.parse(path).bind(self)
 
-                element = element[i]
+    def pushContext(self, data):
+        '''
+        Mark 'data' as the dict whose children are now being generated.
+        Relative paths used by those children resolve against it.
+        '''
 
-            return element
+        self.stack.append(data)
 
-        return path  # can't parse?  return the whole dang thing as literal
+    def popContext(self):
+        self.stack.pop()
 
     @staticmethod
     def defaultDataPath():
@@ -127,6 +331,256 @@ class EntityGenerator(object):
         return datapath
 
 
+class ColumnBatch(object):
+    '''
+    A batch of entities stored by column rather than as a list of dicts
+    (see EntityGenerator.create_columns()).
+
+    'columns' maps each leaf path to a list of values.  Paths are the keys
+    leading to the value joined with '.', eg 'names.first'.  'offsets' maps
+    the path of each list (array) to an array of offsets: the items of list
+    i are those at positions offsets[path][i] .. offsets[path][i+1] in the
+    columns beneath that path.  A list nested within a list is indexed by
+    the items of the enclosing list, so
+
+        addresses.phones[ offsets['addresses.phones'][j] ... ]
+
+    are the phones of the j-th address across the whole batch.
+
+    Values which were absent (or None) in an entity appear as None.  A key
+    which is None in every entity (eg, 'names.suffix') still has a column.
+    '''
+
+    def __init__(self, length):
+        self.length = length
+        self.columns = {}
+        self.offsets = {}
+
+        # the number of items in each container (list), and the container
+        # enclosing each column and list.
+        self.counts = { '': length }
+        self.columnOwner = {}
+        self.offsetOwner = {}
+
+        # columns which (so far) hold nothing but None.  A key which is
+        # always None still gets its column, unless a dict or list turns up
+        # under that key later.
+        self.unset = set()
+        return
+
+    def addColumn(self, path, values):
+        '''
+        Add the n values generated for a top-level element.
+        '''
+
+        for v in values:
+            if isinstance(v, (dict, list, Mapping)):
+                break
+        else:
+            # all scalars; the list becomes the column as it stands.
+            self.columns[path] = values
+            self.columnOwner[path] = ''
+            return
+
+        for i, v in enumerate(values):
+            self._add(path, v, '', i)
+
+        return
+
+    def _add(self, path, value, container, index):
+        if value is None:
+            if path not in self.columns and path not in self.offsets:
+                self.columns[path] = []
+                self.columnOwner[path] = container
+                self.unset.add(path)
+
+            return
+
+        if path in self.unset and isinstance(value, (dict, Mapping, list)):
+            del self.columns[path]
+            del self.columnOwner[path]
+            self.unset.discard(path)
+
+        if isinstance(value, (dict, Mapping)):
+            for k, v in value.items():
+                self._add(path + '.' + k, v, container, index)
+
+            return
+
+        if isinstance(value, list):
+            offs = self.offsets.get(path)
+            if offs is None:
+                offs = self.offsets[path] = array.array('q', [ 0 ])
+                self.offsetOwner[path] = container
+
+            start = self.counts.get(path, 0)
+            if len(offs) <= index:
+                offs.extend([ start ] * (index + 1 - len(offs)))
+
+            # lists directly within lists are told apart by a '[]' suffix
+            for v in value:
+                self._add(path + '[]' if isinstance(v, list) else path,
+                          v, path, start)
+                start += 1
+
+            self.counts[path] = start
+            offs.append(start)
+            return
+
+        col = self.columns.get(path)
+        if col is None:
+            col = self.columns[path] = []
+            self.columnOwner[path] = container
+        elif self.unset:
+            self.unset.discard(path)
+
+        if len(col) < index:
+            col.extend([ None ] * (index - len(col)))
+
+        col.append(value)
+        return
+
+    def finish(self):
+        '''
+        Pad columns and offsets for items which did not contain them.
+        '''
+
+        for path, col in self.columns.items():
+            n = self.counts.get(self.columnOwner[path], 0)
+            if len(col) < n:
+                col.extend([ None ] * (n - len(col)))
+
+        for path, offs in self.offsets.items():
+            n = self.counts.get(self.offsetOwner[path], 0)
+            if len(offs) < n + 1:
+                offs.extend([ offs[-1] ] * (n + 1 - len(offs)))
+
+        return
+
+
+class PathAccessor(object):
+    '''
+    A parsed path expression, used to reference values already generated
+    for the current entity.  Paths take one of three forms:
+
+        /gender              absolute, from the root of the entity
+        ../state             relative to the dict containing the element
+                             being generated (each additional '../' moves
+                             out one more level)
+        addresses[0]/state   any step may carry explicit list indexes
+
+    When a step reaches a list without an explicit index, the last (most
+    recently generated) item is used.  Anything which does not begin with
+    '/' or '..' (including any value which is not a string, eg a number)
+    is a literal, and resolves to itself.
+
+    Parsing is done once per distinct path string (see parse()).
+    '''
+
+    step_re = re.compile(r'^([^\[\]]*)((?:\[-?\d+\])*)$')
+
+    def __init__(self, path):
+        self.path = path
+        self.literal = False
+        self.up = 0            # number of '..' steps; 0 for absolute paths
+        self.steps = []        # (key, None) or (None, index) tuples
+
+        if not isinstance(path, str):
+            self.literal = True
+            return
+
+        if path.startswith('/'):
+            parts = path.split('/')[1:]
+        elif path == '..' or path.startswith('../'):
+            parts = path.split('/')
+            while len(parts) > 0 and parts[0] == '..':
+                self.up += 1
+                parts.pop(0)
+        else:
+            self.literal = True
+            return
+
+        for part in parts:
+            if part == '':
+                continue
+
+            m = PathAccessor.step_re.match(part)
+            if m is None:
+                raise ValueError('Invalid path: {0:s}'.format(path))
+
+            key, indexes = m.groups()
+            if key != '':
+                self.steps.append((key, None))
+
+            for idx in re.findall(r'-?\d+', indexes):
+                self.steps.append((None, int(idx)))
+
+        return
+
+    @staticmethod
+    def parse(path):
+        '''
+        Returns the PathAccessor for the given path.  Path strings are parsed
+        once and the accessor shared.  Any other value is a literal, and may
+        be unhashable (eg, a dict or list).
+        '''
+
+        if not isinstance(path, str):
+            return PathAccessor(path)
+
+        return PathAccessor.parseString(path)
+
+    @staticmethod
+    @functools.lru_cache(maxsize = 1024)
+    def parseString(path):
+        return PathAccessor(path)
+
+    def resolve(self, root):
+        '''
+        Returns the value of this path within the entity being built by
+        'root' (an EntityGenerator).
+        '''
+
+        if self.literal:
+            return self.path
+
+        if self.up > 0:
+            element = root.stack[-self.up]
+        else:
+            element = root.data
+
+        for key, idx in self.steps:
+            if key is not None:
+                if type(element) is list:
+                    element = element[-1]
+
+                element = element[key]
+            else:
+                element = element[idx]
+
+        return element
+
+    def bind(self, root):
+        '''
+        Returns a callable resolving this path against 'root'.  The common
+        case of a single key is specialized.
+        '''
+
+        if self.literal:
+            path = self.path
+            return lambda: path
+
+        if len(self.steps) == 1 and self.steps[0][1] is None:
+            key = self.steps[0][0]
+            if self.up == 0:
+                return lambda: root.data[key]
+
+            up = -self.up
+            return lambda: root.stack[up][key]
+
+        return functools.partial(self.resolve, root)
+
+
 class EntityElement(object):
     '''
     Base class for all Entity Elements.  An EntityElement may be added to
@@ -142,25 +596,132 @@ class EntityElement(object):
                    of valid parameters is relative to the generator being used
         root     - a reference to EntityGenerator object used to create this
                    data entity.
+        rng      - the source of random numbers (a random.Random or anything
+                   providing the same methods).  By default, the element is
+                   given its own stream by the EntityGenerator it is added to
+                   (see EntityGenerator.childRNG()).
     '''
 
     def __init__(self, name = None,
                        generator = None,
                        params = None,
-                       root = None):
+                       root = None,
+                       rng = None):
 
         self.name = name
 
         self.root = root
 
         self.params = params
+        self.boundParams = None    # params compiled into accessors
         self.generator = None
         self.mods = None
 
+        # source of random numbers.  Until the element is added to an
+        # EntityGenerator, this is the standard random library.
+        self.ownRNG = rng is not None
+        self.rng = rng if rng is not None else random
+        self.path = None
+
         return
 
-    def setRoot(self, root):
+    def setRoot(self, root, path = None):
+        '''
+        Attach this element to 'root' (an EntityGenerator) at 'path', the
+        location of the element in generated entities.
+        '''
+
         self.root = root
+        self.path = path
+        if root is not None and path is not None and not self.ownRNG:
+            self.rng = root.childRNG(path)
+
+    def __getstate__(self):
+        # the random module itself cannot be pickled
+        state = self.__dict__.copy()
+        if state['rng'] is random:
+            state['rng'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
+
+    def getParam(self, name, default = None):
+        '''
+        Returns the value of the named parameter, resolving it as a path
+        against the entity being generated.  If the parameter was not given,
+        'default' is returned.
+        '''
+
+        if self.boundParams is not None:
+            fn = self.boundParams.get(name)
+            return fn() if fn is not None else default
+
+        if self.params is None:
+            return default
+
+        path = self.params.get(name)
+        if path is None:
+            return default
+
+        # literal values need no entity to resolve against
+        if self.root is None:
+            accessor = PathAccessor.parse(path)
+            if not accessor.literal:
+                raise ValueError('cannot resolve {0:s} outside of an '
+                                 'EntityGenerator'.format(path))
+
+            return path
+
+        return self.root.getValueByPath(path)
+
+    def bindParams(self):
+        '''
+        Parse each of our param paths once, so that getParam() need not.
+        '''
+
+        if self.params is None or self.root is None:
+            return
+
+        bound = {}
+        for name, path in self.params.items():
+            if path is not None:
+                bound[name] = self.root.compilePath(path)
+
+        self.boundParams = bound
+        return
+
+    def usesPaths(self):
+        '''
+        Returns True if this element (or any element beneath it) takes
+        parameters by path, and so depends on other generated values.
+        Literal params depend on nothing.
+        '''
+
+        if not self.params:
+            return False
+
+        for path in self.params.values():
+            if path is not None and not PathAccessor.parse(path).literal:
+                return True
+
+        return False
+
+    def compile(self):
+        '''
+        Returns a callable which generates this element's value.  See
+        EntityGenerator.compile().
+        '''
+
+        self.bindParams()
+        return self.create
+
+    # The count functions below accept the rng to draw from, and are marked
+    # (takesRNG) so that ArrayElement knows to pass it.  Count functions
+    # provided by the caller are called without arguments.
 
     @staticmethod
     def count_const_fn(x):
@@ -171,14 +732,19 @@ class EntityElement(object):
         if max <= min:
             raise ValueError('min must be less than max in count_rand_fn()')
 
-        return lambda: int(((max - min) * random.random()) + min)
+        fn = lambda rng = random: int(((max - min) * rng.random()) + min)
+        fn.takesRNG = True
+        return fn
 
     @staticmethod
     def count_norm_fn(mean=0.0, stdev=1.0, integer=False):
         if integer is False:
-            return lambda: random.normalvariate(mu=mean, sigma=stdev)
+            fn = lambda rng = random: rng.normalvariate(mu=mean, sigma=stdev)
+        else:
+            fn = lambda rng = random: int(rng.normalvariate(mu=mean, sigma=stdev))
 
-        return lambda: int(random.normalvariate(mu=mean, sigma=stdev))
+        fn.takesRNG = True
+        return fn
     
 
 class ArrayElement(EntityElement):
@@ -206,20 +772,82 @@ class ArrayElement(EntityElement):
         self.count = count_fn
 
         self.count_fn = count_fn
+        self.countTakesRNG = getattr(count_fn, 'takesRNG', False)
         self.generator = generator
 
         return
 
+    def setRoot(self, root, path = None):
+        EntityElement.setRoot(self, root, path)
+        if isinstance(self.generator, EntityElement):
+            self.generator.setRoot(root, None if path is None else path + '[]')
+
+    def usesPaths(self):
+        if isinstance(self.generator, EntityElement) and \
+           self.generator.usesPaths():
+            return True
+
+        return EntityElement.usesPaths(self)
+
+    def nextCount(self):
+        '''
+        Returns the number of items in the next array.  A count function may
+        return a float; the array gets ceil(count) items, as the original
+        "while c > 0" loop made.
+        '''
+
+        if self.countTakesRNG:
+            c = self.count_fn(self.rng)
+        else:
+            c = self.count_fn()
+
+        if type(c) is not int:
+            c = math.ceil(c)
+
+        return c if c > 0 else 0
+
+    def compile(self):
+        self.bindParams()
+
+        # subclasses implementing their own create() are left to it, as are
+        # generators which are not EntityElements (called as create() does).
+        if type(self).create is not ArrayElement.create or \
+           not isinstance(self.generator, EntityElement) or \
+           self.count_fn is None:
+            return self.create
+
+        nextCount = self.nextCount
+
+        if isinstance(self.generator, SimpleElement):
+            # the whole array at once (see SimpleElement.create_many())
+            create_many = self.generator.create_many
+
+            def create():
+                c = nextCount()
+                return create_many(c) if c > 0 else []
+
+            return create
+
+        gen = self.generator.compile()
+
+        def create():
+            return [ gen() for i in range(nextCount()) ]
+
+        return create
+
     def create(self, **kwargs):
         data = []
 
         if self.count_fn is None: return data
 
-        c = self.count_fn()
-        while c > 0:
+        c = self.nextCount()
+
+        if isinstance(self.generator, SimpleElement):
+            return self.generator.create_many(c) if c > 0 else data
+
+        for i in range(c):
             e = self.generator.create(root = data)
             data.append(e)
-            c -= 1
 
         return data
 
@@ -232,8 +860,44 @@ class DictElement(EntityElement):
     def __init__(self, **kwargs):
         EntityElement.__init__(self, **kwargs)
         self.children = None
+        self.plan = None
         return
 
+    def setRoot(self, root, path = None):
+        EntityElement.setRoot(self, root, path)
+        if self.children is not None:
+            for label, elem in self.children:
+                elem.setRoot(root, self.childPath(label))
+
+    def __getstate__(self):
+        # the compiled plan holds closures; compile() again after unpickling
+        state = EntityElement.__getstate__(self)
+        state['plan'] = None
+        return state
+
+    def childPath(self, label):
+        if self.path is None:
+            return None
+
+        return self.path + '/' + str(label)
+
+    def usesPaths(self):
+        if self.children is not None:
+            for label, elem in self.children:
+                if elem.usesPaths():
+                    return True
+
+        return EntityElement.usesPaths(self)
+
+    def compile(self):
+        self.bindParams()
+
+        if self.children is not None:
+            self.plan = [ (label, elem.compile())
+                          for label, elem in self.children ]
+
+        return self.create
+
     def addElement(self, elem, label = None):
         if not isinstance(elem, EntityElement):
             raise ValueError('element not EntityElement type in addElement')
@@ -246,20 +910,33 @@ class DictElement(EntityElement):
         # parameters which reference other elements can be guaranteed that
         # referenced values exists.
 
-        self.children = []
+        if self.children is None:
+            self.children = []
 
-        elem.setRoot(self.root)
+        elem.setRoot(self.root, self.childPath(label))
         x = (label, elem)
         self.children.append(x)
+        self.plan = None
         return
 
     def addChildren(self, data, **kwargs):
         if self.children is None: return None
 
-        for child in self.children:
-            enam = child[0]
-            egen = child[1]
-            data[enam] = egen.create()
+        root = self.root
+        if root is not None:
+            root.pushContext(data)
+
+        if self.plan is not None:
+            for label, fn in self.plan:
+                data[label] = fn()
+        else:
+            for child in self.children:
+                enam = child[0]
+                egen = child[1]
+                data[enam] = egen.create()
+
+        if root is not None:
+            root.popContext()
 
         return
 
@@ -269,6 +946,10 @@ class SimpleElement(EntityElement):
     A SimpleElement cannot have children.
     '''
 
+    # below this many values, create_many() implementations do without
+    # numpy: converting to and from arrays costs more than it saves.
+    VECTOR_MIN = 64
+
     def __init__(self, **kwargs):
         EntityElement.__init__(self, **kwargs)
         # TODO - a SimpleElement may not have children
@@ -276,3 +957,14 @@ class SimpleElement(EntityElement):
 
     def create(self, **kwargs):
         return
+
+    def create_many(self, n):
+        '''
+        Returns a list of n values.  The values, and the random numbers drawn
+        to produce them, are the same as for n calls to create(), so callers
+        (eg, ArrayElement) may use either.  Subclasses override this with
+        faster ways of producing the same values.
+        '''
+
+        create = self.create
+        return [ create() for i in range(n) ]
@@ -18,7 +18,6 @@
 import sys
 from bisect import bisect
 from datagen.entitygenerator import EntityElement, SimpleElement
-import random
 
 class GenderElement(SimpleElement):
     def __init__(self, pctMale=0.50, **kwargs):
@@ -33,10 +32,15 @@ class GenderElement(SimpleElement):
         return
 
     def create(self, **kwargs):
-        r = random.random()
+        r = self.rng.random()
         if r <= self.pctMale: return 'M'
         return 'F'
 
+    def create_many(self, n):
+        rnd = self.rng.random
+        pctMale = self.pctMale
+        return [ 'M' if rnd() <= pctMale else 'F' for i in range(n) ]
+
 
 def main(argv):
     gender = GenderElement()
@@ -15,7 +15,8 @@
 #   limitations under the License.
 
 from bisect import bisect
-from datagen.cdf import CDF
+from types import MappingProxyType
+from datagen import registry
 import csv
 import json
 import gzip
@@ -58,11 +59,13 @@ class USCensusName(DictElement):
             if suffix is not None:
                 suffix = os.path.join(datapath, suffix)
 
-        self.male = CDF(male, delimiter="|")
-        self.female = CDF(female, delimiter="|")
-        self.surname = CDF(surname, isCumulative = True, delimiter="|")
+        # the distributions are shared with any other element reading the
+        # same files (see datagen.registry).
+        self.male = registry.cdf(male, delimiter="|")
+        self.female = registry.cdf(female, delimiter="|")
+        self.surname = registry.cdf(surname, isCumulative = True, delimiter="|")
         if suffix is not None:
-            self.suffix = CDF(suffix)
+            self.suffix = registry.cdf(suffix)
         else:
             self.suffix = None
 
@@ -105,55 +108,53 @@ class USCensusName(DictElement):
 
         # If we have a path to Gender (as a parameter), we'll use it over an
         # explicitly given gender.
-        if self.params is not None:
-            gender_path = self.params.get('gender')
-            if gender_path is not None:
-                gender = self.root.getValueByPath(gender_path)
+        gender = self.getParam('gender', gender)
+        rnd = self.rng.random
 
         if gender is None:
-            if random.random():
+            if rnd():
                 fn_gen = self.male.getValue
                 if self.suffix is not None:
                     suffix_gen = self.suffix.getValue
                 else:
-                    suffix_gen = lambda: ""
+                    suffix_gen = lambda r: ""
             else:
                 fn_gen = self.female.getValue
-                suffix_gen = lambda: ""
+                suffix_gen = lambda r: ""
         elif gender.lower() in ['m', 'male'] :
             fn_gen = self.male.getValue
             if self.suffix is not None:
                 suffix_gen = self.suffix.getValue
             else:
-                suffix_gen = lambda: ""
+                suffix_gen = lambda r: ""
         elif gender.lower() in ['f', 'female'] :
             fn_gen = self.female.getValue
-            suffix_gen = lambda: ""
+            suffix_gen = lambda r: ""
         else:
             raise ValueError('Invalid gender: {0:s}'.format(gender))
 
-        first = fn_gen()
-        if self.pctFirstInitial > random.random():
+        first = fn_gen(rnd())
+        if self.pctFirstInitial > rnd():
             first = first[0]
 
-        last = self.surname.getValue()
+        last = self.surname.getValue(rnd())
 
-        if random.random() < self.pctMidName:
+        if rnd() < self.pctMidName:
 
             ## do not allow duplicate first == middle names
-            middle = fn_gen()
+            middle = fn_gen(rnd())
             #while middle == first:
             #    print("Middle: " + middle + ", First: " + first)
-            #    middle == fn_gen()
+            #    middle == fn_gen(rnd())
 
-            if random.random() < self.pctMidInitial:
+            if rnd() < self.pctMidInitial:
                 middle = middle[0]
         else:
             middle = None
 
         suffix = None
-        if random.random() < self.pctSuffix:
-            suffix = suffix_gen()
+        if rnd() < self.pctSuffix:
+            suffix = suffix_gen(rnd())
 
         r = self.buildName(last, first, middle, suffix)
         DictElement.addChildren(self, r, **kwargs)
@@ -191,23 +192,28 @@ class USCensusNameSet(ArrayElement):
         self.pctMarried = pctMarried
         self.nicknames = Nicknames()
 
+    def setRoot(self, root, path = None):
+        ArrayElement.setRoot(self, root, path)
+
+        # our helpers are not part of the element tree, but must draw from
+        # the same rng as we do.
+        self.namegen.rng = self.rng
+        self.nicknames.rng = self.rng
+
     def create(self, gender = None, nickname = False, married = True):
-        if self.params is not None:
-            gender_path = self.params.get('gender')
-            if gender_path is not None:
-                gender = self.root.getValueByPath(gender_path)
+        gender = self.getParam('gender', gender)
 
         nameset = []
 
         name = self.namegen.create(gender = gender)
         nameset.append(name)
 
-        if nickname and random.random() < 0.60:
+        if nickname and self.rng.random() < 0.60:
             nn = self.nickname(name)
             if nn is not None :
                 nameset.append(nn)
 
-        if married and gender == 'F' and random.random() < self.pctMarried:
+        if married and gender == 'F' and self.rng.random() < self.pctMarried:
             mn = self.married(name)
             if mn is not None :
                 nameset.append(mn)
@@ -268,7 +274,7 @@ class USCensusNameSet(ArrayElement):
         out_name = name.copy()
 
         cur_surname = name['last']
-        new_surname = married_surname if married_surname is not None else self.namegen.surname.getValue()
+        new_surname = married_surname if married_surname is not None else self.namegen.surname.getValue(self.rng.random())
 
         # One of three scenarios to apply:
         #
@@ -281,7 +287,7 @@ class USCensusNameSet(ArrayElement):
         # Rate for #2 is estimated (non-researched) at 2%
         # Rate for #3 is the remainder (about 80%).
 
-        r = random.random()
+        r = self.rng.random()
         if r < 0.18:  # TODO - threshold should be tunable/configurable
             out_name['middle'] = cur_surname
             out_name['last'] = new_surname
@@ -299,6 +305,12 @@ class USCensusNameSet(ArrayElement):
 
 
 class Nicknames():
+
+    # accepted spellings of each gender; None sums both distributions
+    genders = { 'M': 'M', 'MALE': 'M',
+                'F': 'F', 'FEMALE': 'F',
+                None: None }
+
     def __init__(self, datapath = None,
                        nicknames_file = 'nicknames.csv',
                        male_dist = 'male.dat.gz',
@@ -312,9 +324,20 @@ class Nicknames():
         female_dist_file = os.path.join(datapath, female_dist)
         nicknames_file  = os.path.join(datapath, nicknames_file)
 
+        self.rng = random      # see USCensusNameSet.setRoot()
+
+        # every table is shared with other Nicknames reading the same files
+        # (see datagen.registry).
+        tables = registry.tables
         self.male_dist = Nicknames._load_freq(male_dist_file)
         self.female_dist = Nicknames._load_freq(female_dist_file)
-        self.nicknames = Nicknames._load_nicknames(nicknames_file)
+        self.nicknames = tables.get('nicknames', nicknames_file, None,
+                             lambda: Nicknames._load_nicknames(nicknames_file))
+
+        options = { 'male': os.path.abspath(male_dist_file),
+                    'female': os.path.abspath(female_dist_file) }
+        self.tables = tables.get('nicknames.tables', nicknames_file, options,
+                                 self._build_tables)
 
         return
 
@@ -366,28 +389,17 @@ class Nicknames():
         with open(file, "r") as csvfile:
             reader = csv.reader(csvfile)
             for record in reader:
+                record = [ name.upper() for name in record ]
                 for name_l in record:
+                    # a dict (rather than a list) keeps the order in which
+                    # names are first seen while making the duplicate check
+                    # a single lookup.
+                    a = nicknames.setdefault(name_l, {})
                     for name_r in record:
-                        name_l = name_l.upper()
-                        name_r = name_r.upper()
-                        if name_l == name_r: continue  # skip matches, eg PAT == PAT
-
-                        try:
-                            a = nicknames[name_l]
-                        except KeyError:
-                            nicknames[name_l] = []
-                            a = nicknames[name_l]
-
-                        exists = False
-                        for e in a:
-                            if e == name_r:
-                                exists = True
-                                break
+                        if name_l != name_r:   # skip matches, eg PAT == PAT
+                            a[name_r] = None
 
-                        if not exists:
-                            a.append(name_r)
-
-        return nicknames
+        return { name: list(a) for name, a in nicknames.items() }
 
     @staticmethod
     def _load_freq(file):
@@ -419,64 +431,90 @@ class Nicknames():
         If you use data from other sources, either implement a new loader
         method in this class or adapt your data to conform with this format.
 
-        This method returns a dict containing "NAME: PCT" pairs.
+        This method returns a read-only mapping of "NAME: PCT" pairs, shared
+        by every caller (see datagen.registry).
         '''
 
-        freq = {}
-        with gzip.open(file, "r") as dist:
-            for line in dist:
-                line = line.decode("utf-8")
-                fields = line.strip().split("|")
-                name = fields[0].upper()
-                pct = float(fields[1]) / 100
-                freq[name] = pct
+        def load():
+            # Share the CDF (as loaded by USCensusName) rather than parsing
+            # the text file a second time.  Rows with a frequency of zero are
+            # not kept by the CDF, but they could never be selected here
+            # anyway.
+            dist = registry.cdf(file, delimiter="|")
 
-        return freq
+            freq = {}
+            for name, pct in zip(dist.values, dist.weights):
+                freq[name.upper()] = pct / 100
 
+            return MappingProxyType(freq)
 
-    def getNickname(self, name, gender=None):
+        return registry.tables.get('namefreq', file, None, load)
+
+
+    def _build_tables(self):
         '''
-        Each nickname has a frequency (weight) which makes it more or less
-        common than others in the list.  This weight is taken from the name
-        frequency tables.  A name with a weight of 0.0 will never be
-        selected.
+        Precompute, for each gender (and for None, meaning either), the
+        nicknames which may be substituted for each name along with their
+        cumulative weights.  The tables are:
+
+            { gender: { NAME: (cumulative weights, nicknames) } }
+
+        Each nickname is weighted by its frequency in the name distribution
+        for the gender (or the sum of both distributions).  Nicknames with no
+        weight are dropped, as are names left with no nicknames at all.
         '''
-        nicks = self.nicknames.get(name.upper(), None)
-        
-        if nicks is None:
-            return
 
-        if gender is not None: gender = gender.upper()
-        weights = []    # a list of weights corresponding to each name in 'a'
+        dists = { 'M': ( self.male_dist, ),
+                  'F': ( self.female_dist, ),
+                  None: ( self.male_dist, self.female_dist ) }
+
+        tables = {}
+        for gender, freqs in dists.items():
+            table = tables[gender] = {}
+            for name, nicks in self.nicknames.items():
+                cumdist = []
+                values = []
+                total = 0.0
+                for n in nicks:
+                    w = 0.0
+                    for freq in freqs:
+                        w += freq.get(n, 0.0)
 
-        for n in nicks:
-            # Add the weight for the specified gender.  If we don't have a
-            # gender, we'll sum the weights for both male and female dists.
+                    if w > 0.0:
+                        total += w
+                        cumdist.append(total)
+                        values.append(n)
 
-            w = 0.0
-            if gender in [ 'M', "MALE", None ]:
-                w += self.male_dist.get(n.upper(), 0.0)
+                if len(values) > 0:
+                    table[name] = (cumdist, values)
 
-            if gender in [ 'F', "FEMALE", None ]:
-                w += self.female_dist.get(n.upper(), 0.0)
+        return tables
 
-            weights.append(w)
+    def getNickname(self, name, gender=None):
+        '''
+        Each nickname has a frequency (weight) which makes it more or less
+        common than others in the list.  This weight is taken from the name
+        frequency tables.  A name with a weight of 0.0 will never be
+        selected.
 
-        tot_weight = sum(weights)
+        Returns None if there is no nickname for the name (and gender).
+        '''
 
-        if tot_weight == 0.0:
-            # no valid aliases for this name/gender
+        if gender is not None: gender = gender.upper()
+        table = self.tables.get(Nicknames.genders.get(gender, ''))
+        if table is None:
+            # not a gender we know; no nickname has any weight
             return None
 
-        r = random.uniform(0, tot_weight)
-        cum_pct = 0.0
-        prev_pct = 0.0
-        for e in zip(nicks, weights):
-            cum_pct += e[1]
-            if r >= prev_pct and r < cum_pct:
-                return e[0]
+        entry = table.get(name)
+        if entry is None:
+            entry = table.get(name.upper())
+            if entry is None:
+                return None
 
-        return None
+        cumdist, values = entry
+        pos = bisect(cumdist, self.rng.random() * cumdist[-1])
+        return values[min(pos, len(values) - 1)]
 
 def main(argv):
     ns = USCensusNameSet()
@@ -16,43 +16,231 @@
 
 import random
 import sys
-from datagen.entitygenerator import EntityElement, SimpleElement
+
+try:
+    import numpy
+except ImportError:    # numpy is optional; see create_many()
+    numpy = None
+
+from datagen import permutation
+from datagen.entitygenerator import EntityGenerator, EntityElement, \
+                                    SimpleElement
 
 class NationalIDElement(SimpleElement):
+    '''
+    US Social Security numbers (AAA-GG-SSSS).  The area (AAA) cannot be 000,
+    666, or 900-999, the group (GG) cannot be 00, and the serial (SSSS)
+    cannot be 0000.
+    '''
+
+    AREAS = 898            # 001 .. 899, less 666
+    GROUPS = 99            # 01 .. 99
+    SERIALS = 9999         # 0001 .. 9999
+
+    # the number of valid SSNs
+    SIZE = AREAS * GROUPS * SERIALS
+
+    # zero-padded strings of 0 .. 999, 0 .. 99 and 0 .. 9999, used by
+    # create_many().  See getPadded().
+    padded = None
+
     def __init__(self,
                  useDashes = False,
                  pctPresent = 1.0,
+                 unique = False,
+                 key = None,
+                 offset = 0,
+                 perEntity = 1,
                  **kwargs):
+        '''
+        If 'unique' is True, no SSN is generated twice.  Each SSN is a
+        counter mapped through a keyed permutation of the valid SSNs (see
+        datagen.permutation.FeistelPermutation), so no record of the SSNs
+        already used is kept.
+
+        'key' (an int) selects the permutation.  By default it is derived
+        from the seed of the run being generated (or, without a seed, chosen
+        at random), so every process generating the run agrees on it.
+
+        When entities are generated by index (EntityGenerator.create_at()),
+        entity i uses the counters offset + i * perEntity up to (but not
+        including) offset + (i + 1) * perEntity, so any range of entities
+        may be generated separately (eg, by shard) without reusing an SSN.
+        Otherwise (eg, EntityGenerator.create()), the counter starts at
+        'offset' and counts up, unaffected by any entities generated by
+        index.  Runs mixing the two may therefore repeat SSNs.  Datasets
+        which must not share SSNs should be given the same key and disjoint
+        ranges of counters.
+
+        A RuntimeError is raised if an entity asks for more than perEntity
+        SSNs, or every SSN has been used.
+        '''
 
         SimpleElement.__init__(self, **kwargs)
         self.useDashes = useDashes
         self.pctPresent = pctPresent
+
+        self.unique = unique
+        self.key = key
+        self.offset = offset
+        self.perEntity = perEntity
+        self.permutation = None    # built on first use (see getPermutation())
+        self.seedKey = None        # (seed, key) last derived by getKey()
+        self.counter = offset      # the next counter to use
+
+        # when generating by index, the next counter and last counter (+1)
+        # of the entity, and root.epoch when they were set
+        self.entityCounter = None
+        self.limit = None
+        self.epoch = None
+
+        if self.useDashes:
+            self.format = '{0:03d}-{1:02d}-{2:04d}'.format
+        else:
+            self.format = '{0:03d}{1:02d}{2:04d}'.format
+
         return
 
+    def getKey(self):
+        if self.key is not None:
+            return self.key
+
+        seed = None
+        root = self.root
+        if root is not None:
+            seed = root.runSeed if root.runSeed is not None else root.seed
+
+        if seed is None:
+            # no seed to agree on; choose a key, once
+            self.key = random.SystemRandom().getrandbits(64)
+            return self.key
+
+        # derived once per run seed, rather than on every unique value
+        if self.seedKey is None or self.seedKey[0] != seed:
+            key = EntityGenerator.entitySeed(seed, -1, str(self.path) + '#key')
+            self.seedKey = (seed, key)
+
+        return self.seedKey[1]
+
+    def getPermutation(self):
+        key = self.getKey()
+        if self.permutation is None or self.permutation.key != key:
+            self.permutation = permutation.FeistelPermutation(
+                                              NationalIDElement.SIZE, key)
+
+        return self.permutation
+
+    def getUniqueState(self):
+        '''
+        Returns the key and next counter as JSON-serializable values, so that
+        a run may be resumed later (see setUniqueState()).
+        '''
+
+        return { 'key': self.getKey(), 'counter': self.counter }
+
+    def setUniqueState(self, state):
+        self.key = state['key']
+        self.counter = state['counter']
+
+    def uniqueValue(self):
+        '''
+        Returns the next unused position (0 .. SIZE - 1) in the valid SSNs.
+        '''
+
+        root = self.root
+        byIndex = root is not None and root.index is not None
+        if byIndex:
+            if root.epoch != self.epoch:
+                self.epoch = root.epoch
+                self.entityCounter = self.offset + root.index * self.perEntity
+                self.limit = self.entityCounter + self.perEntity
+
+            counter = self.entityCounter
+            if counter >= self.limit:
+                raise RuntimeError('more than {0:d} SSNs in one entity'
+                                   .format(self.perEntity))
+        else:
+            counter = self.counter
+
+        if counter < 0 or counter >= NationalIDElement.SIZE:
+            raise RuntimeError('all {0:d} SSNs have been used'
+                               .format(NationalIDElement.SIZE))
+
+        if byIndex:
+            self.entityCounter = counter + 1
+        else:
+            self.counter = counter + 1
+
+        return self.getPermutation()[counter]
+
     def create(self, **kwargs):
 
-        if random.random() >= self.pctPresent:
+        if self.rng.random() >= self.pctPresent:
             return None
 
-        # area cannot be 000, 666, or 900-999.
-        while True:
-            area = int(random.random() * 899) + 1  # 001 .. 899
-            if area not in [0, 666]: break
+        if self.unique:
+            n = self.uniqueValue()
+            n, ser = divmod(n, NationalIDElement.SERIALS)
+            area, group = divmod(n, NationalIDElement.GROUPS)
+            area += 1
+            group += 1
+            ser += 1
+        else:
+            # draw from the valid values directly, rather than rejecting
+            # invalid ones.
+            area = int(self.rng.random() * NationalIDElement.AREAS) + 1
+            group = int(self.rng.random() * NationalIDElement.GROUPS) + 1
+            ser = int(self.rng.random() * NationalIDElement.SERIALS) + 1
+
+        if area >= 666:
+            area += 1          # 666 is skipped
+
+        return self.format(area, group, ser)
+
+    @staticmethod
+    def getPadded():
+        if NationalIDElement.padded is None:
+            NationalIDElement.padded = (
+                        [ '{0:03d}'.format(i) for i in range(1000) ],
+                        [ '{0:02d}'.format(i) for i in range(100) ],
+                        [ '{0:04d}'.format(i) for i in range(10000) ] )
+
+        return NationalIDElement.padded
+
+    def create_many(self, n):
+        if self.unique or self.pctPresent < 1.0:
+            # the number of random numbers drawn varies from one SSN to the
+            # next; they must be drawn one at a time.
+            return SimpleElement.create_many(self, n)
+
+        # four random numbers per SSN: whether it is present (always, here),
+        # then the area, group and serial.
+        rnd = self.rng.random
+        r = [ rnd() for i in range(4 * n) ]
 
-        # group cannot be 00
-        while True:
-            group = int(random.random() * 99) + 1  # 01 .. 99
-            if group != 0: break
+        AREAS = NationalIDElement.AREAS
+        GROUPS = NationalIDElement.GROUPS
+        SERIALS = NationalIDElement.SERIALS
 
-        # serial cannot be 0000
-        while True:
-            ser = int(random.random() * 9999) + 1  # 0001 .. 9999
-            if ser != 0: break
+        if numpy is not None and n >= SimpleElement.VECTOR_MIN:
+            r = numpy.array(r).reshape(n, 4)
+            area = (r[:, 1] * AREAS).astype(numpy.int64) + 1
+            area += area >= 666
+            group = (r[:, 2] * GROUPS).astype(numpy.int64) + 1
+            ser = (r[:, 3] * SERIALS).astype(numpy.int64) + 1
+            area, group, ser = area.tolist(), group.tolist(), ser.tolist()
+        else:
+            area = [ int(x * AREAS) + 1 for x in r[1::4] ]
+            area = [ a + 1 if a >= 666 else a for a in area ]
+            group = [ int(x * GROUPS) + 1 for x in r[2::4] ]
+            ser = [ int(x * SERIALS) + 1 for x in r[3::4] ]
 
+        a3, g2, s4 = NationalIDElement.getPadded()
         if self.useDashes:
-            return '{0:03d}-{1:02d}-{2:04d}'.format(area, group, ser)
+            return [ a3[a] + '-' + g2[g] + '-' + s4[s]
+                     for a, g, s in zip(area, group, ser) ]
 
-        return '{0:03d}{1:02d}{2:04d}'.format(area, group, ser)
+        return [ a3[a] + g2[g] + s4[s] for a, g, s in zip(area, group, ser) ]
 
 
 def main(argv):
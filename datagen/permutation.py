@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Permutations used to draw values without replacement.
+
+import hashlib
+
+from array import array
+
+class LazyShuffle(object):
+    '''
+    Draws the numbers 0 .. size - 1 in random order, each exactly once.
+
+    This is a Fisher-Yates shuffle performed one step per draw.  Rather than
+    an array of 'size' entries, only the positions which have been swapped
+    are stored (in a dict), so the memory used grows with the number of
+    draws, not the size of the pool.  Each draw takes one random number and
+    constant time.
+
+    A dict entry costs around 100 bytes, against 8 for an array('q') item.
+    Once the dict holds more than 1/DENSE of the positions not yet drawn,
+    those positions are moved to an array, and the memory used stays fixed
+    from then on.  The values drawn are the same either way.
+    '''
+
+    DENSE = 8
+
+    def __init__(self, size):
+        self.size = size
+        self.drawn = 0         # the number of values drawn so far
+        self.swaps = {}        # position -> value, where not the identity
+
+        # once dense, the value at each position from 'base' on
+        self.table = None
+        self.base = 0
+
+    def remaining(self):
+        return self.size - self.drawn
+
+    def densify(self):
+        '''
+        Move the undrawn positions from the swaps dict to an array.
+        '''
+
+        base = self.drawn
+        table = array('q', range(base, self.size))
+        for pos, value in self.swaps.items():
+            if pos >= base:
+                table[pos - base] = value
+
+        self.table = table
+        self.base = base
+        self.swaps = {}
+        return
+
+    def draw(self, rnd):
+        '''
+        Returns the next value, using rnd() (eg, random.random) as the source
+        of random numbers.  Raises RuntimeError once every value has been
+        drawn.
+        '''
+
+        drawn = self.drawn
+        if drawn >= self.size:
+            raise RuntimeError('all {0:d} values have been drawn'
+                               .format(self.size))
+
+        j = drawn + int(rnd() * (self.size - drawn))
+
+        table = self.table
+        if table is not None:
+            # position 'drawn' is never visited again
+            base = self.base
+            value = table[j - base]
+            table[j - base] = table[drawn - base]
+
+            self.drawn = drawn + 1
+            return value
+
+        swaps = self.swaps
+        value = swaps.get(j, j)
+        if j != drawn:
+            swaps[j] = swaps.get(drawn, drawn)
+
+        # position 'drawn' is never visited again
+        swaps.pop(drawn, None)
+
+        self.drawn = drawn + 1
+        if len(swaps) * LazyShuffle.DENSE > self.size - self.drawn:
+            self.densify()
+
+        return value
+
+    def getState(self):
+        '''
+        Returns the state of the shuffle as JSON-serializable values, so that
+        a run may be resumed later (see setState()).
+        '''
+
+        swaps = self.swaps
+        if self.table is not None:
+            base = self.base
+            swaps = { pos: v for pos, v in
+                      enumerate(self.table[self.drawn - base:], self.drawn)
+                      if pos != v }
+
+        return { 'size': self.size,
+                 'drawn': self.drawn,
+                 'swaps': sorted(swaps.items()) }
+
+    def setState(self, state):
+        if state['size'] != self.size:
+            raise ValueError('state is for {0:d} values, not {1:d}'
+                             .format(state['size'], self.size))
+
+        self.drawn = state['drawn']
+        self.swaps = { int(k): int(v) for k, v in state['swaps'] }
+        self.table = None
+        if len(self.swaps) * LazyShuffle.DENSE > self.size - self.drawn:
+            self.densify()
+
+        return
+
+
+class FeistelPermutation(object):
+    '''
+    A keyed permutation of the numbers 0 .. size - 1: each i in that range
+    is mapped to a distinct value in the same range, with no state beyond
+    the key.  Drawing values without replacement is then a matter of
+    permuting a counter; any part of the sequence may be computed without
+    the rest, so disjoint counter ranges (eg, one per shard) give disjoint
+    values.
+
+    The permutation is a balanced Feistel network over the smallest even
+    number of bits covering 'size'.  Values which land outside the range are
+    passed through the network again until one does not ("cycle walking").
+    Rounding up to an even number of bits can make the network's domain up
+    to four times 'size' (eg, for a size just above 2**(2k)), so a value
+    takes fewer than four passes on average, and fewer than two when 'size'
+    is at least half the domain.
+
+    This is not a cipher: the rounds are chosen to scatter neighbouring
+    counters, not to resist analysis.
+    '''
+
+    ROUNDS = 4
+
+    def __init__(self, size, key, rounds = None):
+        if size < 1:
+            raise ValueError('size must be at least 1')
+
+        if rounds is None:
+            rounds = FeistelPermutation.ROUNDS
+
+        self.size = size
+        self.key = key
+
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+
+        # a 32 bit subkey for each round, derived from the key
+        self.keys = []
+        for i in range(rounds):
+            h = hashlib.blake2b('{0:d}:{1:d}'.format(key, i).encode('utf-8'),
+                                digest_size = 4)
+            self.keys.append(int.from_bytes(h.digest(), 'little'))
+
+        return
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.size:
+            raise IndexError('permutation index out of range')
+
+        half = self.half
+        mask = self.mask
+        keys = self.keys
+
+        x = i
+        while True:
+            l = x >> half
+            r = x & mask
+            for k in keys:
+                # murmur3's finalizer of (r ^ k) as the round function
+                f = r ^ k
+                f ^= f >> 16
+                f = (f * 0x85ebca6b) & 0xffffffff
+                f ^= f >> 13
+                f = (f * 0xc2b2ae35) & 0xffffffff
+                f ^= f >> 16
+                l, r = r, l ^ (f & mask)
+
+            x = (l << half) | r
+            if x < self.size:
+                return x
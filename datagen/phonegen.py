@@ -15,15 +15,20 @@
 #   limitations under the License.
 
 
-import random
+import csv
+import os
 import sys
+from bisect import bisect
+
+try:
+    import numpy
+except ImportError:    # numpy is optional; see create_many()
+    numpy = None
+
+from datagen import registry
 from datagen.entitygenerator import EntityElement, SimpleElement
 
 class PhoneElement(SimpleElement):
-    def __init__(self, formatted=False, **kwargs):
-        SimpleElement.__init__(self, **kwargs)
-        self.formatted = formatted
-        return
 
     # Rules taken from "Modern plan" found at:
     #     https://en.wikipedia.org/wiki/North_American_Numbering_Plan
@@ -45,31 +50,244 @@ class PhoneElement(SimpleElement):
     #        fictional numbers)
     #     e.  958/959 (testing) and 950/976 (service) should be avoided.
     #     f.  should not match the NPA.
+    #
+    # Rather than draw digits and reject those which break the rules, the
+    # valid NPAs and NXXs are listed once (see getTables()) and each part of
+    # a number is a single draw from its list.
+
+    # NXXs avoided under rules 3d and 3e
+    reserved = ( '555', '958', '959', '950', '976' )
+
+    # (npas, nxxs, lines), built on first use.  See getTables().
+    tables = None
+
+    def __init__(self, formatted=False,
+                       areaCodes=None,
+                       datapath=None,
+                       **kwargs):
+        '''
+        If 'areaCodes' is given, area codes are drawn from the distribution
+        of area codes for the ZIP code or state of the number, read from the
+        file 'areaCodes' in 'datapath' (by default, the package data
+        directory).  See loadAreaCodes() for the format.  The ZIP code and
+        state are given by the params 'zip' and 'state', usually as paths to
+        the enclosing address:
+
+            PhoneElement(areaCodes = 'areacodes.csv',
+                         params = { 'zip': '../postalcode',
+                                    'state': '../state' })
+
+        Numbers whose ZIP code and state are not found in the file (or are
+        not given) get any valid area code.
+        '''
+
+        SimpleElement.__init__(self, **kwargs)
+        self.formatted = formatted
+
+        self.areaCodes = None
+        if areaCodes is not None:
+            if datapath is None:
+                datapath = os.path.join(os.path.dirname(__file__), 'data')
+
+            areaCodes = os.path.join(datapath, areaCodes)
+
+            # shared with other elements reading the same file
+            self.areaCodes = registry.tables.get('areacodes', areaCodes, None,
+                               lambda: PhoneElement.loadAreaCodes(areaCodes))
+
+        return
+
+    @staticmethod
+    def validNPA(npa):
+        return npa[0] not in '01' and npa[1] != '9' and npa[1] != npa[2]
+
+    @staticmethod
+    def validNXX(nxx):
+        return nxx[0] not in '01' and nxx[1:] != '11' and \
+               nxx not in PhoneElement.reserved
+
+    @staticmethod
+    def getTables():
+        '''
+        Returns (npas, nxxs, lines).  'nxxs' and 'lines' are lists of the
+        valid exchanges and line numbers, as strings.  'npas' is an area
+        code table of every valid area code, equally likely (see
+        npaTable()).
+        '''
+
+        if PhoneElement.tables is None:
+            codes = [ '{0:03d}'.format(i) for i in range(1000) ]
+            npas = [ c for c in codes if PhoneElement.validNPA(c) ]
+            nxxs = [ c for c in codes if PhoneElement.validNXX(c) ]
+            lines = [ '{0:04d}'.format(i) for i in range(10000) ]
+
+            PhoneElement.tables = ( PhoneElement.npaTable(npas, None, nxxs),
+                                    nxxs, lines )
+
+        return PhoneElement.tables
+
+    @staticmethod
+    def npaTable(npas, cumdist, nxxs):
+        '''
+        Returns the table from which area codes are drawn: the area codes,
+        their cumulative weights (or None, if equally likely) and the
+        position of each area code in nxxs (or -1), so that the exchange may
+        be drawn from the others (rule 3f).
+        '''
+
+        pos = { nxx: i for i, nxx in enumerate(nxxs) }
+        return ( npas, cumdist, [ pos.get(npa, -1) for npa in npas ] )
+
+    @staticmethod
+    def loadAreaCodes(file):
+        '''
+        Read the distribution of area codes from a CSV file of lines:
+
+            KEY,NPA,WEIGHT
+
+        where KEY is a state abbreviation, a ZIP code or the first three
+        digits of a ZIP code, NPA is an area code found there and WEIGHT is
+        its relative frequency.  For example:
+
+            TX,512,3.5
+            TX,737,1.0
+            787,512,4.0
+
+        Returns a dict mapping each key to its area code table (see
+        npaTable()).
+        '''
+
+        rows = {}
+        with open(file, 'r', newline='') as f:
+            for n, record in enumerate(csv.reader(f)):
+                if len(record) == 0:
+                    continue
+
+                if len(record) < 3:
+                    raise ValueError('{0:s} line {1:d}: expected KEY,NPA,WEIGHT'
+                                     .format(file, n + 1))
+
+                key, npa, weight = [ x.strip() for x in record[:3] ]
+                if len(npa) != 3 or not npa.isdigit():
+                    raise ValueError('{0:s} line {1:d}: invalid area code {2:s}'
+                                     .format(file, n + 1, npa))
+
+                weight = float(weight)
+                if weight > 0.0:
+                    rows.setdefault(key.upper(), []).append((npa, weight))
+
+        nxxs = PhoneElement.getTables()[1]
+
+        codes = {}
+        for key, entries in rows.items():
+            npas = []
+            cumdist = []
+            total = 0.0
+            for npa, weight in entries:
+                total += weight
+                npas.append(npa)
+                cumdist.append(total)
+
+            codes[key] = PhoneElement.npaTable(npas, cumdist, nxxs)
+
+        return codes
+
+    def getNPATable(self):
+        '''
+        Returns the area code table for the number being generated.
+        '''
+
+        codes = self.areaCodes
+        if codes is not None:
+            zipcode = self.getParam('zip')
+            if zipcode is not None:
+                zipcode = str(zipcode)
+                table = codes.get(zipcode[:5])
+                if table is None:
+                    table = codes.get(zipcode[:3])
+
+                if table is not None:
+                    return table
+
+            state = self.getParam('state')
+            if state is not None:
+                table = codes.get(str(state).upper())
+                if table is not None:
+                    return table
+
+        return PhoneElement.getTables()[0]
+
+    def build(self, r, table):
+        '''
+        Returns the numbers given by the random numbers r, three per number
+        (area code, exchange and line), with area codes drawn from 'table'.
+        '''
+
+        npas, cumdist, excluded = table
+        nxxs, lines = PhoneElement.getTables()[1:]
+        sep = '-' if self.formatted else ''
+
+        nnpa = len(npas)
+        nnxx = len(nxxs)
+        nline = len(lines)
+
+        values = []
+        for i in range(0, len(r), 3):
+            if cumdist is None:
+                a = int(r[i] * nnpa)
+            else:
+                a = min(bisect(cumdist, r[i] * cumdist[-1]), nnpa - 1)
+
+            # draw from the exchanges other than the area code, if it is one
+            p = excluded[a]
+            if p < 0:
+                x = int(r[i + 1] * nnxx)
+            else:
+                x = int(r[i + 1] * (nnxx - 1))
+                if x >= p: x += 1
+
+            values.append(npas[a] + sep + nxxs[x] + sep +
+                          lines[int(r[i + 2] * nline)])
+
+        return values
 
     def create(self, **kwargs):
+        rnd = self.rng.random
+        return self.build((rnd(), rnd(), rnd()), self.getNPATable())[0]
 
-        while True:
-            npai = int(random.random() * 800) + 200
-            npa = '{0:03d}'.format(npai)
-            if npa[1] != npa[2] and npa[1] != 9: break
+    def create_many(self, n):
+        # the params (and so the area code table) are the same for every
+        # number of the batch; they are looked up once.
+        table = self.getNPATable()
 
-        while True:
-            nxxi = int(random.random() * 800) + 200
-            nxx = '{0:03d}'.format(nxxi)
-            if nxx[1:] != '11' and \
-               nxx not in [ '555', '958', '959', '950', '976' ]:
-                continue
-            break
+        rnd = self.rng.random
+        r = [ rnd() for i in range(3 * n) ]
 
-        linei = int(random.random() * 10000)
-        line = '{0:04d}'.format(linei)
+        if numpy is None or n < SimpleElement.VECTOR_MIN:
+            return self.build(r, table)
 
-        if not self.formatted:
-            p = npa + nxx + line
+        npas, cumdist, excluded = table
+        nxxs, lines = PhoneElement.getTables()[1:]
+
+        r = numpy.array(r).reshape(n, 3)
+        if cumdist is None:
+            a = (r[:, 0] * len(npas)).astype(numpy.int64)
         else:
-            p = '-'.join((npa,nxx,line))
+            cumdist = numpy.asarray(cumdist, dtype = numpy.float64)
+            a = numpy.searchsorted(cumdist, r[:, 0] * cumdist[-1],
+                                   side = 'right')
+            a = numpy.minimum(a, len(npas) - 1)
+
+        p = numpy.asarray(excluded, dtype = numpy.int64)[a]
+        skip = p >= 0
+        x = (r[:, 1] * (len(nxxs) - skip)).astype(numpy.int64)
+        x += skip & (x >= p)
+
+        line = (r[:, 2] * len(lines)).astype(numpy.int64)
 
-        return p
+        sep = '-' if self.formatted else ''
+        return [ npas[i] + sep + nxxs[j] + sep + lines[k]
+                 for i, j, k in zip(a.tolist(), x.tolist(), line.tolist()) ]
 
 def main(argv):
     phone = PhoneElement(formatted=True)
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import os
+import sys
+import threading
+import time
+
+from array import array
+from collections.abc import Mapping
+
+from datagen import datacache
+from datagen.cdf import CDF
+
+# ### Shared Reference Tables ###
+# Several elements may read the same data file (USCensusName and Nicknames
+# both read the first name distributions, and a schema may hold any number
+# of USCreditAccounts).  Rather than each parsing its own copy, elements ask
+# the registry for the table.  Each table is loaded once per process, keyed
+# by its kind, the file it is read from and the options which affect its
+# content, and the same instance is handed to every element which asks.  A
+# file which changes (in size or modification time) is loaded again.
+#
+# Shared tables are read-only.  Elements must copy anything they intend to
+# modify.
+
+def sizeOf(obj):
+    '''
+    Returns (heap, mapped): an estimate of the bytes of memory held by obj
+    and everything it refers to, with buffers mapped from a cache file (see
+    datagen.datacache) counted separately.
+    '''
+
+    heap = 0
+    mapped = 0
+
+    seen = set()
+    pending = [ obj ]
+    while pending:
+        o = pending.pop()
+        if id(o) in seen:
+            continue
+
+        seen.add(id(o))
+        if isinstance(o, memoryview):
+            mapped += o.nbytes
+            continue
+
+        heap += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, array, int, float)):
+            continue
+
+        if isinstance(o, Mapping):
+            pending.extend(o.keys())
+            pending.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            pending.extend(o)
+        elif hasattr(o, '__dict__'):
+            pending.append(o.__dict__)
+
+    return (heap, mapped)
+
+
+class TableRegistry(object):
+    '''
+    The reference tables loaded by this process.  See get().
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()   # loaders may ask for other tables
+        self.tables = {}                # key -> table
+        self.stats = {}                 # key -> load statistics
+
+    @staticmethod
+    def key(kind, source, options = None):
+        sig = datacache.signature(source, digest = False)
+        return (kind, os.path.abspath(source),
+                json.dumps(options, sort_keys = True),
+                sig['size'], sig['mtime_ns'])
+
+    def get(self, kind, source, options, loader):
+        '''
+        Returns the table of the given 'kind' read from the file 'source'
+        with 'options' (a JSON-serializable description of anything which
+        affects its content).  The first request calls loader() to load the
+        table; later requests return the same instance.
+        '''
+
+        key = TableRegistry.key(kind, source, options)
+
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.stats[key]['requests'] += 1
+                return table
+
+            start = time.perf_counter()
+            table = loader()
+            seconds = time.perf_counter() - start
+
+            heap, mapped = sizeOf(table)
+            self.tables[key] = table
+            self.stats[key] = { 'kind': kind,
+                                'source': key[1],
+                                'options': options,
+                                'seconds': seconds,
+                                'bytes': heap,
+                                'mapped': mapped,
+                                'requests': 1 }
+
+        return table
+
+    def report(self):
+        '''
+        Returns the load statistics of each table, in the order loaded: its
+        kind, source and options, the time taken to load it (seconds), the
+        memory it holds (bytes, plus any 'mapped' from a cache file) and the
+        number of requests for it.
+        '''
+
+        with self.lock:
+            return [ dict(s) for s in self.stats.values() ]
+
+    def clear(self):
+        '''
+        Forget every table.  Elements already holding a table keep it.
+        '''
+
+        with self.lock:
+            self.tables.clear()
+            self.stats.clear()
+
+
+# the tables of this process
+tables = TableRegistry()
+
+def cdf(dataFile, **kwargs):
+    '''
+    Returns a shared CDF of dataFile.  Arguments are as for CDF(); the
+    engine and valType are part of the key, as they affect the tables built.
+    '''
+
+    options = { k: v for k, v in kwargs.items()
+                if k not in ('useCache', 'cacheDir') }
+
+    return tables.get('cdf', dataFile, options,
+                      lambda: CDF(dataFile, **kwargs))
+
+
+def main(argv):
+    # when run as a script, this module is not the datagen.registry used by
+    # the elements.
+    from datagen.registry import tables
+    from datagen.namegen import USCensusNameSet
+    from datagen.tradegen import USCreditAccount
+
+    USCensusNameSet()
+    USCreditAccount()
+    USCreditAccount()
+
+    for s in tables.report():
+        print('{0:8.3f}s {1:10,d} bytes {2:10,d} mapped {3:3d} x {4:s} {5:s}'
+              .format(s['seconds'], s['bytes'], s['mapped'], s['requests'],
+                      s['kind'], os.path.basename(s['source'])))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
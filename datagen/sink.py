@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import gzip
+import sys
+
+# ### Output Sinks ###
+# A sink collects serialized records (strings) and writes them to the
+# underlying binary stream in large blocks, rather than issuing a write (and
+# a flush check) for every record.  Sinks are used as:
+#
+#     with openSink('out.json.gz') as sink:
+#         for e in entities:
+#             sink.write(json.dumps(e) + '\n')
+
+DEFAULT_BUFFER_SIZE = 1 << 20     # 1 MiB
+
+class BufferedSink(object):
+    '''
+    Accumulate text and write it, encoded, to 'stream' (a binary file object)
+    once at least 'bufferSize' characters are pending.  If 'closeStream' is
+    True, the stream is closed along with the sink.
+    '''
+
+    def __init__(self, stream, bufferSize = DEFAULT_BUFFER_SIZE,
+                       encoding = 'utf-8', closeStream = True):
+        self.stream = stream
+        self.bufferSize = bufferSize
+        self.encoding = encoding
+        self.closeStream = closeStream
+
+        self.parts = []
+        self.pending = 0
+        self.written = 0       # bytes written to the stream so far
+        return
+
+    def write(self, text):
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.pending >= self.bufferSize:
+            self.flush()
+
+        return
+
+    def flush(self):
+        if len(self.parts) > 0:
+            data = ''.join(self.parts).encode(self.encoding)
+            self.stream.write(data)
+            self.written += len(data)
+            self.parts = []
+            self.pending = 0
+
+        self.stream.flush()
+        return
+
+    def close(self):
+        if self.stream is None:
+            return
+
+        self.flush()
+        if self.closeStream:
+            self.stream.close()
+
+        self.stream = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class StdoutSink(BufferedSink):
+    '''
+    Write to standard output.  Standard output is flushed, but not closed,
+    when the sink is closed.
+    '''
+
+    def __init__(self, **kwargs):
+        BufferedSink.__init__(self, sys.stdout.buffer, closeStream = False,
+                              **kwargs)
+        return
+
+
+class FileSink(BufferedSink):
+    '''
+    Write to the named file, replacing its contents.
+    '''
+
+    def __init__(self, fileName, **kwargs):
+        BufferedSink.__init__(self, open(fileName, 'wb'), **kwargs)
+        return
+
+
+class GzipSink(BufferedSink):
+    '''
+    Write a gzip compressed stream to the named file.
+    '''
+
+    def __init__(self, fileName, compresslevel = 6, **kwargs):
+        stream = gzip.open(fileName, 'wb', compresslevel = compresslevel)
+        BufferedSink.__init__(self, stream, **kwargs)
+        return
+
+
+def openSink(target = None, **kwargs):
+    '''
+    Returns a sink for 'target': standard output if target is None or '-',
+    a GzipSink if it ends in '.gz', or a FileSink otherwise.
+    '''
+
+    if target is None or target == '-':
+        return StdoutSink(**kwargs)
+
+    if target.endswith('.gz'):
+        return GzipSink(target, **kwargs)
+
+    return FileSink(target, **kwargs)
@@ -0,0 +1,330 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import bisect
+import heapq
+import math
+
+from array import array
+
+from datagen.columns import GroupIndex
+
+# ### Spatial Index ###
+# GridIndex buckets points (latitude and longitude, in degrees) into a
+# uniform grid of cells.  The points of each cell are stored together, with
+# their coordinates, so that radius and nearest-neighbour queries only look
+# at the cells which could hold an answer.
+
+EARTH_RADIUS = 6371.0088                       # mean radius, km
+KM_PER_DEGREE = EARTH_RADIUS * math.pi / 180.0 # along a meridian
+
+def distance(lat1, lon1, lat2, lon2):
+    '''
+    Returns the great circle (haversine) distance in km between two points.
+    '''
+
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+
+    a = math.sin(dp / 2) ** 2 + \
+        math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+class GridIndex(object):
+    '''
+    The points of a table indexed by a grid of cells 'cell' degrees on a
+    side.  Points are identified by their row number in the table.
+
+    When 'cell' divides 360 (as the default does), the columns of cells wrap
+    at the antimeridian, so that points just either side of 180 degrees
+    longitude are neighbours.  Otherwise the grid does not wrap, and
+    queries do not reach across it.
+    '''
+
+    # cells of a tenth of a degree are about 11km north to south, which
+    # keeps both the number of cells and the points in each manageable for
+    # national address data.
+    CELL = 0.1
+
+    # rejection sampling attempts before sample() falls back to listing
+    # every point within the radius.
+    TRIES = 64
+
+    def __init__(self, cell, groups, lats, lons):
+        self.cell = cell
+        self.groups = groups   # GroupIndex of rows, keyed by 'i:j' cell
+        self.lats = lats       # coordinates of groups.rows[n]
+        self.lons = lons
+
+        self.columns, self.west = GridIndex.wrapping(cell)
+
+        self.cells = {}        # (i, j) -> group
+        for code, key in enumerate(groups.keys):
+            i, j = key.split(':')
+            self.cells[(int(i), int(j))] = code
+
+        if len(self.cells) > 0:
+            self.imin = min([ i for i, j in self.cells ])
+            self.imax = max([ i for i, j in self.cells ])
+            self.jmin = min([ j for i, j in self.cells ])
+            self.jmax = max([ j for i, j in self.cells ])
+
+        return
+
+    @staticmethod
+    def build(points, cell = None):
+        '''
+        Build the index from an iterable giving the (lat, lon) of each row,
+        in order.  Rows with a missing coordinate are not indexed.
+        '''
+
+        if cell is None:
+            cell = GridIndex.CELL
+
+        columns, west = GridIndex.wrapping(cell)
+
+        rowNumbers = array('I')
+        keys = []
+        coords = []
+        for n, (lat, lon) in enumerate(points):
+            if lat is None or lon is None:
+                continue
+
+            lat = float(lat)
+            lon = float(lon)
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+
+            j = math.floor(lon / cell)
+            if columns is not None:
+                j = (j - west) % columns + west
+
+            rowNumbers.append(n)
+            keys.append('{0:d}:{1:d}'.format(math.floor(lat / cell), j))
+            coords.append((lat, lon))
+
+        groups = GroupIndex.build(keys)
+
+        # group rows are positions in rowNumbers; translate them to rows of
+        # the table, and order the coordinates to match.
+        lats = array('d')
+        lons = array('d')
+        for k, pos in enumerate(groups.rows):
+            lat, lon = coords[pos]
+            lats.append(lat)
+            lons.append(lon)
+            groups.rows[k] = rowNumbers[pos]
+
+        return GridIndex(cell, groups, lats, lons)
+
+    @staticmethod
+    def wrapping(cell):
+        '''
+        Returns the number of columns of cells around the globe, and the
+        westernmost column (which starts at -180 degrees), or (None, None)
+        if cells 'cell' degrees wide do not wrap.
+        '''
+
+        columns = round(360.0 / cell)
+        if columns < 3 or abs(columns * cell - 360.0) > 1e-9:
+            return (None, None)
+
+        return (columns, math.floor(-180.0 / cell))
+
+    def cellOf(self, lat, lon):
+        return (math.floor(lat / self.cell),
+                self.column(math.floor(lon / self.cell)))
+
+    def column(self, j):
+        # column j, wrapped around the globe
+        if self.columns is None:
+            return j
+
+        return (j - self.west) % self.columns + self.west
+
+    def _box(self, lat, lon, km):
+        # the cells which may hold points within km of (lat, lon)
+        dlat = km / KM_PER_DEGREE
+        coslat = math.cos(math.radians(min(89.0, abs(lat) + dlat)))
+        dlon = min(180.0, dlat / max(coslat, 1e-6))
+
+        i0 = math.floor((lat - dlat) / self.cell)
+        i1 = math.floor((lat + dlat) / self.cell)
+        j0 = math.floor((lon - dlon) / self.cell)
+        j1 = math.floor((lon + dlon) / self.cell)
+
+        # the box's columns, wrapped (a box crossing the antimeridian takes
+        # columns from both ends of the grid)
+        if self.columns is None or \
+           (j0 >= self.west and j1 < self.west + self.columns):
+            cols = range(max(j0, self.jmin), min(j1, self.jmax) + 1)
+        elif j1 - j0 + 1 >= self.columns:
+            cols = range(self.jmin, self.jmax + 1)
+        else:
+            cols = [ self.column(j) for j in range(j0, j1 + 1) ]
+            cols = sorted([ j for j in cols if self.jmin <= j <= self.jmax ])
+
+        found = []
+        cells = self.cells
+        for i in range(max(i0, self.imin), min(i1, self.imax) + 1):
+            for j in cols:
+                code = cells.get((i, j))
+                if code is not None:
+                    found.append(code)
+
+        return found
+
+    def within(self, lat, lon, km):
+        '''
+        Returns the rows within km of (lat, lon), in no particular order.
+        '''
+
+        if len(self.cells) == 0:
+            return []
+
+        starts = self.groups.starts
+        rows = self.groups.rows
+        lats = self.lats
+        lons = self.lons
+
+        found = []
+        for code in self._box(lat, lon, km):
+            for k in range(starts[code], starts[code + 1]):
+                if distance(lat, lon, lats[k], lons[k]) <= km:
+                    found.append(rows[k])
+
+        return found
+
+    def sample(self, lat, lon, km, rnd):
+        '''
+        Returns a random row within km of (lat, lon), using rnd() (eg,
+        random.random) as the source of random numbers, or None if there is
+        none.  Each such row is equally likely.
+        '''
+
+        if len(self.cells) == 0:
+            return None
+
+        starts = self.groups.starts
+        codes = self._box(lat, lon, km)
+
+        # pick a point from the cells covering the circle, each point being
+        # equally likely, until one falls within it.
+        cumulative = []
+        total = 0
+        for code in codes:
+            total += starts[code + 1] - starts[code]
+            cumulative.append(total)
+
+        if total == 0:
+            return None
+
+        for attempt in range(GridIndex.TRIES):
+            n = int(rnd() * total)
+            c = bisect.bisect_right(cumulative, n)
+            k = starts[codes[c]] + n - (cumulative[c - 1] if c > 0 else 0)
+            if distance(lat, lon, self.lats[k], self.lons[k]) <= km:
+                return self.groups.rows[k]
+
+        # mostly empty circle; list what is there
+        found = self.within(lat, lon, km)
+        if len(found) == 0:
+            return None
+
+        found.sort()
+        return found[int(rnd() * len(found))]
+
+    def nearest(self, lat, lon, k):
+        '''
+        Returns the k rows nearest to (lat, lon), nearest first, as a list
+        of (distance in km, row) tuples.
+        '''
+
+        if len(self.cells) == 0 or k <= 0:
+            return []
+
+        starts = self.groups.starts
+        rows = self.groups.rows
+        lats = self.lats
+        lons = self.lons
+        cells = self.cells
+
+        ci, cj = self.cellOf(lat, lon)
+        colReach = max(abs(cj - self.jmin), abs(cj - self.jmax))
+        ncols = self.columns
+        if ncols is not None:
+            # no column is more than half way around the globe from ours
+            colReach = min(colReach, ncols // 2)
+
+        reach = max(abs(ci - self.imin), abs(ci - self.imax), colReach)
+
+        heap = []              # the best k so far, as (-distance, row)
+        r = 0
+        while r <= reach:
+            # the cells at (Chebyshev) distance r from the center cell
+            if r == 0:
+                ring = [ (ci, cj) ]
+            else:
+                ring = [ (ci + di, cj + dj)
+                         for di in (-r, r) for dj in range(-r, r + 1) ]
+                ring += [ (ci + di, cj + dj)
+                          for dj in (-r, r) for di in range(-r + 1, r) ]
+
+            if ncols is not None and \
+               (cj - r < self.west or cj + r >= self.west + ncols):
+                # wrap the columns, keeping those within half the globe
+                # east or west (any others were nearer the other way round,
+                # and are in an earlier ring)
+                ring = [ (i, self.column(j)) for i, j in ring
+                         if -ncols < 2 * (j - cj) <= ncols ]
+
+            for key in ring:
+                code = cells.get(key)
+                if code is None:
+                    continue
+
+                for n in range(starts[code], starts[code + 1]):
+                    d = distance(lat, lon, lats[n], lons[n])
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, rows[n]))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, rows[n]))
+
+            # any point beyond ring r is at least r cells away north/south
+            # or east/west of ours.
+            if len(heap) == k:
+                far = math.radians(min(89.0, abs(lat) + (r + 1) * self.cell))
+                bound = r * self.cell * KM_PER_DEGREE * math.cos(far)
+                if -heap[0][0] <= bound:
+                    break
+
+            r += 1
+
+        return sorted([ (-d, row) for d, row in heap ])
+
+    def sections(self, name):
+        d = self.groups.sections(name)
+        d[name + '.lats'] = self.lats
+        d[name + '.lons'] = self.lons
+        return d
+
+    @staticmethod
+    def fromSections(name, sections, cell):
+        return GridIndex(cell, GroupIndex.fromSections(name, sections),
+                         sections[name + '.lats'], sections[name + '.lons'])
@@ -13,10 +13,11 @@
 #   limitations under the License.
 
 import os
-import random
 import sys
 import sqlite3
 
+from datagen import permutation
+from datagen import sqlutil
 from datagen.entitygenerator import DictElement
 
 
@@ -28,6 +29,10 @@ class SQLElement(DictElement):
                  columns=None,
                  tableName=None,
                  keyCol='rowid',
+                 useCache=True,
+                 cacheDir=None,
+                 readOnly=False,
+                 unique=False,
                  **kwargs):
         '''
         Source data for a DictElement from a SQLite database.
@@ -45,10 +50,25 @@ class SQLElement(DictElement):
         'tableName' specifies the name of the table to be queried.
 
         'keyCol' is the name of the column containing the primary key.  This
-        column must be a unique integer, and all values between 1..max(keyCol)
-        are expected to be present.  If a value is missing, a new row will be
-        selected.  While this does not result in an error, too many attempts
-        to find a valid row could result in degraded performance.
+        column must be a unique integer.  Rows are drawn from an index of the
+        key values present (see datagen.sqlutil.loadKeys()), so the keys need
+        not be dense.
+
+        If 'useCache' is True (default), the key index is saved in compiled
+        form (see datagen.datacache) in 'cacheDir'.
+
+        If 'readOnly' is True, the database is opened read-only and tuned for
+        lookups (see datagen.sqlutil.connect()).  It must not be modified
+        while the element is in use.
+
+        Connections are taken from datagen.sqlutil.pool, one per thread (and
+        process), so the element may be used from several threads, and
+        pickled.
+
+        If 'unique' is True, no row is drawn twice (see
+        datagen.permutation.LazyShuffle), and a RuntimeError is raised once
+        every row has been used.  getUniqueState() and setUniqueState() save
+        and restore the pool of unused rows.
 
         CAUTION:  do not allow external sources to provide 'tableName' or
                   'keyCol'.  These values are used to construct SQL
@@ -70,8 +90,11 @@ class SQLElement(DictElement):
 
         dbFile = os.path.join(dataPath, dataFile)
 
-        db = sqlite3.connect(dbFile)
-        self.db = db
+        self.dbFile = os.path.abspath(dbFile)
+        self.readOnly = readOnly
+        self.useCache = useCache
+        self.cacheDir = cacheDir
+        db = self.db
 
         self.keyCol = keyCol
         self.tableName = tableName
@@ -93,18 +116,51 @@ class SQLElement(DictElement):
         query = query.format(', '.join(columns), tableName, keyCol)
         self.query = query
 
-        # how many entries in the database?
-        rangeSql = 'select max({0:s}) from {1:s}'.format(keyCol, tableName)
-        cur = db.execute(rangeSql)
-        range = cur.fetchone()[0]
-        self.maxRange = range
+        # the keys present in the table
+        self.keys = sqlutil.loadKeys(db, dbFile, tableName, keyCol,
+                                     useCache, cacheDir)
+
+        self.shuffle = None
+        if unique:
+            self.shuffle = permutation.LazyShuffle(len(self.keys))
 
         return
 
+    @property
+    def db(self):
+        return sqlutil.connection(self.dbFile, self.readOnly)
+
+    def __getstate__(self):
+        # the key index may be mapped from the cache; load it again instead
+        state = DictElement.__getstate__(self)
+        state['keys'] = None
+        return state
+
+    def __setstate__(self, state):
+        DictElement.__setstate__(self, state)
+        self.keys = sqlutil.loadKeys(self.db, self.dbFile, self.tableName,
+                                     self.keyCol, self.useCache, self.cacheDir)
+
+    def getUniqueState(self):
+        return self.shuffle.getState()
+
+    def setUniqueState(self, state):
+        self.shuffle.setState(state)
+
     def create(self):
-        r = int(random.random() * self.maxRange) + 1
-        rset = self.db.execute(self.query, (r,))
+        if self.shuffle is not None:
+            if self.shuffle.remaining() == 0:
+                raise RuntimeError('all {0:d} rows of {1:s} have been used'
+                                   .format(len(self.keys), self.tableName))
+
+            key = self.keys[self.shuffle.draw(self.rng.random)]
+        else:
+            key = self.keys[int(self.rng.random() * len(self.keys))]
+
+        rset = self.db.execute(self.query, (key,))
         row = rset.fetchone()
+        if row is None:
+            raise RuntimeError('no row with {0:s} = {1:d}'.format(self.keyCol, key))
 
         r = dict(zip(self.columns, row))
         DictElement.addChildren(self, r)
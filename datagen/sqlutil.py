@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+
+#   Copyright 2019 by Jeff Woods
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import atexit
+import os
+import sqlite3
+import threading
+import urllib.parse
+
+from array import array
+
+from datagen import datacache
+
+# Helpers shared by the elements which draw rows from SQLite tables.
+
+# settings for read-only connections (see connect())
+MMAP_SIZE = 1 << 30            # bytes of the database file to map
+CACHE_SIZE = 64 << 20          # bytes of page cache
+STATEMENT_CACHE = 256          # prepared statements kept per connection
+
+def connect(dbFile, readOnly = False, check_same_thread = True):
+    '''
+    Open the SQLite database 'dbFile'.
+
+    If readOnly is True, the database is opened read-only and immutable
+    (SQLite then takes no locks and never checks for changes made by others),
+    memory-mapped, with a larger page cache, and query_only set.  The file
+    must not be modified while the connection is open.
+    '''
+
+    if not readOnly:
+        return sqlite3.connect(dbFile, check_same_thread = check_same_thread)
+
+    uri = 'file:{0:s}?mode=ro&immutable=1'.format(
+              urllib.parse.quote(os.path.abspath(dbFile)))
+    db = sqlite3.connect(uri, uri = True,
+                         cached_statements = STATEMENT_CACHE,
+                         check_same_thread = check_same_thread)
+
+    db.execute('pragma mmap_size = {0:d}'.format(MMAP_SIZE))
+    db.execute('pragma cache_size = {0:d}'.format(-(CACHE_SIZE >> 10)))
+    db.execute('pragma query_only = 1')
+    return db
+
+class ConnectionPool(object):
+    '''
+    Hands out SQLite connections, opened lazily, one per thread for each
+    (database, readOnly) pair.  Elements ask the pool for their connection
+    rather than keeping one, so that they may be used from several threads
+    and pickled into worker processes.
+
+    Connections are never shared across a fork: the child opens its own, and
+    leaves those it inherited untouched (SQLite must not use a connection
+    opened by another process).  Connections still open at exit are closed.
+    '''
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = []       # connections opened by this process
+        self.inherited = []    # connections opened by our parent
+
+    def get(self, dbFile, readOnly = False):
+        '''
+        Returns this thread's connection to 'dbFile'.
+        '''
+
+        try:
+            conns = self.local.conns
+        except AttributeError:
+            conns = self.local.conns = {}
+
+        key = (dbFile, readOnly)
+        db = conns.get(key)
+        if db is None:
+            # only this thread uses the connection, but closeAll() may be
+            # called from another.
+            db = connect(dbFile, readOnly, check_same_thread = False)
+            conns[key] = db
+            with self.lock:
+                self.opened.append(db)
+
+        return db
+
+    def forked(self):
+        '''
+        Called in the child after a fork.  Forget (but do not close) the
+        connections of the parent.
+        '''
+
+        self.inherited.extend(self.opened)
+        self.opened = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def closeAll(self):
+        '''
+        Close every connection this process has opened.  Connections are
+        opened again as they are needed.
+        '''
+
+        with self.lock:
+            opened = self.opened
+            self.opened = []
+            self.local = threading.local()
+
+        for db in opened:
+            db.close()
+
+        return
+
+# the pool used by the SQL-backed elements
+pool = ConnectionPool()
+
+atexit.register(pool.closeAll)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = pool.forked)
+
+def connection(dbFile, readOnly = False):
+    '''
+    Returns the calling thread's connection to 'dbFile' from the shared
+    pool.  'dbFile' should be an absolute path, so that all users of a
+    database share its connections.
+    '''
+
+    return pool.get(dbFile, readOnly)
+
+def keysPath(dbFile, tableName, keyCol):
+    '''
+    Returns the name of the sidecar file holding the key index of
+    'tableName' (see loadKeys()), next to the database.
+    '''
+
+    return '{0:s}.{1:s}.{2:s}.keys'.format(dbFile, tableName, keyCol)
+
+def loadKeys(db, dbFile, tableName, keyCol, useCache = True, cacheDir = None):
+    '''
+    Returns the values of the integer column 'keyCol' of 'tableName', in
+    ascending order, as a packed array (or a memoryview over a saved copy).
+    Drawing a random row is then keys[int(random() * len(keys))] -- a single
+    draw, however many keys are missing from the range.
+
+    The keys are saved in compiled form (see datagen.datacache) in a sidecar
+    file next to the database (see keysPath()), so they go wherever the
+    database goes.  Only if that cannot be written are they saved in
+    cacheDir instead.  The copy is checked against the size and
+    modification time of the database and its write-ahead log only, as
+    reading a large database to compute a digest would cost more than the
+    query it saves.
+
+    CAUTION:  'tableName' and 'keyCol' are used to construct SQL statements.
+    '''
+
+    options = [ tableName, keyCol ]
+    sidecar = keysPath(dbFile, tableName, keyCol)
+    if useCache:
+        compiled = datacache.load(dbFile, 'keys', options, digest = False,
+                                  path = sidecar)
+        if compiled is None:
+            compiled = datacache.load(dbFile, 'keys', options, cacheDir,
+                                      digest = False)
+        if compiled is not None:
+            return compiled[1]['keys']
+
+    sql = 'select {0:s} from {1:s} where {0:s} is not null order by {0:s}'
+    cur = db.execute(sql.format(keyCol, tableName))
+
+    try:
+        keys = array('q', [ row[0] for row in cur ])
+    except TypeError:
+        raise ValueError('{0:s}.{1:s} must be an integer column'
+                         .format(tableName, keyCol))
+
+    if len(keys) == 0:
+        raise ValueError('table {0:s} has no rows'.format(tableName))
+
+    if useCache:
+        if datacache.store(dbFile, 'keys', { 'keys': keys }, options,
+                           digest = False, path = sidecar) is None:
+            datacache.store(dbFile, 'keys', { 'keys': keys }, options,
+                            directory = cacheDir, digest = False)
+
+    return keys
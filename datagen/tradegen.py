@@ -20,8 +20,8 @@ import gzip
 import csv
 import json
 import os
-import random
 
+from datagen import registry
 from datagen.entitygenerator import EntityElement, DictElement
 
 class TradeElement(DictElement):
@@ -39,9 +39,21 @@ class TradeElement(DictElement):
         if datapath is not None:
             dataFile = os.path.join(datapath, dataFile)
 
-        trades = [ ]
         fields = None
 
+        # the ranges are shared with other elements reading the same file
+        # (see datagen.registry); create() copies the range it uses.
+        options = { 'countryFilter': countryFilter }
+        self.fields = fields
+        self.trades = registry.tables.get('trades', dataFile, options,
+                          lambda: TradeElement._load(dataFile, countryFilter))
+
+        return
+
+    @staticmethod
+    def _load(dataFile, countryFilter):
+        trades = [ ]
+
         f = gzip.open(dataFile, 'rt')
 
         # dictreader defaults to using first row as header (good!!)
@@ -54,10 +66,7 @@ class TradeElement(DictElement):
 
         f.close()
 
-        self.fields = fields
-        self.trades = trades
-
-        return
+        return tuple(trades)
 
     @staticmethod
     def digits_of(number):
@@ -78,7 +87,7 @@ class TradeElement(DictElement):
         return TradeElement.luhn_checksum(card_number) == 0
 
     def create(self, **kwargs):
-        r = int(random.random() * len(self.trades))
+        r = int(self.rng.random() * len(self.trades))
         d = self.trades[r].copy()
 
         #print(str(d))
@@ -91,7 +100,7 @@ class TradeElement(DictElement):
         if iin_start == iin_end:
             r = 0
         else:
-            rnd = random.random()
+            rnd = self.rng.random()
             r = int(rnd * (iin_range + 1))
 
         iin = iin_start + r
@@ -111,7 +120,7 @@ class TradeElement(DictElement):
         
         # build the random account number
         n = acct_len - 6 - 1   # less BIN number and Luhn check digit
-        acct = iin + str(int(random.random() * (10 ** n))).zfill(n)
+        acct = iin + str(int(self.rng.random() * (10 ** n))).zfill(n)
         acct += str(self.luhn_checksum( acct ))
         d['account_no'] = acct
 
@@ -0,0 +1,416 @@
+#!/usr/bin/python3
+
+from datagen import sqlutil
+from datagen.addrgen import USAddress, USAddressDB
+from datagen.spatial import distance
+from datagen.entitygenerator import EntityGenerator, EntityElement, \
+                                    ArrayElement, SimpleElement
+
+import gzip
+import json
+import os
+import pickle
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+
+class TestAddressDB(unittest.TestCase):
+
+    rows = 500
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        rnd = random.Random(1)
+        db = sqlite3.connect(os.path.join(self.tmp, 'addr.db'))
+        db.execute('create table us_address (street1 text, city text, '
+                   'state text, postalcode text, lat real, lon real)')
+        for i in range(TestAddressDB.rows):
+            db.execute('insert into us_address values (?, ?, ?, ?, ?, ?)',
+                       ('{0:d} MAIN ST'.format(i),
+                        'CITY {0:d}'.format(rnd.randrange(20)),
+                        rnd.choice([ 'NY', 'NJ', 'CT' ]),
+                        '{0:05d}'.format(rnd.randrange(100000)),
+                        rnd.uniform(25.0, 49.0), rnd.uniform(-124.0, -67.0)))
+
+        db.commit()
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def build(self, **kwargs):
+        egen = EntityGenerator(seed = 3)
+        addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                           cacheDir = self.tmp, **kwargs)
+        egen.addElement(ArrayElement(name = 'addresses',
+                                     count_fn = EntityElement.count_rand_fn(max = 9, min = 1),
+                                     generator = addr))
+        return egen.compile()
+
+    def generate(self, egen):
+        # seeded entities (reseeding every stream) followed by a run of
+        # plain create() calls.
+        data = list(egen.generate(200, 10))
+        data.extend([ egen.create() for i in range(200) ])
+        return data
+
+    def test_modes_match(self):
+        '''
+        Prefetching and in-memory tables generate the same addresses as a
+        query per address.
+        '''
+
+        expected = self.generate(self.build())
+        for kwargs in ({ 'prefetch': 1 }, { 'prefetch': 8 },
+                       { 'prefetch': 1000 }, { 'memoryLimit': 1 << 30 },
+                       { 'readOnly': True },
+                       { 'readOnly': True, 'prefetch': 8 }):
+            egen = self.build(**kwargs)
+            data = self.generate(egen)
+            self.assertEqual(data, expected, kwargs)
+
+            # every mode returns plain dicts
+            for e in data:
+                for a in e['addresses']:
+                    self.assertIs(type(a), dict, kwargs)
+
+            json.dumps(data)
+
+    def test_memory_limit(self):
+        small = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                            memoryLimit = 1024, useCache = False)
+        self.assertIsNone(small.table)
+
+        big = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                          memoryLimit = 1 << 30, useCache = False)
+        self.assertEqual(len(big.table), len(big.columns))
+        self.assertEqual(len(big.table[0]), TestAddressDB.rows)
+
+    def test_prefetch_batches(self):
+        '''
+        Queries are made only when the prefetched rows run out.
+        '''
+
+        addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                           prefetch = 64, rng = random.Random(2),
+                           useCache = False)
+
+        statements = []
+        addr.db.set_trace_callback(statements.append)
+        for i in range(8):
+            addr.create()
+
+        self.assertEqual(len(statements), 1)
+
+        for i in range(8 + 16 + 32 + 64 - 8):
+            addr.create()
+
+        self.assertEqual(len(statements), 4)
+
+    def test_read_only(self):
+        addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                           readOnly = True, useCache = False)
+        self.assertEqual(addr.db.execute('pragma query_only').fetchone()[0], 1)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            addr.db.execute('delete from us_address')
+
+    def test_filters(self):
+        for kwargs in ({}, { 'prefetch': 8 }, { 'memoryLimit': 1 << 30 }):
+            addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                               cacheDir = self.tmp, rng = random.Random(1),
+                               params = { 'state': 'NJ', 'city': 'CITY 7' },
+                               **kwargs)
+
+            rows = [ addr.create() for i in range(50) ]
+            self.assertEqual(set([ (r['state'], r['city']) for r in rows ]),
+                             set([ ('NJ', 'CITY 7') ]), kwargs)
+
+            index = addr.getIndex(('city', 'state'))
+            self.assertEqual(len(set([ r['street1'] for r in rows ])),
+                             index.count('CITY 7\x1fNJ'))
+
+    def test_spatial(self):
+        for kwargs in ({}, { 'memoryLimit': 1 << 30 }):
+            egen = EntityGenerator(seed = 1)
+            egen.addElement(USAddressDB(name = 'home', datapath = self.tmp,
+                                        dbFile = 'addr.db', cacheDir = self.tmp,
+                                        **kwargs))
+            near = USAddressDB(name = 'near', datapath = self.tmp,
+                               dbFile = 'addr.db', cacheDir = self.tmp,
+                               params = { 'near': '/home', 'radius': 400 },
+                               **kwargs)
+            egen.addElement(near)
+
+            for i in range(50):
+                e = egen.create()
+                d = distance(e['home']['lat'], e['home']['lon'],
+                             e['near']['lat'], e['near']['lon'])
+                self.assertLessEqual(d, 400.0)
+
+            found = near.nearest(37.0, -95.0, 5)
+            dists = [ distance(37.0, -95.0, a['lat'], a['lon']) for a in found ]
+            self.assertEqual(dists, sorted(dists))
+
+            within = near.within(37.0, -95.0, dists[-1])
+            self.assertEqual(len(within), 5)
+
+        with self.assertRaises(ValueError):
+            USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                        params = { 'near': '/home', 'state': 'NJ' })
+
+    def test_unique(self):
+        for kwargs in ({}, { 'prefetch': 8 }, { 'memoryLimit': 1 << 30 }):
+            addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                               cacheDir = self.tmp, rng = random.Random(1),
+                               unique = True, **kwargs)
+
+            streets = [ addr.create()['street1'] for i in range(300) ]
+            state = addr.getUniqueState()
+            streets += [ addr.create()['street1'] for i in range(200) ]
+            self.assertEqual(len(set(streets)), TestAddressDB.rows)
+
+            with self.assertRaises(RuntimeError):
+                addr.create()
+
+            # resume from the saved state
+            addr.setUniqueState(state)
+            addr.rng = random.Random(7)
+            rest = [ addr.create()['street1'] for i in range(200) ]
+            self.assertEqual(set(rest), set(streets[300:]))
+
+        with self.assertRaises(ValueError):
+            USAddressDB(datapath = self.tmp, dbFile = 'addr.db', unique = True,
+                        params = { 'state': 'NJ' })
+
+    def test_pickle(self):
+        '''
+        An unpickled element generates what the original would have.
+        '''
+
+        for kwargs in ({}, { 'prefetch': 8 }, { 'memoryLimit': 1 << 30 }):
+            addr = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                               rng = random.Random(4), cacheDir = self.tmp,
+                               **kwargs)
+            addr.create()
+
+            copy = pickle.loads(pickle.dumps(addr))
+            self.assertEqual([ copy.create() for i in range(50) ],
+                             [ addr.create() for i in range(50) ], kwargs)
+
+    def test_sparse_keys(self):
+        '''
+        Rows are drawn only from the keys present, with no retries.
+        '''
+
+        db = sqlite3.connect(os.path.join(self.tmp, 'addr.db'))
+        db.execute('delete from us_address where rowid % 3 != 0 or rowid > 400')
+        db.commit()
+        db.close()
+
+        expected = self.generate(self.build())
+        streets = set([ a['street1'] for e in expected for a in e['addresses'] ])
+        self.assertTrue(all([ int(s.split()[0]) % 3 == 2 for s in streets ]))
+
+        for kwargs in ({ 'prefetch': 8 }, { 'memoryLimit': 1 << 30 }):
+            egen = self.build(**kwargs)
+            self.assertEqual(self.generate(egen), expected, kwargs)
+
+    def test_key_cache(self):
+        '''
+        The key index is read from the cache until the database changes.
+        '''
+
+        first = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                            cacheDir = self.tmp)
+        self.assertEqual(list(first.keys), list(range(1, TestAddressDB.rows + 1)))
+
+        second = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                             cacheDir = self.tmp)
+        self.assertIsInstance(second.keys, memoryview)
+        self.assertEqual(list(second.keys), list(first.keys))
+
+        db = sqlite3.connect(os.path.join(self.tmp, 'addr.db'))
+        db.execute('delete from us_address where rowid > 10')
+        db.commit()
+        db.close()
+
+        third = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                            cacheDir = self.tmp)
+        self.assertEqual(list(third.keys), list(range(1, 11)))
+
+    def test_key_sidecar(self):
+        '''
+        The key index is kept next to the database, not in cacheDir, and
+        writes still in the write-ahead log invalidate it.
+        '''
+
+        cacheDir = os.path.join(self.tmp, 'cache')
+        dbFile = os.path.join(self.tmp, 'addr.db')
+
+        db = sqlite3.connect(dbFile)
+        db.execute('pragma journal_mode = wal')
+
+        first = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                            cacheDir = cacheDir)
+        self.assertTrue(os.path.exists(
+                        sqlutil.keysPath(dbFile, 'us_address', 'rowid')))
+        self.assertFalse(os.path.exists(cacheDir))
+
+        # not checkpointed while the connection is open
+        db.execute('delete from us_address where rowid > 10')
+        db.commit()
+        self.assertTrue(os.path.getsize(dbFile + '-wal') > 0)
+
+        second = USAddressDB(datapath = self.tmp, dbFile = 'addr.db',
+                             cacheDir = cacheDir)
+        self.assertEqual(list(second.keys), list(range(1, 11)))
+        db.close()
+
+
+class Counter(SimpleElement):
+    '''
+    Returns 0, 1, 2, ... on successive calls.
+    '''
+
+    def __init__(self, **kwargs):
+        SimpleElement.__init__(self, **kwargs)
+        self.n = 0
+
+    def create(self, **kwargs):
+        self.n += 1
+        return self.n - 1
+
+
+class Choice(SimpleElement):
+    '''
+    Returns one of 'values', at random.
+    '''
+
+    def __init__(self, values, **kwargs):
+        SimpleElement.__init__(self, **kwargs)
+        self.values = values
+
+    def create(self, **kwargs):
+        return self.rng.choice(self.values)
+
+
+class TestAddressFile(unittest.TestCase):
+
+    lines = [ '1 MAIN ST|SPRINGFIELD|IL|62701|39.8|-89.6',
+              '2 OAK AVE|SPRINGFIELD|IL|62702|39.7|-89.7',
+              'BAD LINE|SPRINGFIELD',
+              '3 ÉLAN CT|AUSTIN|TX|73301|30.3|-97.7',
+              '4 ELM ST|AUSTIN|TX|73301|north|-97.7',
+              '5 PINE ST|DOVER|DE|19901|39.2|-75.5' ]
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        with gzip.open(os.path.join(self.tmp, 'addr.dat.gz'), 'wt',
+                       encoding = 'utf-8') as f:
+            f.write('\n'.join(TestAddressFile.lines) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def build(self, **kwargs):
+        return USAddress(datapath = self.tmp, dataFile = 'addr.dat.gz',
+                         cacheDir = self.tmp, rng = random.Random(1),
+                         **kwargs)
+
+    def test_columns(self):
+        addr = self.build(useCache = False)
+
+        # the two invalid lines are skipped
+        self.assertEqual(addr.count, 4)
+
+        rows = [ { f: col[i] for f, col in zip(addr.fields, addr.columns) }
+                 for i in range(addr.count) ]
+        self.assertEqual(rows[2], { 'street1': '3 ÉLAN CT', 'city': 'AUSTIN',
+                                    'state': 'TX', 'postalcode': '73301',
+                                    'lat': 30.3, 'lon': -97.7 })
+
+        city = addr.columns[addr.fields.index('city')]
+        self.assertEqual(city.values, [ 'SPRINGFIELD', 'AUSTIN', 'DOVER' ])
+        self.assertEqual(list(city.codes), [ 0, 0, 1, 2 ])
+
+        streets = set([ addr.create()['street1'] for i in range(200) ])
+        self.assertEqual(len(streets), 4)
+
+    def test_children(self):
+        '''
+        Children added to an address belong to that address alone, however
+        often its row is drawn.
+        '''
+
+        egen = EntityGenerator(seed = 1)
+        addr = self.build()
+        addr.addElement(Counter(name = 'serial'))
+        egen.addElement(ArrayElement(name = 'addresses', count = 3,
+                                     generator = addr))
+
+        data = [ egen.create() for i in range(20) ]
+        serials = [ a['serial'] for e in data for a in e['addresses'] ]
+        self.assertEqual(serials, list(range(60)))
+
+        # plain dicts, as AddressDB returns
+        self.assertIs(type(data[0]['addresses'][0]), dict)
+        self.assertEqual(json.loads(json.dumps(data)), data)
+
+        columns = egen.create_columns(5)
+        self.assertEqual(columns.columns['addresses.serial'], list(range(60, 75)))
+        self.assertEqual(len(columns.columns['addresses.lat']), 15)
+
+    def test_filters(self):
+        addr = self.build(params = { 'state': 'IL' })
+        self.assertEqual(set([ addr.create()['postalcode'] for i in range(50) ]),
+                         set([ '62701', '62702' ]))
+
+        addr = self.build(params = { 'zip3': '73301-0001' })
+        self.assertEqual(set([ addr.create()['street1'] for i in range(20) ]),
+                         set([ '3 ÉLAN CT' ]))
+
+        addr = self.build(params = { 'state': 'IL', 'city': 'SPRINGFIELD',
+                                     'zip3': None })
+        self.assertEqual(len(set([ addr.create()['street1'] for i in range(50) ])), 2)
+        self.assertIn(('city', 'state'), addr.indexes)
+
+        addr = self.build(params = { 'state': 'IL', 'city': 'DOVER' })
+        with self.assertRaises(ValueError):
+            addr.create()
+
+    def test_filter_path(self):
+        egen = EntityGenerator(seed = 1)
+        egen.addElement(Choice([ 'TX', 'DE' ], name = 'home_state'))
+        egen.addElement(self.build(name = 'home',
+                                   params = { 'state': '/home_state' }))
+        egen.compile()
+
+        states = set()
+        for i in range(50):
+            e = egen.create()
+            self.assertEqual(e['home']['state'], e['home_state'])
+            states.add(e['home_state'])
+
+        self.assertEqual(states, set([ 'TX', 'DE' ]))
+
+        # the index is cached with the address data
+        addr = self.build(params = { 'state': 'DE' })
+        self.assertEqual(addr.create()['city'], 'DOVER')
+        self.assertIsInstance(addr.indexes[('state',)].rows, memoryview)
+
+    def test_cache(self):
+        first = self.build()
+        expected = [ first.create() for i in range(20) ]
+
+        cached = self.build()
+        self.assertIsInstance(cached.columns[0].blob, memoryview)
+        self.assertEqual([ cached.create() for i in range(20) ], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
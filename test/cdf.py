@@ -1,11 +1,17 @@
 #!/usr/bin/python3
 
+from datagen import datacache
 from datagen.cdf import CDF
 
+import array
 import os
 import random
+import shutil
+import tempfile
 import unittest
 
+from unittest import mock
+
 
 class TestCDF(unittest.TestCase):
 
@@ -15,6 +21,20 @@ class TestCDF(unittest.TestCase):
         random.seed(TestCDF.seed)  # for test, use the same seed every time!!
         self.test_data_path = os.path.join(os.path.dirname(__file__), "testdata")
 
+        # keep compiled tables (see datagen.datacache) out of the user's
+        # cache directory
+        self.dir = tempfile.mkdtemp()
+        self.cacheDir = os.environ.get('DATAGEN_CACHE_DIR')
+        os.environ['DATAGEN_CACHE_DIR'] = self.dir
+
+    def tearDown(self):
+        if self.cacheDir is None:
+            del os.environ['DATAGEN_CACHE_DIR']
+        else:
+            os.environ['DATAGEN_CACHE_DIR'] = self.cacheDir
+
+        shutil.rmtree(self.dir)
+
     def test_compressed(self):
         dfile = os.path.join(self.test_data_path, "is_gzip.gz")
         self.assertTrue(CDF.isGzip(dfile))
@@ -99,6 +119,164 @@ class TestCDF(unittest.TestCase):
 
         return
 
+    def test_alias_engine(self):
+        '''
+        The alias engine must reproduce the same distribution as the default
+        (bisect) engine.  Sweep r evenly over [0, 1) so the counts are exact
+        rather than subject to sampling noise.
+        '''
+
+        dfile = os.path.join(self.test_data_path, 'data_relative.csv')
+        bisect_cdf = CDF(dfile, delimiter = '|')
+        alias_cdf = CDF(dfile, delimiter = '|', engine = 'alias')
+
+        steps = 100000
+        counts = { 'bisect': {}, 'alias': {} }
+        for i in range(steps):
+            r = i / steps
+            for engine, cdf in (('bisect', bisect_cdf), ('alias', alias_cdf)):
+                v = cdf.getValue(r)
+                counts[engine][v] = counts[engine].get(v, 0) + 1
+
+        self.assertEqual(set(counts['bisect'].keys()),
+                         set(counts['alias'].keys()))
+
+        for k in counts['bisect'].keys():
+            self.assertAlmostEqual(counts['bisect'][k] / steps,
+                                   counts['alias'][k] / steps,
+                                   places = 3)
+
+        # r values which round up to the end of the table must not overflow
+        self.assertIn(alias_cdf.getValue(1.0 - 2**-53), alias_cdf.values)
+
+        return
+
+    def test_get_values(self):
+        '''
+        getValues() must return exactly what successive getValue() calls
+        would have returned given the same random state.
+        '''
+
+        dfile = os.path.join(self.test_data_path, 'data_relative.csv')
+        for engine in CDF.engines:
+            cdf = CDF(dfile, delimiter = '|', engine = engine)
+
+            rng = random.Random(7)
+            expected = [ cdf.getValue(rng.random()) for i in range(1000) ]
+
+            self.assertEqual(cdf.getValues(1000, rng = random.Random(7)),
+                             expected)
+
+            random.seed(7)
+            self.assertEqual(cdf.getValues(1000), expected)
+
+        return
+
+    def test_compiled_cache(self):
+        '''
+        A second CDF built from the same file must be loaded from the
+        compiled cache and must match the parsed original.  Changing the
+        source file must invalidate the cache.
+        '''
+
+        tmp = tempfile.mkdtemp()
+        try:
+            dfile = os.path.join(tmp, 'data.csv')
+            shutil.copy(os.path.join(self.test_data_path, 'data_relative.csv'),
+                        dfile)
+
+            parsed = CDF(dfile, delimiter = '|', cacheDir = tmp)
+            cached = CDF(dfile, delimiter = '|', cacheDir = tmp)
+
+            self.assertIsInstance(cached.cumdist, memoryview)
+            self.assertEqual(cached.values, parsed.values)
+            self.assertEqual(list(cached.cumdist), list(parsed.cumdist))
+            self.assertEqual(list(cached.weights), list(parsed.weights))
+            self.assertEqual(cached.range, parsed.range)
+
+            # different parse options are cached separately
+            other = CDF(dfile, delimiter = '|', isCumulative = False,
+                        skipHeader = True, cacheDir = tmp)
+            self.assertEqual(other.values, parsed.values[1:])
+
+            with open(dfile, 'a') as f:
+                f.write('ZACHARY|1.0\n')
+
+            changed = CDF(dfile, delimiter = '|', cacheDir = tmp)
+            self.assertNotIsInstance(changed.cumdist, memoryview)
+            self.assertEqual(changed.values[-1], 'ZACHARY')
+
+            # both files built from the earlier version have been removed
+            cached = [ n for n in os.listdir(tmp) if n.endswith('.dgc') ]
+            self.assertEqual(len(cached), 1)
+        finally:
+            shutil.rmtree(tmp)
+
+        return
+
+    def test_evict_missing(self):
+        '''
+        Cache files whose source no longer exists are removed by evict(),
+        and by the next store() in the same directory.
+        '''
+
+        tmp = tempfile.mkdtemp()
+        try:
+            for name in ('a.csv', 'b.csv', 'c.csv'):
+                shutil.copy(os.path.join(self.test_data_path,
+                                         'data_relative.csv'),
+                            os.path.join(tmp, name))
+                CDF(os.path.join(tmp, name), delimiter = '|', cacheDir = tmp)
+
+            def cached():
+                return sorted([ n.split('.')[0] for n in os.listdir(tmp)
+                                if n.endswith('.dgc') ])
+
+            self.assertEqual(cached(), [ 'a', 'b', 'c' ])
+
+            os.remove(os.path.join(tmp, 'a.csv'))
+            removed = datacache.evict(directory = tmp)
+            self.assertEqual([ os.path.basename(p)[:2] for p in removed ],
+                             [ 'a.' ])
+            self.assertEqual(cached(), [ 'b', 'c' ])
+
+            os.remove(os.path.join(tmp, 'b.csv'))
+            CDF(os.path.join(tmp, 'c.csv'), delimiter = '|', skipHeader = True,
+                cacheDir = tmp)
+            self.assertEqual(cached(), [ 'c', 'c' ])
+        finally:
+            shutil.rmtree(tmp)
+
+        return
+
+    def test_cache_write_failure(self):
+        '''
+        A cache file which cannot be written leaves nothing behind.
+        '''
+
+        tmp = tempfile.mkdtemp()
+        try:
+            dfile = os.path.join(tmp, 'data.csv')
+            shutil.copy(os.path.join(self.test_data_path, 'data_relative.csv'),
+                        dfile)
+
+            with mock.patch('os.replace', side_effect = OSError):
+                path = datacache.store(dfile, 'test',
+                                       { 'x': array.array('d', [ 1.0 ]) },
+                                       directory = tmp)
+
+            self.assertIsNone(path)
+            self.assertEqual(os.listdir(tmp), [ 'data.csv' ])
+        finally:
+            shutil.rmtree(tmp)
+
+        return
+
+    def test_invalid_engine(self):
+        dfile = os.path.join(self.test_data_path, 'data_relative.csv')
+        with self.assertRaises(ValueError):
+            CDF(dfile, delimiter = '|', engine = 'linear')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+from datagen.columns import StringColumn, DictColumn, FloatColumn, RowView, \
+                            toSections, fromSections, jsonDefault
+
+import copy
+import json
+import pickle
+import unittest
+
+
+class TestColumns(unittest.TestCase):
+
+    def build(self):
+        cols = { 'street': StringColumn(),
+                 'state': DictColumn(),
+                 'lat': FloatColumn() }
+
+        for street, state, lat in (('1 MAIN ST', 'TX', 30.5),
+                                   ('2 ÉLAN CT', 'NY', 40.25),
+                                   ('', 'TX', -1.0)):
+            cols['street'].append(street)
+            cols['state'].append(state)
+            cols['lat'].append(lat)
+
+        for col in cols.values():
+            col.finish()
+
+        return cols
+
+    def test_columns(self):
+        cols = self.build()
+
+        self.assertEqual([ cols['street'][i] for i in range(3) ],
+                         [ '1 MAIN ST', '2 ÉLAN CT', '' ])
+        self.assertEqual(cols['state'].values, [ 'TX', 'NY' ])
+        self.assertEqual(list(cols['state'].codes), [ 0, 1, 0 ])
+        self.assertEqual(len(cols['lat']), 3)
+
+    def test_sections(self):
+        cols = self.build()
+        kinds, sections = toSections(cols)
+
+        # as datacache.load() returns them
+        views = {}
+        for name, data in sections.items():
+            mv = memoryview(bytes(data) if isinstance(data, (bytes, bytearray))
+                            else data.tobytes())
+            views[name] = mv if isinstance(data, (bytes, bytearray)) \
+                          else mv.cast(data.typecode)
+
+        loaded = fromSections(kinds, views)
+        for name, col in cols.items():
+            self.assertEqual([ loaded[name][i] for i in range(3) ],
+                             [ col[i] for i in range(3) ])
+
+    def test_row_view(self):
+        cols = self.build()
+        row = RowView(cols, 1)
+        other = RowView(cols, 1)
+
+        self.assertEqual(row, { 'street': '2 ÉLAN CT', 'state': 'NY',
+                                'lat': 40.25 })
+
+        row['phones'] = [ '5551234567' ]
+        row['state'] = 'NJ'
+        self.assertEqual(row['state'], 'NJ')
+        self.assertEqual(list(row), [ 'street', 'lat', 'phones', 'state' ])
+        self.assertEqual(len(row), 4)
+
+        # the columns (and other views of the row) are untouched
+        self.assertEqual(cols['state'][1], 'NY')
+        self.assertEqual(dict(other), { 'street': '2 ÉLAN CT', 'state': 'NY',
+                                        'lat': 40.25 })
+
+        del row['state']
+        self.assertEqual(row['state'], 'NY')
+        with self.assertRaises(TypeError):
+            del row['state']
+        with self.assertRaises(KeyError):
+            del row['nothing']
+
+    def test_serialize(self):
+        row = RowView(self.build(), 0)
+        row['phones'] = [ '5551234567' ]
+        expected = { 'street': '1 MAIN ST', 'state': 'TX', 'lat': 30.5,
+                     'phones': [ '5551234567' ] }
+
+        self.assertEqual(json.loads(json.dumps([ row ], default = jsonDefault)),
+                         [ expected ])
+        self.assertEqual(pickle.loads(pickle.dumps(row)), expected)
+        self.assertEqual(copy.deepcopy(row), expected)
+
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default = jsonDefault)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+from datagen.dobgen import DOBElement
+
+from datetime import datetime
+
+import random
+import unittest
+
+
+class TestDOBElement(unittest.TestCase):
+
+    now = datetime(2020, 6, 15)
+
+    def test_range(self):
+        dob = DOBElement(now = self.now, pctPresent = 1.0,
+                         dt_format = '%Y%m%d', rng = random.Random(1))
+        values = dob.create_many(50000)
+
+        # 18 to 99 years old
+        self.assertEqual(dob.ages[0], 6575)
+        self.assertEqual(dob.ages[-1], 36525)
+        self.assertGreaterEqual(min(values), '19200615')
+        self.assertLessEqual(max(values), '20020615')
+
+        # the 20-24 bracket is 7% of the population, 85-99 only 1.8%
+        young = len([ v for v in values if '19950616' <= v <= '20000615' ])
+        old = len([ v for v in values if v <= '19350615' ])
+        self.assertAlmostEqual(young / len(values), 7.0 / dob.cum_pct,
+                               places = 2)
+        self.assertAlmostEqual(old / len(values), 1.8 / dob.cum_pct,
+                               places = 2)
+
+    def test_table(self):
+        dob = DOBElement(now = self.now)
+        weights = [ 0.0 ] * len(dob.ages)
+        n = len(dob.ages)
+        for slot in range(n):
+            weights[slot] += dob.prob[slot]
+            weights[dob.alias[slot]] += 1.0 - dob.prob[slot]
+
+        # one entry per day, weighted by the day's share of its bracket
+        self.assertEqual(dob.ages, list(range(dob.ages[0], dob.ages[-1] + 1)))
+        days = 5 * 365.25
+        share = 7.0 / dob.cum_pct
+        self.assertAlmostEqual(weights[dob.ages.index(20 * 365 + 100)] / n,
+                               share / days)
+
+    def test_min_age(self):
+        dob = DOBElement(now = self.now, minAge = 65, pctPresent = 1.0,
+                         rng = random.Random(2))
+        values = dob.create_many(10000)
+        self.assertLessEqual(max(values), '1955-06-15')
+        self.assertGreater(max(values), '1955-06-01')
+
+        with self.assertRaises(ValueError):
+            DOBElement(now = self.now, minAge = 100)
+
+    def test_present(self):
+        dob = DOBElement(now = self.now, pctPresent = 0.5,
+                         rng = random.Random(3))
+        values = [ dob.create() for i in range(10000) ]
+        missing = len([ v for v in values if v is None ])
+        self.assertAlmostEqual(missing / len(values), 0.5, places = 1)
+
+    def test_formats(self):
+        '''
+        Formatted dates are remembered per format, and follow any change to
+        dt_format.
+        '''
+
+        dob = DOBElement(now = datetime(2020, 6, 15, 13, 45),
+                         pctPresent = 1.0, rng = random.Random(4))
+        a = dob.create_many(100)
+        self.assertEqual(len([ s for s in dob.formatted['%Y-%m-%d']
+                               if s is not None ]), len(set(a)))
+
+        dob.rng = random.Random(4)
+        dob.dt_format = '%d/%m/%Y %H:%M'
+        b = dob.create_many(100)
+        for x, y in zip(a, b):
+            self.assertEqual(datetime.strptime(x, '%Y-%m-%d'),
+                             datetime.strptime(y[:10], '%d/%m/%Y'))
+            self.assertTrue(y.endswith(' 13:45'))
+
+        self.assertEqual(sorted(dob.formatted),
+                         [ '%Y-%m-%d', '%d/%m/%Y %H:%M' ])
+
+
+if __name__ == '__main__':
+    unittest.main()
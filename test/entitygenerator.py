@@ -0,0 +1,381 @@
+#!/usr/bin/python3
+
+from datagen.entitygenerator import EntityGenerator, EntityElement, \
+                                    ArrayElement, DictElement, SimpleElement, \
+                                    PathAccessor, ColumnBatch
+from datagen.dobgen import DOBElement
+from datagen.gendergen import GenderElement
+from datagen.namegen import USCensusNameSet
+from datagen.natidgen import NationalIDElement
+from datagen.phonegen import PhoneElement
+
+from datetime import datetime
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+class Holder(DictElement):
+    '''
+    A DictElement which does nothing but hold its children.
+    '''
+
+    def create(self, **kwargs):
+        d = {}
+        DictElement.addChildren(self, d, **kwargs)
+        return d
+
+
+class Echo(SimpleElement):
+    '''
+    A SimpleElement which returns the value of its 'value' param.
+    '''
+
+    def create(self, **kwargs):
+        return self.getParam('value')
+
+
+class Batched(SimpleElement):
+    '''
+    A SimpleElement which counts the values made by each method.
+    '''
+
+    def __init__(self, **kwargs):
+        SimpleElement.__init__(self, **kwargs)
+        self.calls = { 'create': 0, 'create_many': 0 }
+
+    def create(self, **kwargs):
+        self.calls['create'] += 1
+        return self.rng.random()
+
+    def create_many(self, n):
+        self.calls['create_many'] += n
+        rnd = self.rng.random
+        return [ rnd() for i in range(n) ]
+
+
+class TestEntityGenerator(unittest.TestCase):
+
+    seed = 1
+
+    def setUp(self):
+        # keep compiled name tables (see datagen.datacache) out of the
+        # user's cache directory
+        self.dir = tempfile.mkdtemp()
+        self.cacheDir = os.environ.get('DATAGEN_CACHE_DIR')
+        os.environ['DATAGEN_CACHE_DIR'] = self.dir
+
+    def tearDown(self):
+        if self.cacheDir is None:
+            del os.environ['DATAGEN_CACHE_DIR']
+        else:
+            os.environ['DATAGEN_CACHE_DIR'] = self.cacheDir
+
+        shutil.rmtree(self.dir)
+
+    def build(self):
+        egen = EntityGenerator()
+        egen.addElement(GenderElement(name = 'gender'))
+        egen.addElement(NationalIDElement(name = 'ssn'))
+        egen.addElement(USCensusNameSet(name = 'names',
+                                        params = { 'gender': '/gender' }))
+
+        holder = Holder(name = 'contact')
+        holder.addElement(PhoneElement(name = 'home'))
+        holder.addElement(ArrayElement(name = 'cells',
+                                       count_fn = EntityElement.count_rand_fn(max = 4),
+                                       generator = PhoneElement()))
+        egen.addElement(ArrayElement(name = 'contacts',
+                                     count = 2,
+                                     generator = holder))
+        return egen
+
+    def test_compiled_matches_create(self):
+        egen = self.build()
+
+        egen.reseed(0, TestEntityGenerator.seed)
+        expected = [ egen.create() for i in range(200) ]
+
+        egen.compile()
+        self.assertIsNotNone(egen.plan)
+
+        egen.reseed(0, TestEntityGenerator.seed)
+        actual = [ egen.create() for i in range(200) ]
+
+        self.assertEqual(actual, expected)
+
+    def test_compiled_params(self):
+        '''
+        The names element reads gender by path.  Married names are only
+        generated for females, so they show whether the path was resolved.
+        '''
+
+        egen = self.build().compile()
+
+        married = 0
+        for i in range(200):
+            e = egen.create()
+            if e['gender'] == 'M':
+                self.assertEqual(len(e['names']), 1)
+            elif len(e['names']) == 2:
+                married += 1
+
+        self.assertGreater(married, 0)
+
+    def test_dict_children(self):
+        egen = self.build().compile()
+        e = egen.create()
+
+        for contact in e['contacts']:
+            self.assertEqual(sorted(contact.keys()), [ 'cells', 'home' ])
+
+    def test_add_after_compile(self):
+        egen = self.build().compile()
+        egen.addElement(GenderElement(name = 'other'))
+        self.assertIsNone(egen.plan)
+        self.assertIn('other', egen.create())
+
+    def test_create_at(self):
+        '''
+        Any entity of a seeded run may be generated on its own.
+        '''
+
+        egen = self.build().compile()
+        run = list(egen.generate(20, seed = 5))
+
+        self.assertEqual(egen.create_at(13, seed = 5), run[13])
+        self.assertEqual(egen.create_at(2, seed = 5), run[2])
+
+        # ranges of a run may be generated separately
+        self.assertEqual(list(egen.generate(10, start = 10, seed = 5)), run[10:])
+
+        # the default seed is the one given to the generator
+        egen.seed = 5
+        self.assertEqual(egen.create_at(7), run[7])
+
+        egen.seed = None
+        with self.assertRaises(ValueError):
+            egen.create_at(7)
+
+    def test_streams(self):
+        '''
+        Each element draws from its own stream, so adding an element does not
+        change what the others generate.
+        '''
+
+        a = self.build()
+        b = self.build()
+        b.addElement(GenderElement(name = 'extra'), label = 'a_first')
+        b.children.insert(0, b.children.pop())
+
+        ea = a.create_at(3, seed = 11)
+        eb = b.create_at(3, seed = 11)
+        for k in ea.keys():
+            self.assertEqual(ea[k], eb[k])
+
+        # an element given its own rng keeps it
+        rng = random.Random(3)
+        g = GenderElement(name = 'own', rng = rng)
+        a.addElement(g)
+        self.assertIs(g.rng, rng)
+        self.assertIsNot(a.children[0][1].rng, a.children[1][1].rng)
+
+    def test_paths(self):
+        egen = self.build()
+
+        holder = Holder(name = 'ref')
+        holder.addElement(PhoneElement(name = 'home'))
+        holder.addElement(Echo(name = 'sibling', params = { 'value': '../home' }))
+        holder.addElement(Echo(name = 'outer', params = { 'value': '../../gender' }))
+        egen.addElement(holder)
+
+        egen.addElement(Echo(name = 'first',
+                             params = { 'value': '/contacts[0]/home' }))
+        egen.addElement(Echo(name = 'last',
+                             params = { 'value': '/contacts/home' }))
+        egen.addElement(Echo(name = 'nested',
+                             params = { 'value': '/contacts[-2]/cells' }))
+        egen.addElement(Echo(name = 'literal',
+                             params = { 'value': 'abc' }))
+        egen.addElement(Echo(name = 'near',
+                             params = { 'value': { 'lat': 40, 'lon': -100 } }))
+        egen.addElement(Echo(name = 'point',
+                             params = { 'value': [ 40, -100 ] }))
+
+        for compiled in (False, True):
+            if compiled:
+                egen.compile()
+
+            for i in range(50):
+                e = egen.create()
+                self.assertEqual(e['ref']['sibling'], e['ref']['home'])
+                self.assertEqual(e['ref']['outer'], e['gender'])
+                self.assertEqual(e['first'], e['contacts'][0]['home'])
+                self.assertEqual(e['last'], e['contacts'][-1]['home'])
+                self.assertEqual(e['literal'], 'abc')
+                self.assertEqual(e['near'], { 'lat': 40, 'lon': -100 })
+                self.assertEqual(e['point'], [ 40, -100 ])
+                self.assertIs(e['nested'], e['contacts'][0]['cells'])
+
+    def test_path_cache(self):
+        self.assertIs(PathAccessor.parse('/a/b[2]'),
+                      PathAccessor.parse('/a/b[2]'))
+
+        p = PathAccessor.parse('../../a[1][-1]/b')
+        self.assertEqual(p.up, 2)
+        self.assertEqual(p.steps, [ ('a', None), (None, 1), (None, -1),
+                                    ('b', None) ])
+
+        with self.assertRaises(ValueError):
+            PathAccessor('/a[x]')
+
+        # literals which are not strings may be unhashable, and equal values
+        # of different types (1, True) are kept apart
+        for value in ({ 'lat': 40 }, [ 40, -100 ], 1, True):
+            p = PathAccessor.parse(value)
+            self.assertTrue(p.literal)
+            self.assertIs(p.path, value)
+
+    def test_columns(self):
+        egen = self.build().compile()
+
+        n = 100
+        batch = egen.create_columns(n)
+
+        self.assertEqual(batch.length, n)
+        self.assertEqual(len(batch.columns['gender']), n)
+        self.assertEqual(len(batch.columns['ssn']), n)
+
+        # every leaf beneath a list has one value per list item
+        offs = batch.offsets['names']
+        self.assertEqual(len(offs), n + 1)
+        for leaf in ('names.first', 'names.last', 'names.middle'):
+            self.assertEqual(len(batch.columns[leaf]), offs[-1])
+
+        # a leaf which is None in every entity still has its column
+        self.assertEqual(batch.columns['names.suffix'], [ None ] * offs[-1])
+
+        # names are generated per entity, after (and using) the gender column
+        for i in range(n):
+            count = offs[i + 1] - offs[i]
+            if batch.columns['gender'][i] == 'M':
+                self.assertEqual(count, 1)
+
+        # nested lists are offset by the items of the enclosing list
+        contacts = batch.offsets['contacts']
+        self.assertEqual(contacts[-1], 2 * n)
+        cells = batch.offsets['contacts.cells']
+        self.assertEqual(len(cells), 2 * n + 1)
+        self.assertEqual(len(batch.columns['contacts.cells']), cells[-1])
+        self.assertEqual(len(batch.columns['contacts.home']), 2 * n)
+
+    def test_columns_literal_params(self):
+        '''
+        Elements whose params are all literals are generated a column at a
+        time; only those taking a path are generated per entity.
+        '''
+
+        egen = EntityGenerator(seed = 5)
+        literal = Batched(name = 'literal', params = { 'scale': 2 })
+        byPath = Batched(name = 'byPath', params = { 'scale': '/literal' })
+        egen.addElement(literal)
+        egen.addElement(byPath)
+
+        self.assertFalse(literal.usesPaths())
+        self.assertTrue(byPath.usesPaths())
+
+        egen.create_columns(20)
+        self.assertEqual(literal.calls, { 'create': 0, 'create_many': 20 })
+        self.assertEqual(byPath.calls, { 'create': 20, 'create_many': 0 })
+
+    def test_columns_none(self):
+        '''
+        A key first seen as None gets a column, padded with None, unless a
+        dict turns up under it later.
+        '''
+
+        batch = ColumnBatch(3)
+        batch.addColumn('a', [ { 'x': None, 'y': None },
+                               { 'x': 1, 'y': { 'z': 2 } },
+                               { 'x': None } ])
+        batch.finish()
+
+        self.assertEqual(batch.columns['a.x'], [ None, 1, None ])
+        self.assertEqual(batch.columns['a.y.z'], [ None, 2, None ])
+        self.assertNotIn('a.y', batch.columns)
+
+    def test_create_many(self):
+        '''
+        create_many() gives the same values as as many calls to create(),
+        and leaves the random stream in the same state.
+        '''
+
+        now = datetime(2020, 1, 1)
+        elements = [ (GenderElement, {}),
+                     (GenderElement, { 'pctMale': 0.2 }),
+                     (DOBElement, { 'now': now }),
+                     (DOBElement, { 'now': now, 'pctPresent': 1.0 }),
+                     (NationalIDElement, {}),
+                     (NationalIDElement, { 'useDashes': True }),
+                     (NationalIDElement, { 'pctPresent': 0.5 }),
+                     (NationalIDElement, { 'unique': True, 'key': 1 }),
+                     (PhoneElement, {}),
+                     (PhoneElement, { 'formatted': True }),
+                     (Echo, { 'params': { 'value': 7 } }) ]
+
+        for cls, kwargs in elements:
+            for n in (0, 1, 5, SimpleElement.VECTOR_MIN + 10):
+                a = cls(rng = random.Random(n), **kwargs)
+                b = cls(rng = random.Random(n), **kwargs)
+                expected = [ a.create() for i in range(n) ]
+                self.assertEqual(b.create_many(n), expected, cls.__name__)
+                self.assertEqual(b.rng.random(), a.rng.random())
+
+    def test_array_create_many(self):
+        for compiled in (False, True):
+            egen = EntityGenerator(seed = 3)
+            elem = Batched()
+            egen.addElement(ArrayElement(name = 'values', generator = elem,
+                        count_fn = EntityElement.count_rand_fn(max = 5)))
+            if compiled:
+                egen.compile()
+
+            values = [ egen.create_at(i)['values'] for i in range(50) ]
+            self.assertEqual(elem.calls['create'], 0)
+            self.assertEqual(elem.calls['create_many'],
+                             sum([ len(v) for v in values ]))
+
+            # fractional counts make as many values as the loop did
+            array = ArrayElement(generator = Batched(), count = 1,
+                                 count_fn = lambda: 2.5)
+            self.assertEqual(len(array.create()), 3)
+
+    def test_array_plain_generator(self):
+        '''
+        An array's generator need only have create(), compiled or not.
+        '''
+
+        class Counter(object):
+            def __init__(self):
+                self.n = 0
+
+            def create(self, root = None):
+                self.n += 1
+                return self.n
+
+        for compiled in (False, True):
+            egen = EntityGenerator()
+            egen.addElement(ArrayElement(name = 'values', generator = Counter(),
+                                         count_fn = lambda: 2.5))
+            if compiled:
+                egen.compile()
+
+            self.assertEqual(egen.create()['values'], [ 1, 2, 3 ])
+            self.assertEqual(egen.create()['values'], [ 4, 5, 6 ])
+
+
+if __name__ == '__main__':
+    unittest.main()
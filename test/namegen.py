@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+
+from datagen.namegen import Nicknames
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+class TestNicknames(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+        # keep the compiled distributions (see datagen.datacache) out of the
+        # user's cache directory
+        self.cacheDir = os.environ.get('DATAGEN_CACHE_DIR')
+        os.environ['DATAGEN_CACHE_DIR'] = os.path.join(self.dir, 'cache')
+
+        with open(os.path.join(self.dir, 'nicknames.csv'), 'w') as f:
+            f.write('JEFF,JEFFREY,JEFFERY\n')
+            f.write('GEOFF,JEFF\n')
+            f.write('GEOFFREY,GEOFF\n')
+            f.write('PATRICK,PAT\n')
+            f.write('PATRICIA,PAT,PATTY,pat\n')
+
+        with open(os.path.join(self.dir, 'male.dat'), 'w') as f:
+            f.write('JEFFREY|4.0\nJEFF|1.0\nGEOFF|2.0\nPATRICK|3.0\n')
+            f.write('PAT|1.0\nJEFFERY|0.0\n')
+
+        with open(os.path.join(self.dir, 'female.dat'), 'w') as f:
+            f.write('PATRICIA|5.0\nPAT|2.0\nPATTY|1.0\n')
+
+        self.nicknames = Nicknames(datapath = self.dir,
+                                   male_dist = 'male.dat',
+                                   female_dist = 'female.dat')
+
+    def tearDown(self):
+        if self.cacheDir is None:
+            del os.environ['DATAGEN_CACHE_DIR']
+        else:
+            os.environ['DATAGEN_CACHE_DIR'] = self.cacheDir
+
+        shutil.rmtree(self.dir)
+
+    def test_cache_dir(self):
+        self.assertTrue(os.listdir(os.path.join(self.dir, 'cache')))
+
+    def test_load(self):
+        nicknames = self.nicknames.nicknames
+        self.assertEqual(nicknames['JEFF'], [ 'JEFFREY', 'JEFFERY', 'GEOFF' ])
+        self.assertEqual(nicknames['GEOFF'], [ 'JEFF', 'GEOFFREY' ])
+        self.assertEqual(nicknames['GEOFFREY'], [ 'GEOFF' ])
+        self.assertEqual(nicknames['PAT'], [ 'PATRICK', 'PATRICIA', 'PATTY' ])
+        self.assertEqual(nicknames['PATRICIA'], [ 'PAT', 'PATTY' ])
+
+    def test_tables(self):
+        tables = self.nicknames.tables
+
+        # JEFFERY has no weight, so is never chosen
+        cumdist, values = tables['M']['JEFF']
+        self.assertEqual(values, [ 'JEFFREY', 'GEOFF' ])
+        self.assertAlmostEqual(cumdist[-1], 0.06)
+
+        self.assertEqual(tables['F']['PAT'][1], [ 'PATRICIA', 'PATTY' ])
+        self.assertEqual(tables[None]['PAT'][1],
+                         [ 'PATRICK', 'PATRICIA', 'PATTY' ])
+
+        # no female nicknames for JEFF
+        self.assertNotIn('JEFF', tables['F'])
+
+    def test_getNickname(self):
+        nn = self.nicknames
+        nn.rng = random.Random(1)
+
+        self.assertIsNone(nn.getNickname('NOBODY'))
+        self.assertIsNone(nn.getNickname('JEFF', gender = 'F'))
+        self.assertIsNone(nn.getNickname('JEFF', gender = 'X'))
+
+        for gender in ('m', 'Male', 'M'):
+            self.assertIn(nn.getNickname('jeff', gender = gender),
+                          [ 'JEFFREY', 'GEOFF' ])
+
+        counts = {}
+        for i in range(10000):
+            n = nn.getNickname('PAT', gender = 'FEMALE')
+            counts[n] = counts.get(n, 0) + 1
+
+        self.assertEqual(sorted(counts), [ 'PATRICIA', 'PATTY' ])
+        self.assertAlmostEqual(counts['PATRICIA'] / 10000, 5 / 6, places = 1)
+
+    def test_same_draws(self):
+        '''
+        The tables give the same nickname, for the same random number, as a
+        scan of the weights of every candidate.
+        '''
+
+        nn = self.nicknames
+        for gender in (None, 'M', 'F'):
+            for name, nicks in nn.nicknames.items():
+                weights = []
+                for n in nicks:
+                    w = 0.0
+                    if gender in ('M', None):
+                        w += nn.male_dist.get(n, 0.0)
+                    if gender in ('F', None):
+                        w += nn.female_dist.get(n, 0.0)
+                    weights.append(w)
+
+                total = sum(weights)
+                for r in (0.0, 0.1, 0.3, 0.5, 0.7, 0.9, 0.999999):
+                    if total == 0.0:
+                        expected = None
+                    else:
+                        cum = 0.0
+                        for n, w in zip(nicks, weights):
+                            cum += w
+                            if r * total < cum:
+                                expected = n
+                                break
+
+                    nn.rng = random.Random()
+                    nn.rng.random = lambda: r
+                    self.assertEqual(nn.getNickname(name, gender), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+from datagen.entitygenerator import EntityGenerator, ArrayElement, \
+                                    EntityElement
+from datagen.natidgen import NationalIDElement
+
+import random
+import re
+import unittest
+
+
+def valid(ssn):
+    m = re.match(r'^(\d{3})-?(\d{2})-?(\d{4})$', ssn)
+    if m is None:
+        return False
+
+    area, group, ser = [ int(x) for x in m.groups() ]
+    return 0 < area < 900 and area != 666 and group > 0 and ser > 0
+
+
+class TestNationalIDElement(unittest.TestCase):
+
+    def test_valid(self):
+        e = NationalIDElement(rng = random.Random(1))
+        for i in range(5000):
+            self.assertTrue(valid(e.create()))
+
+        e = NationalIDElement(useDashes = True, rng = random.Random(1))
+        self.assertRegex(e.create(), r'^\d{3}-\d{2}-\d{4}$')
+
+    def test_ranges(self):
+        '''
+        Draws at the ends of each range give the first and last valid
+        values, skipping 666.
+        '''
+
+        e = NationalIDElement(useDashes = True)
+        e.rng = random.Random()
+        e.rng.random = lambda: 0.0
+        self.assertEqual(e.create(), '001-01-0001')
+
+        e.rng.random = lambda: 0.9999999999
+        self.assertEqual(e.create(), '899-99-9999')
+
+        draws = iter([ 0.0, 665 / 898, 0.0, 0.0 ])
+        e.rng.random = lambda: next(draws)
+        self.assertEqual(e.create(), '667-01-0001')
+
+    def test_unique(self):
+        e = NationalIDElement(unique = True, key = 5, rng = random.Random(1))
+        ssns = [ e.create() for i in range(20000) ]
+        self.assertEqual(len(set(ssns)), len(ssns))
+        self.assertTrue(all([ valid(s) for s in ssns ]))
+
+        # the same key and counters give the same SSNs
+        e = NationalIDElement(unique = True, key = 5, offset = 100)
+        self.assertEqual([ e.create() for i in range(10) ], ssns[100:110])
+
+        e = NationalIDElement(unique = True, key = 5,
+                              offset = NationalIDElement.SIZE - 1)
+        e.create()
+        with self.assertRaises(RuntimeError):
+            e.create()
+
+    def test_unique_state(self):
+        e = NationalIDElement(unique = True, rng = random.Random(1))
+        first = [ e.create() for i in range(10) ]
+        state = e.getUniqueState()
+        rest = [ e.create() for i in range(10) ]
+
+        f = NationalIDElement(unique = True)
+        f.setUniqueState(state)
+        self.assertEqual([ f.create() for i in range(10) ], rest)
+        self.assertEqual(len(set(first + rest)), 20)
+
+    def test_unique_by_index(self):
+        '''
+        Entities generated by index draw SSNs from their own counters, so
+        shards generated separately never share an SSN.
+        '''
+
+        def build():
+            egen = EntityGenerator()
+            ssn = NationalIDElement(unique = True, perEntity = 3)
+            egen.addElement(ArrayElement(name = 'ssns', generator = ssn,
+                        count_fn = EntityElement.count_rand_fn(max=4, min=1)))
+            return egen
+
+        whole = list(build().generate(300, seed = 11))
+        shards = []
+        for start in (200, 0, 100):
+            shards.append(list(build().generate(100, start, seed = 11)))
+
+        ssns = [ s for e in whole for s in e['ssns'] ]
+        self.assertEqual(len(set(ssns)), len(ssns))
+        self.assertEqual(shards[1] + shards[2] + shards[0], whole)
+
+        # a different seed gives a different permutation
+        other = list(build().generate(300, seed = 12))
+        others = [ s for e in other for s in e['ssns'] ]
+        self.assertLess(len(set(ssns) & set(others)), 3)
+
+        e = NationalIDElement(unique = True, perEntity = 1)
+        egen = EntityGenerator(seed = 1)
+        egen.addElement(ArrayElement(name = 'ssns', generator = e,
+                                     count_fn = EntityElement.count_const_fn(2)))
+        with self.assertRaises(RuntimeError):
+            egen.create_at(0)
+
+    def test_key(self):
+        '''
+        The key is derived from the run seed, once per seed.
+        '''
+
+        e = NationalIDElement(unique = True)
+        egen = EntityGenerator()
+        egen.addElement(e, 'ssn')
+
+        egen.reseed(0, 11)
+        key = e.getKey()
+        self.assertEqual(e.getKey(), key)
+
+        egen.reseed(0, 12)
+        self.assertNotEqual(e.getKey(), key)
+        egen.reseed(0, 11)
+        self.assertEqual(e.getKey(), key)
+
+    def test_unique_mixed(self):
+        '''
+        Plain create() calls after create_at() count on from 'offset', and
+        are not held to the last indexed entity's counters.
+        '''
+
+        e = NationalIDElement(unique = True, key = 5, offset = 1000)
+        egen = EntityGenerator(seed = 1)
+        egen.addElement(e, 'ssn')
+
+        at = egen.create_at(7)['ssn']
+        plain = [ egen.create()['ssn'] for i in range(3) ]
+
+        f = NationalIDElement(unique = True, key = 5, offset = 1000)
+        self.assertEqual(plain, [ f.create() for i in range(3) ])
+        self.assertEqual(egen.create_at(7)['ssn'], at)
+        self.assertNotIn(at, plain)
+
+
+if __name__ == '__main__':
+    unittest.main()
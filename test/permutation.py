@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+from datagen.permutation import LazyShuffle, FeistelPermutation
+
+import json
+import random
+import unittest
+
+
+class TestLazyShuffle(unittest.TestCase):
+
+    def test_permutation(self):
+        for size in (1, 2, 10, 1000):
+            shuffle = LazyShuffle(size)
+            rnd = random.Random(size).random
+            values = [ shuffle.draw(rnd) for i in range(size) ]
+
+            self.assertEqual(sorted(values), list(range(size)))
+            self.assertEqual(shuffle.remaining(), 0)
+            self.assertEqual(shuffle.swaps, {})
+
+            with self.assertRaises(RuntimeError):
+                shuffle.draw(rnd)
+
+    def test_matches_shuffle(self):
+        '''
+        The order is that of a Fisher-Yates shuffle of range(size), drawing
+        from the front.
+        '''
+
+        size = 50
+        rnd = random.Random(3)
+        expected = list(range(size))
+        for i in range(size):
+            j = i + int(rnd.random() * (size - i))
+            expected[i], expected[j] = expected[j], expected[i]
+
+        shuffle = LazyShuffle(size)
+        rnd = random.Random(3).random
+        self.assertEqual([ shuffle.draw(rnd) for i in range(size) ], expected)
+
+    def test_uniform(self):
+        counts = [ 0 ] * 4
+        rnd = random.Random(1).random
+        for i in range(4000):
+            counts[LazyShuffle(4).draw(rnd)] += 1
+
+        for c in counts:
+            self.assertTrue(900 < c < 1100, counts)
+
+    def test_state(self):
+        rnd = random.Random(5).random
+        shuffle = LazyShuffle(1000000)
+        first = [ shuffle.draw(rnd) for i in range(1000) ]
+        self.assertLessEqual(len(shuffle.swaps), 1000)
+
+        state = json.loads(json.dumps(shuffle.getState()))
+        rest = [ shuffle.draw(rnd) for i in range(100) ]
+
+        resumed = LazyShuffle(1000000)
+        resumed.setState(state)
+        rnd = random.Random(5).random
+        [ rnd() for i in range(1000) ]
+        self.assertEqual([ resumed.draw(rnd) for i in range(100) ], rest)
+        self.assertFalse(set(first) & set(rest))
+
+        with self.assertRaises(ValueError):
+            LazyShuffle(10).setState(state)
+
+    def test_dense(self):
+        '''
+        Past the dense threshold the swaps move to an array, without
+        changing the values drawn or the saved state.
+        '''
+
+        size = 20000
+        rnd = random.Random(9)
+        expected = list(range(size))
+        for i in range(size):
+            j = i + int(rnd.random() * (size - i))
+            expected[i], expected[j] = expected[j], expected[i]
+
+        shuffle = LazyShuffle(size)
+        rnd = random.Random(9).random
+        values = [ shuffle.draw(rnd) for i in range(100) ]
+        self.assertIsNone(shuffle.table)
+
+        sparse = shuffle.getState()
+        values.extend([ shuffle.draw(rnd) for i in range(size // 2 - 100) ])
+        self.assertIsNotNone(shuffle.table)
+        self.assertEqual(shuffle.swaps, {})
+        self.assertEqual(len(shuffle.table), size - shuffle.base)
+
+        state = json.loads(json.dumps(shuffle.getState()))
+        values.extend([ shuffle.draw(rnd) for i in range(size - size // 2) ])
+        self.assertEqual(values, expected)
+
+        # a dense state is resumed as an array, a sparse one as a dict
+        resumed = LazyShuffle(size)
+        resumed.setState(state)
+        self.assertIsNotNone(resumed.table)
+        rnd = random.Random(9).random
+        [ rnd() for i in range(size // 2) ]
+        self.assertEqual([ resumed.draw(rnd) for i in range(size - size // 2) ],
+                         expected[size // 2:])
+
+        resumed.setState(sparse)
+        self.assertIsNone(resumed.table)
+        self.assertEqual(resumed.getState(), sparse)
+
+
+
+class TestFeistelPermutation(unittest.TestCase):
+
+    def test_permutation(self):
+        for size in (1, 2, 3, 4, 5, 17, 1000, 4097):
+            p = FeistelPermutation(size, size)
+            self.assertEqual(len(p), size)
+            self.assertEqual(sorted([ p[i] for i in range(size) ]),
+                             list(range(size)))
+
+            with self.assertRaises(IndexError):
+                p[size]
+
+        with self.assertRaises(ValueError):
+            FeistelPermutation(0, 1)
+
+    def test_keyed(self):
+        size = 10000
+        a = FeistelPermutation(size, 1)
+        b = FeistelPermutation(size, 1)
+        c = FeistelPermutation(size, 2)
+
+        first = [ a[i] for i in range(100) ]
+        self.assertEqual(first, [ b[i] for i in range(100) ])
+        self.assertNotEqual(first, [ c[i] for i in range(100) ])
+
+        # not the identity, nor anything like it
+        self.assertLess(len([ i for i in range(100) if first[i] == i ]), 3)
+        self.assertNotEqual(first, sorted(first))
+
+    def test_large(self):
+        # disjoint counters give distinct values, without listing the space
+        p = FeistelPermutation(898 * 99 * 9999, 42)
+        values = set()
+        for start in (0, 10 ** 6, 888931098 - 5000):
+            values.update([ p[i] for i in range(start, start + 5000) ])
+
+        self.assertEqual(len(values), 15000)
+        self.assertTrue(all([ 0 <= v < len(p) for v in values ]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+from datagen.entitygenerator import EntityGenerator, EntityElement, \
+                                    ArrayElement, DictElement
+from datagen.phonegen import PhoneElement
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+class Place(DictElement):
+    '''
+    A DictElement giving a fixed address, with its children.
+    '''
+
+    def __init__(self, state, postalcode, **kwargs):
+        DictElement.__init__(self, **kwargs)
+        self.state = state
+        self.postalcode = postalcode
+
+    def create(self, **kwargs):
+        d = { 'state': self.state, 'postalcode': self.postalcode }
+        DictElement.addChildren(self, d, **kwargs)
+        return d
+
+
+class TestPhoneElement(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        with open(os.path.join(self.dir, 'areacodes.csv'), 'w') as f:
+            f.write('TX,512,3.0\n')
+            f.write('TX,737,1.0\n')
+            f.write('TX,999,0.0\n')
+            f.write('787,830,1.0\n')
+            f.write('78701,210,1.0\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_tables(self):
+        npas, nxxs, lines = PhoneElement.getTables()
+
+        self.assertEqual(len(npas[0]), 8 * 9 * 9)
+        self.assertEqual(len(nxxs), 800 - 8 - 5)
+        self.assertEqual(len(lines), 10000)
+
+        for npa in npas[0]:
+            self.assertNotIn(npa[0], '01')
+            self.assertNotEqual(npa[1], '9')
+            self.assertNotEqual(npa[1], npa[2])
+
+        for nxx in nxxs:
+            self.assertNotIn(nxx[0], '01')
+            self.assertNotEqual(nxx[1:], '11')
+            self.assertNotIn(nxx, ('555', '958', '959', '950', '976'))
+
+    def test_valid(self):
+        phone = PhoneElement(formatted = True, rng = random.Random(1))
+        npas, nxxs, lines = PhoneElement.getTables()
+        seen = set()
+        for i in range(20000):
+            npa, nxx, line = phone.create().split('-')
+            self.assertIn(npa, npas[0])
+            self.assertIn(nxx, nxxs)
+            self.assertNotEqual(npa, nxx)
+            self.assertEqual(len(line), 4)
+            seen.add(npa)
+
+        # every area code is reachable
+        self.assertEqual(len(seen), len(npas[0]))
+
+        self.assertRegex(PhoneElement().create(), r'^\d{10}$')
+
+    def test_nxx_not_npa(self):
+        '''
+        With the draws at either end of the range, the exchange skips over
+        the area code.
+        '''
+
+        npas, nxxs, lines = PhoneElement.getTables()
+        table = PhoneElement.npaTable([ nxxs[0] ], None, nxxs)
+        phone = PhoneElement()
+        self.assertEqual(phone.build([ 0.0, 0.0, 0.0 ], table),
+                         [ nxxs[0] + nxxs[1] + '0000' ])
+
+        table = PhoneElement.npaTable([ nxxs[-1] ], None, nxxs)
+        self.assertEqual(phone.build([ 0.0, 0.9999999, 0.0 ], table),
+                         [ nxxs[-1] + nxxs[-2] + '0000' ])
+
+    def test_area_codes(self):
+        codes = PhoneElement.loadAreaCodes(os.path.join(self.dir,
+                                                        'areacodes.csv'))
+        self.assertEqual(sorted(codes), [ '787', '78701', 'TX' ])
+        self.assertEqual(codes['TX'][0], [ '512', '737' ])
+        self.assertEqual(codes['TX'][1], [ 3.0, 4.0 ])
+
+        def build(state, postalcode):
+            egen = EntityGenerator(seed = 5)
+            place = Place(state, postalcode, name = 'address')
+            phone = PhoneElement(datapath = self.dir,
+                                 areaCodes = 'areacodes.csv',
+                                 params = { 'zip': '../postalcode',
+                                            'state': '../state' })
+            place.addElement(ArrayElement(name = 'phones', generator = phone,
+                                  count_fn = EntityElement.count_const_fn(100)))
+            egen.addElement(place)
+            return egen.compile()
+
+        def npas(egen):
+            found = {}
+            for i in range(20):
+                for p in egen.create_at(i)['address']['phones']:
+                    found[p[:3]] = found.get(p[:3], 0) + 1
+
+            return found
+
+        # ZIP, then ZIP3, then state
+        self.assertEqual(list(npas(build('TX', '78701-1234'))), [ '210' ])
+        self.assertEqual(list(npas(build('TX', '78799'))), [ '830' ])
+
+        found = npas(build('tx', '75001'))
+        self.assertEqual(sorted(found), [ '512', '737' ])
+        self.assertAlmostEqual(found['512'] / 2000, 0.75, places = 1)
+
+        # anywhere else, any area code
+        self.assertGreater(len(npas(build('CA', '90210'))), 100)
+
+    def test_bad_area_codes(self):
+        path = os.path.join(self.dir, 'bad.csv')
+        for line in ('TX,51,1.0\n', 'TX,512\n', 'TX,512,x\n'):
+            with open(path, 'w') as f:
+                f.write(line)
+
+            with self.assertRaises(ValueError):
+                PhoneElement.loadAreaCodes(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+from datagen import registry
+from datagen.cdf import CDF
+from datagen.registry import TableRegistry
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+class TestTableRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'data.txt')
+        with open(self.file, 'w') as f:
+            f.write('A 1.0\nB 2.0\nC 3.0\n')
+
+        self.registry = TableRegistry()
+        self.loads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def loader(self):
+        self.loads += 1
+        return [ 'table', self.loads ]
+
+    def test_shared(self):
+        r = self.registry
+        a = r.get('kind', self.file, { 'x': 1 }, self.loader)
+        b = r.get('kind', self.file, { 'x': 1 }, self.loader)
+        self.assertIs(a, b)
+        self.assertEqual(self.loads, 1)
+
+        # the same file by another name
+        c = r.get('kind', os.path.join(self.dir, '.', 'data.txt'),
+                  { 'x': 1 }, self.loader)
+        self.assertIs(a, c)
+
+        # options and kind are part of the key
+        self.assertIsNot(r.get('kind', self.file, { 'x': 2 }, self.loader), a)
+        self.assertIsNot(r.get('other', self.file, { 'x': 1 }, self.loader), a)
+        self.assertEqual(self.loads, 3)
+
+    def test_changed(self):
+        r = self.registry
+        a = r.get('kind', self.file, None, self.loader)
+
+        with open(self.file, 'a') as f:
+            f.write('D 4.0\n')
+
+        b = r.get('kind', self.file, None, self.loader)
+        self.assertIsNot(a, b)
+        self.assertEqual(self.loads, 2)
+
+    def test_report(self):
+        r = self.registry
+        for i in range(3):
+            r.get('kind', self.file, { 'x': 1 }, self.loader)
+
+        report = r.report()
+        self.assertEqual(len(report), 1)
+
+        s = report[0]
+        self.assertEqual(s['kind'], 'kind')
+        self.assertEqual(s['source'], os.path.abspath(self.file))
+        self.assertEqual(s['options'], { 'x': 1 })
+        self.assertEqual(s['requests'], 3)
+        self.assertGreaterEqual(s['seconds'], 0.0)
+        self.assertGreater(s['bytes'], 0)
+        self.assertEqual(s['mapped'], 0)
+
+        r.clear()
+        self.assertEqual(r.report(), [])
+        r.get('kind', self.file, { 'x': 1 }, self.loader)
+        self.assertEqual(self.loads, 2)
+
+    def test_threads(self):
+        r = self.registry
+        found = []
+
+        def load():
+            found.append(r.get('kind', self.file, None, self.loader))
+
+        threads = [ threading.Thread(target = load) for i in range(8) ]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        self.assertEqual(self.loads, 1)
+        self.assertTrue(all([ t is found[0] for t in found ]))
+
+    def test_cdf(self):
+        cacheDir = os.path.join(self.dir, 'cache')
+        a = registry.cdf(self.file, cacheDir = cacheDir)
+        b = registry.cdf(self.file, useCache = False)
+        self.assertIsInstance(a, CDF)
+        self.assertIs(a, b)
+
+        c = registry.cdf(self.file, engine = 'alias', useCache = False)
+        self.assertIsNot(a, c)
+        self.assertEqual(c.engine, 'alias')
+
+        # mapped from the compiled cache
+        registry.tables.clear()
+        d = registry.cdf(self.file, cacheDir = cacheDir)
+        self.assertIsNot(a, d)
+        self.assertGreater(registry.tables.report()[0]['mapped'], 0)
+
+    def test_sizeOf(self):
+        heap, mapped = registry.sizeOf([ 'a' * 1000, { 'b': 'c' * 1000 } ])
+        self.assertGreater(heap, 2000)
+        self.assertEqual(mapped, 0)
+
+        heap, mapped = registry.sizeOf({ 'm': memoryview(b'x' * 100) })
+        self.assertEqual(mapped, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
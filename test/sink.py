@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+from datagen.sink import BufferedSink, FileSink, GzipSink, openSink
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_buffering(self):
+        '''
+        Nothing is written until the buffer fills (or the sink is flushed),
+        and then it is written in a single block.
+        '''
+
+        stream = io.BytesIO()
+        sink = BufferedSink(stream, bufferSize = 10, closeStream = False)
+
+        sink.write('abc\n')
+        self.assertEqual(stream.getvalue(), b'')
+
+        sink.write('défghi\n')
+        self.assertEqual(stream.getvalue(), 'abc\ndéfghi\n'.encode('utf-8'))
+        self.assertEqual(sink.written, len(stream.getvalue()))
+
+        sink.write('j\n')
+        sink.close()
+        self.assertEqual(stream.getvalue(), 'abc\ndéfghi\nj\n'.encode('utf-8'))
+        self.assertFalse(stream.closed)
+
+    def test_files(self):
+        lines = [ '{0:d}\n'.format(i) for i in range(1000) ]
+
+        for name, cls in (('out.txt', FileSink), ('out.txt.gz', GzipSink)):
+            fileName = os.path.join(self.tmp, name)
+            with openSink(fileName, bufferSize = 100) as sink:
+                self.assertIsInstance(sink, cls)
+                for line in lines:
+                    sink.write(line)
+
+            opener = gzip.open if name.endswith('.gz') else open
+            with opener(fileName, 'rt') as f:
+                self.assertEqual(f.read(), ''.join(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
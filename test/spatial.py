@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+from datagen.spatial import GridIndex, distance
+
+import random
+import unittest
+
+
+class TestGridIndex(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.points = [ (rnd.uniform(40.0, 41.0), rnd.uniform(-75.0, -73.0))
+                        for i in range(3000) ]
+
+        # rows without coordinates are not indexed
+        self.points[10] = (None, -74.0)
+        self.points[20] = (float('nan'), -74.0)
+        self.grid = GridIndex.build(self.points)
+
+    def brute(self, lat, lon):
+        return sorted([ (distance(lat, lon, p[0], p[1]), n)
+                        for n, p in enumerate(self.points)
+                        if p[0] is not None and p[0] == p[0] ])
+
+    def test_distance(self):
+        # one degree of latitude, and New York to Los Angeles
+        self.assertAlmostEqual(distance(40.0, -74.0, 41.0, -74.0), 111.2, 1)
+        self.assertAlmostEqual(distance(40.7128, -74.0060, 34.0522, -118.2437),
+                               3936, -1)
+
+    def test_within(self):
+        for lat, lon, km in ((40.5, -74.0, 5.0), (40.05, -74.95, 12.0),
+                             (45.0, -74.0, 50.0), (40.5, -74.0, 500.0)):
+            expected = [ n for d, n in self.brute(lat, lon) if d <= km ]
+            self.assertEqual(sorted(self.grid.within(lat, lon, km)),
+                             sorted(expected))
+
+    def test_nearest(self):
+        for lat, lon in ((40.5, -74.0), (41.5, -73.0), (30.0, -90.0)):
+            expected = self.brute(lat, lon)[:7]
+            found = self.grid.nearest(lat, lon, 7)
+            self.assertEqual([ n for d, n in found ], [ n for d, n in expected ])
+
+        self.assertEqual(len(self.grid.nearest(40.5, -74.0, 5000)), 2998)
+
+    def test_sample(self):
+        rnd = random.Random(2).random
+        expected = set(self.grid.within(40.5, -74.0, 3.0))
+
+        seen = set([ self.grid.sample(40.5, -74.0, 3.0, rnd) for i in range(2000) ])
+        self.assertEqual(seen, expected)
+
+        self.assertIsNone(self.grid.sample(10.0, 10.0, 3.0, rnd))
+
+    def test_antimeridian(self):
+        '''
+        Queries near 180 degrees longitude reach points on the other side.
+        '''
+
+        rnd = random.Random(3)
+        points = [ (rnd.uniform(-18.0, -16.0), rnd.uniform(177.0, 183.0))
+                   for i in range(2000) ]
+        points = [ (lat, lon - 360.0 if lon >= 180.0 else lon)
+                   for lat, lon in points ]
+        grid = GridIndex.build(points)
+
+        def brute(lat, lon):
+            return sorted([ (distance(lat, lon, p[0], p[1]), n)
+                            for n, p in enumerate(points) ])
+
+        for lat, lon in ((-17.0, 179.97), (-17.0, -179.97), (-17.0, 180.0),
+                         (-16.0, 176.0), (-17.0, -175.0)):
+            expected = brute(lat, lon)
+            for km in (5.0, 50.0):
+                self.assertEqual(sorted(grid.within(lat, lon, km)),
+                                 sorted([ n for d, n in expected if d <= km ]))
+
+            found = grid.nearest(lat, lon, 7)
+            self.assertEqual([ n for d, n in found ],
+                             [ n for d, n in expected[:7] ])
+
+        # the circle around the antimeridian takes points from both sides
+        rnd = random.Random(4).random
+        seen = set([ grid.sample(-17.0, 180.0, 20.0, rnd) for i in range(3000) ])
+        self.assertEqual(seen, set(grid.within(-17.0, 180.0, 20.0)))
+        self.assertTrue(any([ points[n][1] < 0 for n in seen ]))
+        self.assertTrue(any([ points[n][1] > 0 for n in seen ]))
+
+    def test_sections(self):
+        copy = GridIndex.fromSections('grid', self.grid.sections('grid'),
+                                      self.grid.cell)
+        self.assertEqual(copy.nearest(40.5, -74.0, 5),
+                         self.grid.nearest(40.5, -74.0, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
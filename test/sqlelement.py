@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+from datagen.sqlelement import SQLElement
+
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+
+class TestSQLElement(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        db = sqlite3.connect(os.path.join(self.tmp, 'data.db'))
+        db.execute('create table things (id integer primary key, name text)')
+        for i in (3, 17, 18, 250, 1000):
+            db.execute('insert into things values (?, ?)',
+                       (i, 'thing {0:d}'.format(i)))
+
+        db.commit()
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_sparse_keys(self):
+        se = SQLElement(dataPath = self.tmp, dataFile = 'data.db',
+                        tableName = 'things', keyCol = 'id',
+                        rng = random.Random(1), cacheDir = self.tmp)
+
+        self.assertEqual(list(se.keys), [ 3, 17, 18, 250, 1000 ])
+        self.assertEqual(se.columns, [ 'name' ])
+
+        names = set([ se.create()['name'] for i in range(200) ])
+        self.assertEqual(names, set([ 'thing 3', 'thing 17', 'thing 18',
+                                      'thing 250', 'thing 1000' ]))
+
+    def test_unique(self):
+        se = SQLElement(dataPath = self.tmp, dataFile = 'data.db',
+                        tableName = 'things', keyCol = 'id', unique = True,
+                        rng = random.Random(1), cacheDir = self.tmp)
+
+        names = [ se.create()['name'] for i in range(5) ]
+        self.assertEqual(len(set(names)), 5)
+
+        with self.assertRaises(RuntimeError):
+            se.create()
+
+    def test_empty_table(self):
+        db = sqlite3.connect(os.path.join(self.tmp, 'data.db'))
+        db.execute('delete from things')
+        db.commit()
+        db.close()
+
+        with self.assertRaises(ValueError):
+            SQLElement(dataPath = self.tmp, dataFile = 'data.db',
+                       tableName = 'things', keyCol = 'id', useCache = False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+from datagen import sqlutil
+
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+
+def worker_count(dbFile):
+    return sqlutil.connection(dbFile).execute('select count(*) from t').fetchone()[0]
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.dbFile = os.path.join(self.tmp, 'data.db')
+
+        db = sqlite3.connect(self.dbFile)
+        db.execute('create table t (x integer)')
+        db.executemany('insert into t values (?)', [ (i,) for i in range(10) ])
+        db.commit()
+        db.close()
+
+        self.pool = sqlutil.ConnectionPool()
+
+    def tearDown(self):
+        self.pool.closeAll()
+        shutil.rmtree(self.tmp)
+
+    def test_per_thread(self):
+        db = self.pool.get(self.dbFile)
+        self.assertIs(self.pool.get(self.dbFile), db)
+        self.assertIsNot(self.pool.get(self.dbFile, readOnly = True), db)
+
+        seen = []
+        def run():
+            other = self.pool.get(self.dbFile)
+            seen.append((other, other.execute('select count(*) from t').fetchone()[0]))
+
+        threads = [ threading.Thread(target = run) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set([ id(c) for c, n in seen ] + [ id(db) ])), 5)
+        self.assertEqual([ n for c, n in seen ], [ 10 ] * 4)
+        self.assertEqual(len(self.pool.opened), 6)
+
+    def test_close_all(self):
+        db = self.pool.get(self.dbFile)
+        self.pool.closeAll()
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            db.execute('select 1')
+
+        self.assertIsNot(self.pool.get(self.dbFile), db)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        '''
+        A forked child opens its own connection rather than using ours.
+        '''
+
+        parent = sqlutil.connection(self.dbFile)
+
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(2) as p:
+            self.assertEqual(p.map(worker_count, [ self.dbFile ] * 4), [ 10 ] * 4)
+
+        self.assertIs(sqlutil.connection(self.dbFile), parent)
+
+
+if __name__ == '__main__':
+    unittest.main()